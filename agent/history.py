@@ -0,0 +1,74 @@
+import json
+from typing import Any, Dict, List, Optional
+from .messages import AIMessage, BaseMessage, HumanMessage
+from .prompts import TOOL_RESULT_PREFIX
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting English + JSON
+    return len(text) // 4 + 1
+
+
+class MessageHistory:
+    """Conversation for one agent run: a fixed prefix plus one exchange per step.
+
+    The prefix (system prompt, few-shots, scenario) is never modified. Each
+    step appends the assistant's JSON action and a ``TOOL_RESULT`` message.
+    When ``max_tokens`` is set and the conversation exceeds it, the oldest
+    observations are collapsed to a short summary, newest last; the most
+    recent ``keep_recent`` observations are always sent in full.
+    """
+
+    def __init__(self, prefix: List[BaseMessage], max_tokens: Optional[int] = None,
+                 keep_recent: int = 2, summary_chars: int = 160):
+        self.prefix = list(prefix)
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        self._steps: List[Dict[str, Any]] = []
+
+    def append_step(self, llm_text: str, action: str, result: Any) -> None:
+        full = TOOL_RESULT_PREFIX + json.dumps({"action": action, "result": result})
+        self._steps.append({"assistant": AIMessage(content=llm_text),
+                            "observation": HumanMessage(content=full),
+                            "action": action, "result": result, "compact": None})
+
+    def append_results(self, llm_text: str, results: List[Dict[str, Any]]) -> None:
+        # A multi-action step: every {"action", "result"} pair in one TOOL_RESULT block
+        full = TOOL_RESULT_PREFIX + json.dumps({"results": results})
+        self._steps.append({"assistant": AIMessage(content=llm_text),
+                            "observation": HumanMessage(content=full),
+                            "action": "+".join(r["action"] for r in results),
+                            "result": [r["result"] for r in results], "compact": None})
+
+    def _compact(self, step: Dict[str, Any]) -> HumanMessage:
+        if step["compact"] is None:
+            text = json.dumps(step["result"])
+            if len(text) > self.summary_chars:
+                text = text[:self.summary_chars] + "...(truncated)"
+            step["compact"] = HumanMessage(
+                content=TOOL_RESULT_PREFIX + json.dumps({"action": step["action"], "summary": text}))
+        return step["compact"]
+
+    def messages(self) -> List[BaseMessage]:
+        observations = [s["observation"] for s in self._steps]
+        if self.max_tokens is not None:
+            total = sum(estimate_tokens(m.content) for m in self.prefix)
+            total += sum(estimate_tokens(s["assistant"].content) + estimate_tokens(s["observation"].content)
+                         for s in self._steps)
+            compressible = max(0, len(self._steps) - self.keep_recent)
+            for i in range(compressible):
+                if total <= self.max_tokens:
+                    break
+                compact = self._compact(self._steps[i])
+                total -= estimate_tokens(observations[i].content) - estimate_tokens(compact.content)
+                observations[i] = compact
+
+        out = list(self.prefix)
+        for step, obs in zip(self._steps, observations):
+            out.append(step["assistant"])
+            out.append(obs)
+        return out
+
+    def token_estimate(self) -> int:
+        return sum(estimate_tokens(m.content) for m in self.messages())
@@ -0,0 +1,276 @@
+import copy
+import heapq
+import itertools
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from .llm_agent import SynapseAgent
+
+# Scenario fields that identify one order / person rather than the incident
+IDENTITY_FIELDS = ("order_id", "driver_id", "customer_id", "recipient_id", "passenger_id")
+
+# Side-effecting tools that act on one order; re-run for every member with its own ids
+FAN_OUT_TOOLS = ("notify_customer", "re_route_driver", "contact_recipient_via_chat")
+
+# Representative outcomes that carry over to the rest of the incident
+FAN_OUT_STATUSES = ("complete", "escalated")
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WORD = re.compile(r"[a-z#]+")
+
+
+def _norm(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def normalize_scenario(scenario: Dict) -> Dict[str, Any]:
+    """Grouping key, description tokens and per-order ids of one incoming scenario.
+
+    The key is (merchant, location, origin->destination route, identity field
+    names); numbers in the description are masked so "40-minute" and
+    "35-minute" reports compare equal.
+    """
+    route = ""
+    if scenario.get("origin") or scenario.get("destination"):
+        route = f"{_norm(scenario.get('origin'))}->{_norm(scenario.get('destination'))}"
+    anchor = (_norm(scenario.get("merchant_id")), _norm(scenario.get("location")), route,
+              tuple(f for f in IDENTITY_FIELDS if scenario.get(f)))
+    text = _NUMBER.sub("#", _norm(scenario.get("description")))
+    return {"anchor": anchor, "tokens": frozenset(_WORD.findall(text)),
+            "identity": {f: str(scenario[f]) for f in IDENTITY_FIELDS if scenario.get(f)}}
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _substitute(obj: Any, patterns: List[Tuple["re.Pattern", str]]) -> Any:
+    # Swap the representative's ids for a member's, wherever they appear
+    if isinstance(obj, dict):
+        return {k: _substitute(v, patterns) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_substitute(v, patterns) for v in obj]
+    if isinstance(obj, str):
+        for pattern, replacement in patterns:
+            obj = pattern.sub(replacement, obj)
+    return obj
+
+
+class Incident:
+    """A group of near-duplicate scenarios resolved by one representative run."""
+
+    def __init__(self, incident_id: str, key: Dict[str, Any], ts: float, scenario_id: str, scenario: Dict):
+        self.id = incident_id
+        self.anchor = key["anchor"]
+        self.tokens = key["tokens"]
+        self.identity = key["identity"]
+        self.first_ts = ts
+        self.representative_id = scenario_id
+        self.scenario = scenario
+        self.size = 1
+        # Representative's agent result once it finishes (None while in flight)
+        self.result: Optional[Dict] = None
+        self.waiting: List[Tuple[str, Dict, Dict[str, str], Future, float]] = []
+
+
+class IncidentIntake:
+    """Intake stage in front of SynapseAgent.run that deduplicates bursts of similar scenarios.
+
+    Scenarios with the same grouping key (see normalize_scenario) whose
+    descriptions are at least ``similarity`` Jaccard-similar, arriving within
+    ``window_s`` of an incident's first report, join that incident. Only its
+    first scenario runs the agent; every other member gets the
+    representative's plan with its own ids substituted, and only the
+    ``fan_out_tools`` steps (per-order side effects) are re-run for it. A
+    repeat report of the representative's own order gets its result as is.
+    Read-only steps whose inputs mention a per-order id are re-run too. If
+    the representative ends outside ``FAN_OUT_STATUSES`` or used any other
+    side-effecting tool on a per-order id, members fall back to full runs.
+
+    Scenarios without a merchant, location or route never group. A
+    ``reported_at`` field (epoch seconds) is used as the arrival time when
+    present; otherwise the time of submit().
+    """
+
+    def __init__(self, agent: Optional[SynapseAgent] = None, workers: int = 4, window_s: float = 300.0,
+                 similarity: float = 0.6, fan_out_tools: Iterable[str] = FAN_OUT_TOOLS,
+                 clock: Callable[[], float] = time.time, **agent_kwargs: Any):
+        self.agent = agent or SynapseAgent(**agent_kwargs)
+        self.workers = workers
+        self.window_s = window_s
+        self.similarity = similarity
+        self.fan_out_tools = frozenset(fan_out_tools)
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        # Open incidents per grouping key, plus a (window end, seq, incident) heap
+        # that every submit() sweeps so expired incidents never accumulate
+        self._open: Dict[Tuple, List[Incident]] = {}
+        self._expiry: List[Tuple[float, int, Incident]] = []
+        self._ids = itertools.count(1)
+        self._stats = {"scenarios": 0, "incidents": 0, "agent_runs": 0, "fanned_out": 0, "duplicates": 0}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "IncidentIntake":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["runs_saved"] = stats["scenarios"] - stats["agent_runs"]
+        return stats
+
+    def open_incidents(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self._open.values())
+
+    def _sweep(self, ts: float) -> None:
+        while self._expiry and self._expiry[0][0] < ts:
+            _, _, incident = heapq.heappop(self._expiry)
+            bucket = self._open.get(incident.anchor)
+            if bucket is not None:
+                bucket.remove(incident)
+                if not bucket:
+                    del self._open[incident.anchor]
+
+    def _match(self, key: Dict[str, Any], ts: float) -> Optional[Incident]:
+        if not any(key["anchor"][:3]):
+            return None
+        bucket = self._open.get(key["anchor"], [])
+        best = max(bucket, key=lambda inc: jaccard(key["tokens"], inc.tokens), default=None)
+        if best is not None and jaccard(key["tokens"], best.tokens) >= self.similarity:
+            return best
+        return None
+
+    def submit(self, scenario_id: str, scenario: Dict) -> Future:
+        """Queue one scenario; the future resolves to a batch record (see agent/runner.py) with an ``incident``."""
+        submitted = time.perf_counter()
+        key = normalize_scenario(scenario)
+        ts = float(scenario.get("reported_at") or self._clock())
+        with self._lock:
+            self._stats["scenarios"] += 1
+            self._sweep(ts)
+            incident = self._match(key, ts)
+            if incident is None:
+                seq = next(self._ids)
+                incident = Incident(f"inc-{seq}", key, ts, scenario_id, scenario)
+                if any(key["anchor"][:3]):
+                    self._open.setdefault(key["anchor"], []).append(incident)
+                    heapq.heappush(self._expiry, (ts + self.window_s, seq, incident))
+                self._stats["incidents"] += 1
+                self._stats["agent_runs"] += 1
+                return self._pool.submit(self._run_representative, incident, submitted)
+            incident.size += 1
+            if incident.result is None:
+                future: Future = Future()
+                incident.waiting.append((scenario_id, scenario, key["identity"], future, submitted))
+                return future
+        return self._pool.submit(self._resolve_member, incident, scenario_id, scenario, key["identity"], submitted)
+
+    def _release(self, incident: Incident) -> None:
+        # Representative finished: hand every member that queued behind it to the pool
+        with self._lock:
+            waiting, incident.waiting = incident.waiting, []
+        for scenario_id, scenario, identity, future, submitted in waiting:
+            self._chain(self._pool.submit(self._resolve_member, incident, scenario_id, scenario, identity,
+                                          submitted), future)
+
+    @staticmethod
+    def _chain(source: Future, target: Future) -> None:
+        def copy_outcome(done: Future) -> None:
+            if done.exception() is not None:
+                target.set_exception(done.exception())
+            else:
+                target.set_result(done.result())
+        source.add_done_callback(copy_outcome)
+
+    def _record(self, scenario_id: str, result: Dict, submitted: float, incident: Incident, role: str) -> Dict:
+        return {
+            "id": scenario_id,
+            "latency_s": round(time.perf_counter() - submitted, 4),
+            "final_plan": result["final_plan"],
+            "metrics": result.get("metrics"),
+            "cot": result["cot"],
+            "incident": {"id": incident.id, "representative": incident.representative_id, "role": role},
+        }
+
+    def _run_agent(self, scenario: Dict) -> Dict:
+        try:
+            return self.agent.run(scenario)
+        except Exception as e:
+            return {"cot": [], "final_plan": {"status": "error", "reason": str(e)}}
+
+    def _run_representative(self, incident: Incident, submitted: float) -> Dict:
+        incident.result = self._run_agent(incident.scenario)
+        self._release(incident)
+        return self._record(incident.representative_id, incident.result, submitted, incident, "representative")
+
+    def _can_fan_out(self, incident: Incident) -> bool:
+        if incident.result["final_plan"].get("status") not in FAN_OUT_STATUSES:
+            return False
+        ids = set(incident.identity.values())
+        for entry in incident.result["cot"]:
+            action = entry["action"]
+            if action in self.fan_out_tools or action in ("finish", "ask_human") or \
+                    self.agent.tools.is_read_only(action):
+                continue
+            # Some other side effect aimed at this order: members need their own run
+            if any(re.search(rf"\b{re.escape(v)}\b", str(entry.get("action_input"))) for v in ids):
+                return False
+        return True
+
+    def _resolve_member(self, incident: Incident, scenario_id: str, scenario: Dict, identity: Dict[str, str],
+                        submitted: float) -> Dict:
+        if identity == incident.identity:
+            # Another report of the representative's own order: its side effects already ran
+            with self._lock:
+                self._stats["duplicates"] += 1
+            return self._record(scenario_id, incident.result, submitted, incident, "duplicate")
+        if not self._can_fan_out(incident):
+            with self._lock:
+                self._stats["agent_runs"] += 1
+            return self._record(scenario_id, self._run_agent(scenario), submitted, incident, "independent")
+        patterns = [(re.compile(rf"\b{re.escape(value)}\b"), identity[field])
+                    for field, value in incident.identity.items() if identity.get(field, value) != value]
+        rep_ids = set(incident.identity.values())
+        steps = []
+        for rep_entry in incident.result["cot"]:
+            entry = copy.deepcopy(rep_entry)
+            entry["action_input"] = _substitute(entry.get("action_input"), patterns)
+            action = entry["action"]
+            per_order = any(re.search(rf"\b{re.escape(v)}\b", str(rep_entry.get("action_input")))
+                            for v in rep_ids)
+            if not (action in self.fan_out_tools or (per_order and self.agent.tools.is_read_only(action))):
+                entry["reused"] = True
+            steps.append(entry)
+        with self._lock:
+            self._stats["fanned_out"] += 1
+        # Member side effects go through the agent so they are journaled and instrumented like any run
+        result = self.agent.run_steps(scenario, steps, _substitute(incident.result["final_plan"], patterns))
+        return self._record(scenario_id, result, submitted, incident, "member")
+
+    def run(self, items: Iterable[Tuple[str, Dict]]) -> Iterator[Dict]:
+        """Submit (id, scenario) pairs, yielding one record per scenario as it finishes.
+
+        Like runner.run_batch, at most ``4 * workers`` scenarios are in flight.
+        """
+        max_pending = 4 * self.workers
+        pending = set()
+        for scenario_id, scenario in items:
+            pending.add(self.submit(scenario_id, scenario))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Record types, one JSON object per line:
+#   run_start {run_id, ts, scenario}
+#   decision  {run_id, step, llm_text, step_metrics, metrics}   LLM output, before any tool runs
+#   step      {run_id, kind, batch, llm_text, entries, metrics}  completed step with observations
+#   run_end   {run_id, ts, final_plan, metrics, tail}          tail: cot entries without a step record
+#                                                               (finish / ask_human)
+
+
+def iter_records(path: str, offset: int = 0) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """Yield (offset, end_offset, record) for every complete line from ``offset`` on.
+
+    A torn final line (crash mid-write) has no trailing newline and is not
+    yielded; corrupt lines are skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            start, offset = offset, offset + len(line)
+            try:
+                yield start, offset, json.loads(line)
+            except ValueError:
+                continue
+
+
+class RunJournal:
+    """Append-only NDJSON journal of agent runs, written by a background thread.
+
+    ``append`` only enqueues, so the agent loop never waits on disk. The writer
+    flushes every record and fsyncs once per ``fsync_every`` records or
+    ``fsync_interval`` seconds, whichever comes first; a crash can lose at most
+    that last unsynced batch. The agent calls ``flush`` before any
+    side-effecting tool, so the decision behind it is always durable.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 64, fsync_interval: float = 0.05):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._file = open(path, "ab")
+        # Terminate a torn line left by a crash so the next record starts clean
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write(b"\n")
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="run-journal-writer", daemon=True)
+        self._writer.start()
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything appended so far is written and fsynced."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write_loop(self) -> None:
+        pending, last_sync = 0, time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval if pending else None)
+            except queue.Empty:
+                item = False  # interval elapsed with unsynced records
+            if isinstance(item, dict):
+                self._file.write(json.dumps(item, separators=(",", ":"), default=str).encode("utf-8") + b"\n")
+                pending += 1
+                if pending < self.fsync_every and time.monotonic() - last_sync < self.fsync_interval:
+                    continue
+            if pending:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                pending, last_sync = 0, time.monotonic()
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def index(self) -> "JournalIndex":
+        self.flush()
+        return JournalIndex(self.path)
+
+    def load_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        index = self.index()
+        try:
+            return index.load_run(run_id)
+        finally:
+            index.close()
+
+    def query(self, **filters: Any) -> List[Dict[str, Any]]:
+        index = self.index()
+        try:
+            return index.find(**filters)
+        finally:
+            index.close()
+
+
+class JournalIndex:
+    """SQLite side index (``<journal>.idx``) over a RunJournal file.
+
+    Built incrementally: each refresh() only reads bytes appended since the
+    last one. Maps runs to their status, scenario, actions and record offsets,
+    so lookups seek straight to a run's records instead of scanning the log.
+    """
+
+    def __init__(self, journal_path: str, index_path: Optional[str] = None):
+        self.journal_path = journal_path
+        self._db = sqlite3.connect(index_path or journal_path + ".idx")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);"
+            "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started REAL, scenario TEXT,"
+            " status TEXT, steps INTEGER DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS records (run_id TEXT, offset INTEGER);"
+            "CREATE TABLE IF NOT EXISTS actions (run_id TEXT, action TEXT);"
+            "CREATE INDEX IF NOT EXISTS records_run ON records (run_id);"
+            "CREATE INDEX IF NOT EXISTS actions_action ON actions (action);"
+            "CREATE INDEX IF NOT EXISTS runs_status ON runs (status);"
+        )
+        self.refresh()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def refresh(self) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'offset'").fetchone()
+        end = row[0] if row else 0
+        with self._db:
+            for start, end, rec in iter_records(self.journal_path, end):
+                run_id = rec.get("run_id")
+                self._db.execute("INSERT INTO records VALUES (?, ?)", (run_id, start))
+                kind = rec.get("type")
+                if kind == "run_start":
+                    self._db.execute("INSERT OR REPLACE INTO runs (run_id, started, scenario, status) "
+                                     "VALUES (?, ?, ?, 'running')",
+                                     (run_id, rec.get("ts"), json.dumps(rec.get("scenario"), sort_keys=True)))
+                elif kind == "step":
+                    self._db.execute("UPDATE runs SET steps = steps + ? WHERE run_id = ?",
+                                     (len(rec["entries"]), run_id))
+                    self._db.executemany("INSERT INTO actions VALUES (?, ?)",
+                                         [(run_id, e["action"]) for e in rec["entries"]])
+                elif kind == "run_end":
+                    self._db.execute("UPDATE runs SET status = ?, steps = steps + ? WHERE run_id = ?",
+                                     (rec["final_plan"].get("status"), len(rec.get("tail", [])), run_id))
+                    self._db.executemany("INSERT INTO actions VALUES (?, ?)",
+                                         [(run_id, e["action"]) for e in rec.get("tail", [])])
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('offset', ?)", (end,))
+
+    def find(self, scenario: Optional[str] = None, status: Optional[str] = None,
+             action: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Runs whose scenario JSON contains ``scenario``, with ``status`` and/or that used ``action``.
+
+        ``status`` is a final-plan status, or "running" for runs without an end
+        record (in progress or crashed, i.e. resumable).
+        """
+        sql, args = "SELECT run_id, started, scenario, status, steps FROM runs WHERE 1 = 1", []
+        if scenario:
+            sql += " AND scenario LIKE ?"
+            args.append(f"%{scenario}%")
+        if status:
+            sql += " AND status = ?"
+            args.append(status)
+        if action:
+            sql += " AND run_id IN (SELECT run_id FROM actions WHERE action = ?)"
+            args.append(action)
+        sql += " ORDER BY started DESC LIMIT ?"
+        args.append(limit)
+        return [{"run_id": r[0], "started": r[1], "scenario": json.loads(r[2]), "status": r[3], "steps": r[4]}
+                for r in self._db.execute(sql, args)]
+
+    def load_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Everything journaled for one run, with ``pending`` set to an LLM decision whose tools never completed."""
+        offsets = [r[0] for r in self._db.execute("SELECT offset FROM records WHERE run_id = ? ORDER BY offset",
+                                                  (run_id,))]
+        if not offsets:
+            return None
+        run: Dict[str, Any] = {"run_id": run_id, "scenario": None, "steps": [], "pending": None,
+                               "final_plan": None, "metrics": None}
+        with open(self.journal_path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                rec = json.loads(f.readline())
+                kind = rec["type"]
+                if kind == "run_start":
+                    run["scenario"] = rec["scenario"]
+                elif kind == "decision":
+                    run["pending"] = rec
+                elif kind == "step":
+                    run["steps"].append(rec)
+                    if run["pending"] and rec["entries"] and rec["entries"][0]["step"] == run["pending"]["step"]:
+                        run["pending"] = None
+                elif kind == "run_end":
+                    run.update(final_plan=rec["final_plan"], metrics=rec["metrics"], tail=rec.get("tail", []),
+                               pending=None)
+        return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a Synapse run journal")
+    parser.add_argument("journal", help="Journal file written by SynapseAgent(journal=RunJournal(path))")
+    parser.add_argument("--run", help="Print every record of one run")
+    parser.add_argument("--scenario", help="Substring of the scenario JSON (description, ids, ...)")
+    parser.add_argument("--status", help="complete, escalated, incomplete or running")
+    parser.add_argument("--action", help="Runs that used this action")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    index = JournalIndex(args.journal)
+    if args.run:
+        print(json.dumps(index.load_run(args.run), indent=2))
+        return
+    for run in index.find(args.scenario, args.status, args.action, args.limit):
+        print(json.dumps(run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+from typing import Any, Dict, List, Optional
+
+# Optional LangChain integration. Nothing in the agent imports this module;
+# it needs ``langchain-core`` installed, which the agent itself does not.
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class SynapseChatModel(BaseChatModel):
+    """LangChain chat model over any Synapse LLM (GroqLLM, ModelRouter, MockLLM, ...).
+
+    Replies are the validated JSON action text; the backend's meta (retries,
+    cache hit, token usage) is returned as the message's response_metadata.
+    """
+
+    llm: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "synapse"
+
+    def _result(self, text: str, meta: Dict[str, Any]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, response_metadata=meta))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        meta: Dict[str, Any] = {}
+        return self._result(self.llm.generate_json(messages, meta=meta), meta)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        meta: Dict[str, Any] = {}
+        return self._result(await self.llm.agenerate_json(messages, meta=meta), meta)
+
+
+def as_chat_model(llm: Any) -> SynapseChatModel:
+    return SynapseChatModel(llm=llm)
@@ -1,58 +1,310 @@
 import os   
 import json       
 import re
-from typing import Any, Dict, List, Tuple
-from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain.schema import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain.chat_models.base import BaseChatModel
-from pydantic import PrivateAttr
-from groq import Groq
-from simulator import tools
-from .prompts import SYSTEM_PROMPT, FEW_SHOT_EXAMPLES
-
-load_dotenv()
-
-
-# Custom LangChain chat model for Groq
-class LangChainGroqLLM(BaseChatModel):
-    _client: Groq = PrivateAttr()
-    _model: str = PrivateAttr()
-    _temperature: float = PrivateAttr()
-
-    def __init__(self, model="llama-3.1-8b-instant", temperature=0, **kwargs):
-        super().__init__(**kwargs)
-        api_key = os.getenv("GROQ_API_KEY")
+import asyncio
+import contextvars
+import inspect
+import math
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from .history import MessageHistory, estimate_tokens
+from .journal import RunJournal
+from .llm_cache import make_cache_key
+from .messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, to_provider_message
+from .metrics import MetricsHook
+from .playbooks import PolicyEngine
+from .resilience import (CircuitBreaker, Deadline, DeadlineExceeded, ProviderUnavailableError, RateLimiter,
+                         RetryPolicy, acall_with_retries, call_with_retries)
+from .streaming import JsonObjectScanner
+from .tool_registry import DEFAULT_REGISTRY, ToolRegistry
+from .prompts import (SYSTEM_PROMPT, JSON_REPAIR_PROMPT, THOUGHT_RULES, ExampleStore, example_messages,
+                      prompt_prefix, render_scenario)
+from simulator.world import seeded_run
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq, BadRequestError, Groq
+
+# The Groq SDK (and httpx under it) is imported on first use, not at import
+# time, so the CLI, workers and MockLLM runs start without it; see
+# benchmarks/bench_startup.py for the budget.
+
+# Completion budget charged to the tokens/min bucket up front; settled against real usage
+EXPECTED_COMPLETION_TOKENS = 256
+
+_ROLE_TO_MESSAGE = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+
+
+@lru_cache(maxsize=None)
+def _prefix_messages(multi_action: bool = False, tool_schema: Optional[str] = None,
+                     thought: str = "full", examples: bool = True) -> Tuple[BaseMessage, ...]:
+    # Built once and shared by every run; the message objects are never mutated
+    return tuple(_ROLE_TO_MESSAGE[role](content=content)
+                 for role, content in prompt_prefix(multi_action, tool_schema, thought, examples))
+
+
+# One keep-alive connection pool per (API key, pool size), shared by every
+# GroqLLM in the process instead of a new client per instance.
+_SHARED_CLIENTS: Dict[Tuple[str, int], Tuple["Groq", "AsyncGroq"]] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+def get_shared_clients(api_key: str, pool_size: int = 64) -> Tuple["Groq", "AsyncGroq"]:
+    key = (api_key, pool_size)
+    with _SHARED_CLIENTS_LOCK:
+        if key not in _SHARED_CLIENTS:
+            import httpx
+            from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                  keepalive_expiry=60)
+            # SDK retries are off: backoff, rate limits and the circuit breaker
+            # live in agent/resilience.py so they can see deadlines and 429s.
+            _SHARED_CLIENTS[key] = (
+                Groq(api_key=api_key, max_retries=0, http_client=DefaultHttpxClient(limits=limits)),
+                AsyncGroq(api_key=api_key, max_retries=0, http_client=DefaultAsyncHttpxClient(limits=limits)),
+            )
+        return _SHARED_CLIENTS[key]
+
+
+def _reset_shared_clients_after_fork() -> None:
+    # Forked workers must not reuse the parent's sockets or a lock held mid-fork
+    global _SHARED_CLIENTS_LOCK
+    _SHARED_CLIENTS.clear()
+    _SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shared_clients_after_fork)
+
+
+def _repair_json(text: str) -> Optional[str]:
+    # Cheap local fix-ups tried before paying for a second LLM call; returns
+    # valid JSON text or None. Only fixes that cannot change the meaning: code
+    # fences and trailing commas. Truncated output (unclosed strings, numbers,
+    # objects) is never completed -- '{"amount": 1' may have been 150.
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    out, in_string, escaped = [], False, False
+    for n, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "," and text[n + 1:].lstrip()[:1] in ("}", "]"):
+            continue
+        out.append(ch)
+    candidate = "".join(out)
+    try:
+        json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    return candidate
+
+
+def _failed_generation(exc: "BadRequestError") -> Optional[str]:
+    # In JSON mode Groq rejects unparsable replies with 400 json_validate_failed
+    # but still returns the text, which is often one repair away from valid
+    body = exc.body if isinstance(exc.body, dict) else {}
+    error = body.get("error", body)
+    if isinstance(error, dict) and error.get("code") == "json_validate_failed":
+        return error.get("failed_generation") or ""
+    return None
+
+
+def _parse_arguments(arguments: Optional[str]) -> Any:
+    try:
+        return json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return arguments
+
+
+def _completion_text(message) -> str:
+    # Tool-calling replies carry the action in tool_calls; fold them back into
+    # the JSON action protocol the agent loop (and history) already speaks
+    calls = getattr(message, "tool_calls", None)
+    if not calls:
+        return message.content
+    actions = [{"action": c.function.name, "action_input": _parse_arguments(c.function.arguments)}
+               for c in calls]
+    out: Dict[str, Any] = {"thought": message.content} if message.content else {}
+    if len(actions) == 1:
+        out.update(actions[0])
+    else:
+        out["actions"] = actions
+    return json.dumps(out)
+
+
+def _usage_dict(response) -> Optional[Dict[str, int]]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+
+def _stream_usage(chunk) -> Optional[Dict[str, int]]:
+    # Groq reports usage on the final chunk only, under ``x_groq``
+    holder = getattr(chunk, "x_groq", None) or chunk
+    return _usage_dict(holder)
+
+
+def _add_usage(meta: Dict, usage: Optional[Dict[str, int]]) -> None:
+    if not usage:
+        return
+    total = meta.setdefault("usage", {"prompt_tokens": 0, "completion_tokens": 0})
+    for k in total:
+        total[k] += usage.get(k) or 0
+
+
+def _api_key_from_dotenv() -> Optional[str]:
+    # .env is only read when a Groq model is built without the key in the environment
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return None
+    load_dotenv()
+    return os.getenv("GROQ_API_KEY")
+
+
+class GroqLLM:
+    """Groq chat completions behind the generate_json / agenerate_json protocol.
+
+    A plain class: LangChain is not needed to run the agent. Wrap it with
+    agent.langchain_adapter.as_chat_model() to use it inside LangChain.
+    """
+
+    def __init__(self, model="llama-3.1-8b-instant", temperature=0, cache=None, streaming=False,
+                 pool_size=64, rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 request_timeout: Optional[float] = 30.0, structured: Optional[str] = None,
+                 tool_registry: Optional[ToolRegistry] = None, cache_sampled: bool = False):
+        api_key = os.getenv("GROQ_API_KEY") or _api_key_from_dotenv()
         if not api_key:
             raise ValueError("GROQ_API_KEY is not set in .env file")
-        self._client = Groq(api_key=api_key)
+        self._client, self._aclient = get_shared_clients(api_key, pool_size)
         self._model = model
         self._temperature = temperature
+        # Optional response cache (agent.llm_cache.LRUCache / SQLiteCache). With
+        # temperature > 0 replies are samples, so they are only cached when
+        # ``cache_sampled`` opts in to replaying one sample
+        self._cache = cache
+        self._cache_sampled = cache_sampled
+        # Stream completions and stop reading once the action object is complete
+        self._streaming = streaming
+        # Client-side rpm/tpm limits (share one RateLimiter per API key), 429/5xx
+        # backoff, and a breaker that fails fast while the provider is down
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._breaker = circuit_breaker or CircuitBreaker()
+        self._request_timeout = request_timeout
+        # Structured output: "json" uses Groq's JSON mode, "tools" its tool-calling
+        # API with definitions generated from the tool registry
+        if structured not in (None, "json", "tools"):
+            raise ValueError(f"structured must be None, 'json' or 'tools', got {structured!r}")
+        if structured == "tools" and streaming:
+            raise ValueError("streaming is not supported with structured='tools'")
+        self._structured = structured
+        self._tool_definitions = None
+        if structured == "tools":
+            self._tool_definitions = (tool_registry or DEFAULT_REGISTRY).tool_definitions()
+
+    def _to_groq_messages(self, messages: list) -> List[Dict[str, str]]:
+        # Message objects (agent.messages or LangChain's) or dicts to Groq format
+        return [m for m in map(to_provider_message, messages) if m is not None]
+
+    def _request(self, messages: list) -> Tuple[Dict[str, Any], int]:
+        # Shared create() kwargs plus the token estimate charged to the tpm bucket
+        groq_messages = self._to_groq_messages(messages)
+        estimated = sum(estimate_tokens(m["content"]) for m in groq_messages) + EXPECTED_COMPLETION_TOKENS
+        request = {"model": self._model, "messages": groq_messages, "temperature": self._temperature}
+        if self._structured == "json":
+            request["response_format"] = {"type": "json_object"}
+        elif self._structured == "tools":
+            request.update(tools=self._tool_definitions, tool_choice="required")
+        return request, estimated
+
+    def _resilience(self, deadline: Optional[Deadline], estimated: int) -> Dict[str, Any]:
+        return {"policy": self._retry_policy, "breaker": self._breaker, "limiter": self._rate_limiter,
+                "deadline": deadline, "timeout": self._request_timeout, "tokens": estimated}
+
+    def _settle_usage(self, estimated: int, usage: Optional[Dict[str, int]]) -> None:
+        if self._rate_limiter is not None and usage:
+            self._rate_limiter.settle(estimated, usage["prompt_tokens"] + usage["completion_tokens"])
 
-    def _generate(self, messages: list, **kwargs):
-        # Convert LangChain message objects to Groq format
-        groq_messages = []
-        for m in messages:
-            if isinstance(m, SystemMessage):
-                groq_messages.append({"role": "system", "content": m.content})
-            elif isinstance(m, HumanMessage):
-                groq_messages.append({"role": "user", "content": m.content})
-            elif isinstance(m, AIMessage):
-                groq_messages.append({"role": "assistant", "content": m.content})
+    def _response_message(self, response, estimated: int, retries: int) -> AIMessage:
+        usage = _usage_dict(response)
+        self._settle_usage(estimated, usage)
+        content = _completion_text(response.choices[0].message)
+        return AIMessage(content=content, response_metadata={"token_usage": usage, "retries": retries})
 
+    def _generate(self, messages: list, deadline: Optional[Deadline] = None, **kwargs):
         # Call Groq API
-        response = self._client.chat.completions.create(
-            model=self._model,
-            messages=groq_messages,
-            temperature=self._temperature
-        )
+        request, estimated = self._request(messages)
+        response, retries = call_with_retries(
+            lambda timeout: self._client.chat.completions.create(timeout=timeout, **request),
+            **self._resilience(deadline, estimated))
+        return self._response_message(response, estimated, retries)
 
-        content = response.choices[0].message.content
-        return AIMessage(content=content)
+    async def _agenerate(self, messages: list, deadline: Optional[Deadline] = None, **kwargs):
+        # Same request as _generate, but awaits the HTTP call so the event loop can
+        # interleave other scenario runs while this one waits on Groq.
+        request, estimated = self._request(messages)
+        response, retries = await acall_with_retries(
+            lambda timeout: self._aclient.chat.completions.create(timeout=timeout, **request),
+            **self._resilience(deadline, estimated))
+        return self._response_message(response, estimated, retries)
 
-    @property
-    def _llm_type(self) -> str:
-        return "groq-chat"
+    def _stream_completion(self, messages: list, on_thought=None,
+                           deadline: Optional[Deadline] = None) -> Tuple[str, Optional[Dict[str, int]], int]:
+        # Only opening the stream is retried; a failure mid-stream propagates.
+        # Returns (text, usage, retries); usage is None when the stream was cut
+        # short before the provider's final chunk, which carries it.
+        request, estimated = self._request(messages)
+        stream, retries = call_with_retries(
+            lambda timeout: self._client.chat.completions.create(timeout=timeout, stream=True, **request),
+            **self._resilience(deadline, estimated))
+        scanner = JsonObjectScanner(on_thought)
+        usage = None
+        try:
+            for chunk in stream:
+                usage = _stream_usage(chunk) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                # Stop reading trailing tokens once the top-level object has closed
+                if delta and scanner.feed(delta) is not None:
+                    break
+        finally:
+            stream.close()
+        self._settle_usage(estimated, usage)
+        return scanner.result() or scanner.text, usage, retries
+
+    async def _astream_completion(self, messages: list, on_thought=None,
+                                  deadline: Optional[Deadline] = None) -> Tuple[str, Optional[Dict[str, int]], int]:
+        request, estimated = self._request(messages)
+        stream, retries = await acall_with_retries(
+            lambda timeout: self._aclient.chat.completions.create(timeout=timeout, stream=True, **request),
+            **self._resilience(deadline, estimated))
+        scanner = JsonObjectScanner(on_thought)
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = _stream_usage(chunk) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta and scanner.feed(delta) is not None:
+                    break
+        finally:
+            await stream.close()
+        self._settle_usage(estimated, usage)
+        return scanner.result() or scanner.text, usage, retries
 
     def _extract_json(self, text: str) -> str:
         text = re.sub(r"```(?:json)?", "", text).strip()
@@ -61,43 +313,502 @@ class LangChainGroqLLM(BaseChatModel):
             return match.group(0)
         return text
 
-    def generate_json(self, prompt: str) -> str:
+    def _valid_json(self, content: str) -> Optional[str]:
+        json_str = self._extract_json(content)
+        try:
+            json.loads(json_str)
+            return json_str
+        except json.JSONDecodeError:
+            return _repair_json(json_str)
+
+    def _json_request(self, messages) -> List[BaseMessage]:
+        # Accept either a full message list (system prompt first) or a bare
+        # prompt string, which keeps the old single-HumanMessage call shape.
+        if isinstance(messages, str):
+            return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=messages)]
+        return list(messages)
+
+    def _cache_lookup_key(self, messages: List[BaseMessage]) -> Optional[str]:
+        if self._cache is None or (self._temperature > 0 and not self._cache_sampled):
+            return None
+        return make_cache_key(self._model, self._temperature, self._to_groq_messages(messages),
+                              mode=self._structured, tools=self._tool_definitions)
+
+    def cache_stats(self) -> Optional[Dict[str, float]]:
+        return self._cache.stats() if self._cache is not None else None
+
+    def generate_json(self, messages, on_thought=None, meta: Optional[Dict] = None,
+                      deadline: Optional[Deadline] = None) -> str:
+        # ``meta``, if given, is filled with retries (``provider_retries`` of them
+        # 429/5xx/connection, the rest JSON re-asks), cache hit and token usage.
+        # Raises DeadlineExceeded / ProviderUnavailableError (see agent/resilience.py).
+        meta = {} if meta is None else meta
+        meta.update(retries=0, provider_retries=0, cached=False)
+        messages = self._json_request(messages)
+        cache_key = self._cache_lookup_key(messages)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                meta["cached"] = True
+                return cached
+        from groq import BadRequestError  # already loaded by the client; kept out of import time
+
+        provider_retries = 0
         for attempt in range(2):
-            ai_message = self._generate([SystemMessage(content=SYSTEM_PROMPT),
-                                         HumanMessage(content=prompt)])
-            json_str = self._extract_json(ai_message.content)
-            try:
-                json.loads(json_str)
+            meta["retries"] = attempt + provider_retries
+            if self._streaming:
+                content, usage, retries = self._stream_completion(messages, on_thought, deadline)
+                provider_retries += retries
+                meta.update(retries=attempt + provider_retries, provider_retries=provider_retries)
+                if usage is None:
+                    meta["usage_unavailable"] = True
+                _add_usage(meta, usage)
+            else:
+                try:
+                    ai_message = self._generate(messages, deadline=deadline)
+                except BadRequestError as e:
+                    content = _failed_generation(e)
+                    if content is None:
+                        raise
+                else:
+                    _add_usage(meta, ai_message.response_metadata.get("token_usage"))
+                    provider_retries += ai_message.response_metadata.get("retries", 0)
+                    meta.update(retries=attempt + provider_retries, provider_retries=provider_retries)
+                    content = ai_message.content
+            json_str = self._valid_json(content)
+            if json_str is not None:
+                # Only validated JSON is ever written back to the cache
+                if cache_key is not None:
+                    self._cache.set(cache_key, json_str)
                 return json_str
-            except json.JSONDecodeError:
-                if attempt == 0:
-                    prompt += "\nIMPORTANT: Respond ONLY with valid JSON per schema."
+            if attempt == 0:
+                messages = messages + [HumanMessage(content=JSON_REPAIR_PROMPT)]
+            else:
+                raise ValueError(f"Groq LLM output is not valid JSON after retries: {content}")
+
+    async def agenerate_json(self, messages, on_thought=None, meta: Optional[Dict] = None,
+                        deadline: Optional[Deadline] = None) -> str:
+        # ``meta``, if given, is filled with retries (``provider_retries`` of them
+        # 429/5xx/connection, the rest JSON re-asks), cache hit and token usage.
+        # Raises DeadlineExceeded / ProviderUnavailableError (see agent/resilience.py).
+        meta = {} if meta is None else meta
+        meta.update(retries=0, provider_retries=0, cached=False)
+        messages = self._json_request(messages)
+        cache_key = self._cache_lookup_key(messages)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                meta["cached"] = True
+                return cached
+        from groq import BadRequestError  # already loaded by the client; kept out of import time
+
+        provider_retries = 0
+        for attempt in range(2):
+            meta["retries"] = attempt + provider_retries
+            if self._streaming:
+                content, usage, retries = await self._astream_completion(messages, on_thought, deadline)
+                provider_retries += retries
+                meta.update(retries=attempt + provider_retries, provider_retries=provider_retries)
+                if usage is None:
+                    meta["usage_unavailable"] = True
+                _add_usage(meta, usage)
+            else:
+                try:
+                    ai_message = await self._agenerate(messages, deadline=deadline)
+                except BadRequestError as e:
+                    content = _failed_generation(e)
+                    if content is None:
+                        raise
                 else:
-                    raise ValueError(f"Groq LLM output is not valid JSON after retries: {ai_message.content}")
+                    _add_usage(meta, ai_message.response_metadata.get("token_usage"))
+                    provider_retries += ai_message.response_metadata.get("retries", 0)
+                    meta.update(retries=attempt + provider_retries, provider_retries=provider_retries)
+                    content = ai_message.content
+            json_str = self._valid_json(content)
+            if json_str is not None:
+                # Only validated JSON is ever written back to the cache
+                if cache_key is not None:
+                    self._cache.set(cache_key, json_str)
+                return json_str
+            if attempt == 0:
+                messages = messages + [HumanMessage(content=JSON_REPAIR_PROMPT)]
+            else:
+                raise ValueError(f"Groq LLM output is not valid JSON after retries: {content}")
+
+
+# Former name, from when the Groq model subclassed LangChain's BaseChatModel
+LangChainGroqLLM = GroqLLM
+
+
+class _LatencyWindow:
+    # Rolling window of recent latencies (ms) with nearest-rank quantiles
+    def __init__(self, size: int = 512):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class ModelRouter:
+    """Routes each step to a fast or a strong backend, hedging slow calls.
+
+    Backends are anything with ``generate_json``/``agenerate_json`` (Groq, MockLLM,
+    test fakes). Every step goes to ``fast`` first; when it answers with a
+    decision (finish / ask_human) or unparsable output, ``strong`` is asked for
+    that step instead. If a call has not answered after the backend's recent
+    p95 latency, a second identical request is sent and the first success wins.
+    At most ``max_inflight_hedges`` hedges run at once, and a call that finds
+    the hedge pool full runs unhedged on the caller's thread instead of
+    queueing, so load alone never triggers hedges.
+    """
+
+    DECISION_ACTIONS = ("finish", "ask_human")
+
+    def __init__(self, fast, strong=None, hedge: bool = True, hedge_quantile: float = 95,
+                 hedge_min_samples: int = 20, hedge_after_s: Optional[float] = None,
+                 latency_window: int = 512, max_hedge_threads: int = 32, max_inflight_hedges: int = 4):
+        self.backends = {"fast": fast, "strong": strong} if strong is not None else {"fast": fast}
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        # Hedging starts once a backend has this many samples, unless a fixed delay is given
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_after_s = hedge_after_s
+        self._primary_ms = {role: _LatencyWindow(latency_window) for role in self.backends}
+        # Latency the caller saw vs. what the first request alone took (the unhedged baseline)
+        self._observed_ms = _LatencyWindow(latency_window)
+        self._unhedged_ms = _LatencyWindow(latency_window)
+        self._counts = {"fast": 0, "strong": 0, "escalated": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0}
+        self._lock = threading.Lock()
+        self.max_hedge_threads = max_hedge_threads
+        self.max_inflight_hedges = max_inflight_hedges
+        self._pool_busy = 0
+        self._inflight_hedges = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_hedge_threads) if hedge else None
+
+    @classmethod
+    def for_groq(cls, fast_model: str = "llama-3.1-8b-instant", strong_model: str = "llama-3.3-70b-versatile",
+                 router_kwargs: Optional[Dict[str, Any]] = None, **llm_kwargs) -> "ModelRouter":
+        return cls(GroqLLM(model=fast_model, **llm_kwargs),
+                   GroqLLM(model=strong_model, **llm_kwargs), **(router_kwargs or {}))
+
+    def _is_decision(self, text: str) -> bool:
+        try:
+            parsed = json.loads(text)
+        except (TypeError, ValueError):
+            return True
+        return not isinstance(parsed, dict) or parsed.get("action") in self.DECISION_ACTIONS
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _hedge_delay(self, role: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if self.hedge_after_s is not None:
+            return self.hedge_after_s
+        if len(self._primary_ms[role]) < self.hedge_min_samples:
+            return None
+        return self._primary_ms[role].quantile(self.hedge_quantile) / 1000
+
+    def _reserve_threads(self) -> bool:
+        # A primary and its possible hedge each need a free pool thread up front;
+        # queueing behind other calls would count the wait toward the hedge timer
+        with self._lock:
+            if self._pool_busy + 2 > self.max_hedge_threads:
+                return False
+            self._pool_busy += 2
+            return True
+
+    def _release_thread(self, _future=None) -> None:
+        with self._lock:
+            self._pool_busy -= 1
+
+    def _start_hedge(self) -> bool:
+        with self._lock:
+            if self._inflight_hedges >= self.max_inflight_hedges:
+                self._counts["hedges_skipped"] += 1
+                return False
+            self._inflight_hedges += 1
+            return True
+
+    def _hedge_done(self, _future=None) -> None:
+        with self._lock:
+            self._inflight_hedges -= 1
+
+    def _primary_done(self, role: str, start: float, meta: Dict, error: Optional[BaseException]) -> None:
+        # Cache hits would drag the hedge threshold towards zero, so skip them
+        if error is None and not meta.get("cached"):
+            ms = (time.perf_counter() - start) * 1000
+            self._primary_ms[role].add(ms)
+            self._unhedged_ms.add(ms)
+
+    def _finish_call(self, role: str, start: float, meta: Dict, winner_meta: Dict, hedged: bool,
+                     hedge_won: bool) -> None:
+        meta.update(winner_meta, route=role, hedged=hedged)
+        if not winner_meta.get("cached"):
+            self._observed_ms.add((time.perf_counter() - start) * 1000)
+        self._count(role)
+        if hedged:
+            self._count("hedged")
+        if hedge_won:
+            self._count("hedge_wins")
+
+    def _call(self, role: str, messages, meta: Dict, kwargs: Dict) -> str:
+        backend = self.backends[role]
+        delay = self._hedge_delay(role)
+        start = time.perf_counter()
+        primary_meta: Dict[str, Any] = {}
+        if delay is None or not self._reserve_threads():
+            try:
+                text = backend.generate_json(messages, meta=primary_meta, **kwargs)
+            except BaseException as e:
+                self._primary_done(role, start, primary_meta, e)
+                raise
+            self._primary_done(role, start, primary_meta, None)
+            self._finish_call(role, start, meta, primary_meta, False, False)
+            return text
+
+        started = threading.Event()
+
+        def run_primary():
+            started.set()
+            return backend.generate_json(messages, meta=primary_meta, **kwargs)
+
+        primary = self._pool.submit(run_primary)
+        primary.add_done_callback(lambda f: self._primary_done(role, start, primary_meta, f.exception()))
+        primary.add_done_callback(self._release_thread)
+        # The hedge timer runs from when the request is actually sent
+        started.wait()
+        if wait([primary], timeout=delay).done or not self._start_hedge():
+            self._release_thread()  # the hedge's thread is not needed
+            if primary.exception() is None:
+                self._finish_call(role, start, meta, primary_meta, False, False)
+            return primary.result()
+
+        # Only the first request streams thoughts to the caller
+        hedge_meta: Dict[str, Any] = {}
+        hedge_kwargs = {k: v for k, v in kwargs.items() if k != "on_thought"}
+        hedge = self._pool.submit(backend.generate_json, messages, meta=hedge_meta, **hedge_kwargs)
+        hedge.add_done_callback(self._release_thread)
+        hedge.add_done_callback(self._hedge_done)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next(iter([f for f in done if f.exception() is None]), None)
+            if winner is not None:
+                self._finish_call(role, start, meta, primary_meta if winner is primary else hedge_meta,
+                                  True, winner is hedge)
+                return winner.result()
+            if not pending:
+                return primary.result()  # both failed: raise the first request's error
+
+    async def _acall(self, role: str, messages, meta: Dict, kwargs: Dict) -> str:
+        backend = self.backends[role]
+        delay = self._hedge_delay(role)
+        start = time.perf_counter()
+        primary_meta: Dict[str, Any] = {}
+        primary = asyncio.ensure_future(backend.agenerate_json(messages, meta=primary_meta, **kwargs))
+        primary.add_done_callback(
+            lambda f: self._primary_done(role, start, primary_meta, None if f.cancelled() else f.exception()))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._start_hedge():
+            if not done:
+                await asyncio.wait({primary})
+            if primary.exception() is None:
+                self._finish_call(role, start, meta, primary_meta, False, False)
+            return primary.result()
+
+        hedge_meta: Dict[str, Any] = {}
+        hedge_kwargs = {k: v for k, v in kwargs.items() if k != "on_thought"}
+        hedge = asyncio.ensure_future(backend.agenerate_json(messages, meta=hedge_meta, **hedge_kwargs))
+        hedge.add_done_callback(self._hedge_done)
+        pending = {primary, hedge}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Check every finished request so no exception goes unretrieved
+            winner = next(iter([f for f in done if f.exception() is None]), None)
+            if winner is not None:
+                # A losing hedge is cancelled; the first request is left to finish
+                # so its latency still feeds the unhedged baseline
+                if hedge in pending:
+                    hedge.cancel()
+                self._finish_call(role, start, meta, primary_meta if winner is primary else hedge_meta,
+                                  True, winner is hedge)
+                return winner.result()
+            if not pending:
+                return primary.result()
+
+    def _merge_escalation(self, meta: Dict, draft_meta: Dict) -> None:
+        # The strong call's meta wins; retries and token usage add up over both calls
+        for key in ("retries", "provider_retries"):
+            meta[key] = meta.get(key, 0) + draft_meta.get(key, 0)
+        _add_usage(meta, draft_meta.get("usage"))
+        if draft_meta.get("usage_unavailable"):
+            meta["usage_unavailable"] = True
+        meta["escalated"] = True
+        self._count("escalated")
+
+    def generate_json(self, messages, on_thought=None, meta: Optional[Dict] = None, **kwargs) -> str:
+        meta = {} if meta is None else meta
+        if on_thought is not None:
+            kwargs["on_thought"] = on_thought
+        draft_meta: Dict[str, Any] = {}
+        text = self._call("fast", messages, draft_meta, kwargs)
+        if "strong" not in self.backends or not self._is_decision(text):
+            meta.update(draft_meta)
+            return text
+        text = self._call("strong", messages, meta, kwargs)
+        self._merge_escalation(meta, draft_meta)
+        return text
+
+    async def agenerate_json(self, messages, on_thought=None, meta: Optional[Dict] = None, **kwargs) -> str:
+        meta = {} if meta is None else meta
+        if on_thought is not None:
+            kwargs["on_thought"] = on_thought
+        draft_meta: Dict[str, Any] = {}
+        text = await self._acall("fast", messages, draft_meta, kwargs)
+        if "strong" not in self.backends or not self._is_decision(text):
+            meta.update(draft_meta)
+            return text
+        text = await self._acall("strong", messages, meta, kwargs)
+        self._merge_escalation(meta, draft_meta)
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counts and p50/p95/p99 of observed vs. unhedged step latency (ms)."""
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counts)
+        for name, window in (("observed_ms", self._observed_ms), ("unhedged_ms", self._unhedged_ms)):
+            out[name] = {f"p{q}": _round_ms(window.quantile(q)) for q in (50, 95, 99)}
+        observed, unhedged = out["observed_ms"]["p99"], out["unhedged_ms"]["p99"]
+        out["p99_saved_ms"] = round(unhedged - observed, 3) if observed is not None and unhedged is not None else None
+        out["hedge_after_ms"] = {role: _round_ms(None if d is None else d * 1000)
+                                 for role, d in ((r, self._hedge_delay(r)) for r in self.backends)}
+        return out
+
+
+def _round_ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+def _idle_step_metrics(tool_ms: float = 0.0) -> Dict[str, Any]:
+    # Metrics for a cot entry that did not come from an LLM call
+    return {"llm_ms": 0.0, "tool_ms": tool_ms, "retries": 0, "cached": False,
+            "prompt_tokens": None, "completion_tokens": None, "prompt_chars": 0}
+
+
+class RunContext:
+    """Per-run state, created by every run()/arun() call.
+
+    Keeping it out of SynapseAgent lets one long-lived agent serve many
+    concurrent runs without steps or loop counters leaking between them.
+    """
+
+    def __init__(self, scenario: Dict, history: MessageHistory, deadline: Optional[Deadline] = None,
+                 run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.scenario = scenario
+        self.history = history
+        self.chain_of_thought: List[Dict[str, Any]] = []
+        self.seen_actions: Dict[Tuple[str, str], int] = {}
+        self.recent_actions: List[str] = []
+        self.metrics: Dict[str, Any] = {"llm_calls": 0, "llm_ms": 0.0, "tool_calls": 0, "tool_ms": 0.0,
+                                        "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                        "llm_calls_without_usage": 0, "wall_ms": 0.0}
+        self.started = time.perf_counter()
+        # Steps already taken by a playbook before handing over to the LLM
+        self.step_offset = 0
+        # LLM iterations already spent (non-zero only for a resumed run)
+        self.iters_used = 0
+        # Number of cot entries already written to the run journal
+        self.journaled = 0
+        # Time budget for the whole run, handed to every LLM call
+        self.deadline = deadline
 
 
 class SynapseAgent:
-    def __init__(self, llm=None, max_iters: int = 8, repeat_limit: int = 2):
-        self.llm = llm or LangChainGroqLLM()
+    def __init__(self, llm=None, max_iters: int = 8, repeat_limit: int = 2,
+                 max_history_tokens: Optional[int] = None, tool_registry: Optional[ToolRegistry] = None,
+                 multi_action: bool = False, max_parallel_tools: int = 4,
+                 on_thought: Optional[Callable[[int, str], None]] = None,
+                 metrics_hooks: Optional[List[MetricsHook]] = None,
+                 policy_engine: Optional[PolicyEngine] = None, structured: bool = False,
+                 thought: str = "full", journal: Optional[RunJournal] = None, world_seed: Optional[int] = None,
+                 example_store: Optional[ExampleStore] = None, few_shot_k: int = 2):
+        if thought not in THOUGHT_RULES:
+            raise ValueError(f"thought must be one of {sorted(THOUGHT_RULES)}, got {thought!r}")
+        self.tools = tool_registry or DEFAULT_REGISTRY
+        # Structured mode: compact prompt with the tool schema generated from the
+        # registry, and (for the default model) Groq's JSON response format
+        self.structured = structured
+        self._tool_schema = self.tools.compact_schema() if structured else None
+        # "full", "brief" or "none": how much free-text reasoning the model writes per step
+        self.thought = thought
+        self.llm = llm or GroqLLM(structured="json" if structured else None)
+        # Multi-action mode lets the model batch independent read-only lookups
+        # into one step; they run concurrently and report back in one message.
+        self.multi_action = multi_action
+        self._tool_pool = ThreadPoolExecutor(max_workers=max_parallel_tools) if multi_action else None
+        # Called as on_thought(step, text) while a streaming LLM produces "thought"
+        self.on_thought = on_thought
+        # Receive per-step LLM/tool timings (see agent/metrics.py)
+        self.metrics_hooks = list(metrics_hooks or [])
+        # Deterministic playbooks tried before the LLM loop (agent/playbooks.py)
+        self.policy_engine = policy_engine
+        # Append-only record of every step (agent/journal.py); enables resume()
+        self.journal = journal
+        # Seeds the simulator's per-run RNG from (world_seed, scenario), so a
+        # run's tool results do not depend on what else runs concurrently
+        self.world_seed = world_seed
+        # With a store, only the few_shot_k examples most similar to the
+        # scenario are sent instead of every FEW_SHOT_EXAMPLES entry
+        self.example_store = example_store
+        self.few_shot_k = few_shot_k
         self.max_iters = max_iters
         self.repeat_limit = repeat_limit
-        self.chain_of_thought: List[Dict[str, Any]] = []
-        self.seen_actions: Dict[Tuple[str, str], int] = {}
+        # Token budget for the running conversation; old observations are
+        # summarized once it is exceeded (None = unlimited).
+        self.max_history_tokens = max_history_tokens
 
-    def build_prompt(self, scenario: Dict) -> str:
-        p = SYSTEM_PROMPT + "\n\n" + "Scenario: " + scenario.get("description", "") + "\n"
-        for ex in FEW_SHOT_EXAMPLES:
-            p += "USER: " + ex["user"] + "\n"
-            p += "ASSISTANT: " + json.dumps(ex["assistant"]) + "\n"
-            p += "TOOL_OBSERVATION: " + json.dumps(ex["tool_observation"]) + "\n"
-            p += "ASSISTANT_NEXT: " + json.dumps(ex["assistant_next"]) + "\n"
-        return p
+    def build_messages(self, scenario: Dict) -> MessageHistory:
+        prefix = list(_prefix_messages(self.multi_action, self._tool_schema, self.thought,
+                                       self.example_store is None))
+        if self.example_store is not None:
+            # Retrieved examples follow the system prompt, which stays a byte-identical cacheable prefix
+            for ex in self.example_store.select(scenario.get("description", ""), self.few_shot_k):
+                prefix.extend(_ROLE_TO_MESSAGE[role](content=content)
+                              for role, content in example_messages(ex, self.thought))
+        prefix.append(HumanMessage(content=render_scenario(scenario)))
+        return MessageHistory(prefix, max_tokens=self.max_history_tokens)
 
     def parse_response(self, llm_text: str) -> Dict:
         try:
             parsed = json.loads(llm_text)
-            if not all(k in parsed for k in ("thought", "action", "action_input")):
+            if self.multi_action and isinstance(parsed.get("actions"), list) and parsed["actions"]:
+                if not all(isinstance(a, dict) and "action" in a and "action_input" in a
+                           for a in parsed["actions"]):
+                    raise ValueError("Invalid keys in LLM response")
+                if len(parsed["actions"]) == 1:
+                    parsed.update(parsed.pop("actions")[0])
+                parsed.setdefault("thought", "")
+                return parsed
+            # "thought" is optional (thought="none" asks the model to leave it out)
+            if not all(k in parsed for k in ("action", "action_input")):
                 raise ValueError("Invalid keys in LLM response")
+            parsed.setdefault("thought", "")
             return parsed
         except Exception:
             return {
@@ -106,90 +817,544 @@ class SynapseAgent:
                 "action_input": {"reason": "invalid LLM output", "raw": llm_text}
             }
 
+    def _llm_kwargs(self, ctx: RunContext, i: int) -> Dict[str, Any]:
+        # Only streaming-capable models take on_thought, and only runs with a
+        # deadline pass one; plain/fake LLMs never see either
+        kwargs: Dict[str, Any] = {}
+        if self.on_thought is not None:
+            kwargs["on_thought"] = lambda text: self.on_thought(i + 1, text)
+        if ctx.deadline is not None:
+            kwargs["deadline"] = ctx.deadline
+        return kwargs
+
     def call_tool(self, action: str, action_input: Dict) -> Dict:
-        mapping = {
-            "check_traffic": tools.check_traffic,
-            "get_merchant_status": tools.get_merchant_status,
-            "get_nearby_merchants": tools.get_nearby_merchants,
-            "re_route_driver": tools.re_route_driver,
-            "notify_customer": tools.notify_customer,
-            "initiate_mediation_flow": tools.initiate_mediation_flow,
-            "collect_evidence": tools.collect_evidence,
-            "analyze_evidence": tools.analyze_evidence,
-            "issue_instant_refund": tools.issue_instant_refund,
-            "exonerate_driver": tools.exonerate_driver,
-            "log_merchant_packaging_feedback": tools.log_merchant_packaging_feedback,
-            "contact_recipient_via_chat": tools.contact_recipient_via_chat,
-            "find_nearby_locker": tools.find_nearby_locker,
+        return self.tools.call(action, action_input)
+
+    async def acall_tool(self, action: str, action_input: Dict) -> Dict:
+        # Simulator tools are plain functions; run them off the event loop so a slow
+        # backend does not stall other runs. Coroutine tools are awaited in place.
+        result = await asyncio.to_thread(self.call_tool, action, action_input)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _normalize_action(self, action_name: str) -> str:
+        action_name = action_name.strip()
+        if "| finish" in action_name.lower() or "|finish" in action_name.lower():
+            action_name = "finish"
+        return action_name
+
+    def _parse_step(self, llm_text: str) -> Dict:
+        parsed = self.parse_response(llm_text)
+        if "actions" in parsed:
+            for a in parsed["actions"]:
+                a["action"] = self._normalize_action(str(a.get("action", "")))
+            return parsed
+
+        parsed["action"] = self._normalize_action(parsed.get("action", ""))
+        return parsed
+
+    def _begin_batch(self, ctx: RunContext, i: int, parsed: Dict) -> Tuple[List[Dict], Dict]:
+        # Multi-action step: every (action, input) pair counts toward the repeat
+        # limit, but the whole batch is one iteration and one entry in recent_actions.
+        names = []
+        for a in parsed["actions"]:
+            action_key = (a["action"], json.dumps(a.get("action_input"), sort_keys=True))
+            ctx.seen_actions[action_key] = ctx.seen_actions.get(action_key, 0) + 1
+            if ctx.seen_actions[action_key] > self.repeat_limit:
+                return [], {"status": "incomplete", "reason": "repeated_action_loop"}
+            names.append(a["action"])
+
+        batch_name = "batch:" + "+".join(sorted(names))
+        ctx.recent_actions.append(batch_name)
+        if len(ctx.recent_actions) >= 3 and all(a == batch_name for a in ctx.recent_actions[-3:]):
+            return [], {"status": "incomplete", "reason": "repeated_action_loop"}
+
+        cot_entries = [{
+            "step": i + 1,
+            "thought": parsed.get("thought"),
+            "action": a["action"],
+            "action_input": a.get("action_input"),
+            "observation": None
+        } for a in parsed["actions"]]
+        return cot_entries, None
+
+    def _batch_error(self, action: str) -> Optional[Dict]:
+        if not self.tools.is_read_only(action):
+            return {"error": "not_batchable", "detail": "issue side-effecting tools, finish and ask_human as a single action"}
+        return None
+
+    def _call_batched(self, cot_entry: Dict) -> Dict:
+        return self._batch_error(cot_entry["action"]) or self.call_tool(cot_entry["action"], cot_entry["action_input"])
+
+    async def _acall_batched(self, cot_entry: Dict) -> Dict:
+        error = self._batch_error(cot_entry["action"])
+        if error:
+            return error
+        return await self.acall_tool(cot_entry["action"], cot_entry["action_input"])
+
+    def _record_batch(self, ctx: RunContext, llm_text: str, cot_entries: List[Dict],
+                      observations: List[Dict]) -> None:
+        for cot_entry, obs in zip(cot_entries, observations):
+            cot_entry["observation"] = obs
+            ctx.chain_of_thought.append(cot_entry)
+            ctx.metrics["tool_calls"] += 1
+            ctx.metrics["tool_ms"] += cot_entry["metrics"]["tool_ms"]
+        ctx.history.append_results(llm_text, [{"action": e["action"], "result": e["observation"]}
+                                          for e in cot_entries])
+        self._journal_step(ctx, "llm", llm_text, batch=True)
+
+    def _begin_step(self, ctx: RunContext, i: int, parsed: Dict) -> Tuple[Dict, Dict]:
+        # Loop detection + terminal actions; returns (cot_entry, final_plan or None)
+        action_name = parsed["action"]
+        action_key = (action_name, json.dumps(parsed.get("action_input"), sort_keys=True))
+        ctx.seen_actions[action_key] = ctx.seen_actions.get(action_key, 0) + 1
+        ctx.recent_actions.append(action_name)
+
+        if ctx.seen_actions[action_key] > self.repeat_limit or (
+            len(ctx.recent_actions) >= 3 and all(a == action_name for a in ctx.recent_actions[-3:])
+        ):
+            return None, {"status": "incomplete", "reason": "repeated_action_loop"}
+
+        cot_entry = {
+            "step": i + 1,
+            "thought": parsed.get("thought"),
+            "action": action_name,
+            "action_input": parsed.get("action_input"),
+            "observation": None
         }
-        func = mapping.get(action)
-        if not func:
-            return {"error": "unknown_action"}
-        try:
-            if isinstance(action_input, dict):
-                return func(**action_input)
+
+        if action_name == "finish":
+            final_plan_text = parsed.get("action_input", {}).get("final_plan", "").strip()
+            if not final_plan_text:
+                final_plan_text = "Final plan generated but was empty — please check scenario setup."
+            ctx.chain_of_thought.append(cot_entry)
+            return cot_entry, {"status": "complete", "final_plan": final_plan_text}
+
+        if action_name == "ask_human":
+            cot_entry["observation"] = {"escalated": True, "reason": parsed.get("action_input")}
+            ctx.chain_of_thought.append(cot_entry)
+            return cot_entry, {"status": "escalated", "reason": parsed.get("action_input")}
+
+        return cot_entry, None
+
+    def _record_observation(self, ctx: RunContext, llm_text: str, cot_entry: Dict, obs: Dict,
+                            kind: str = "llm") -> None:
+        cot_entry["observation"] = obs
+        ctx.chain_of_thought.append(cot_entry)
+        ctx.metrics["tool_calls"] += 1
+        ctx.metrics["tool_ms"] += cot_entry["metrics"]["tool_ms"]
+        ctx.history.append_step(llm_text, cot_entry["action"], obs)
+        self._journal_step(ctx, kind, llm_text, batch=False)
+
+    def _journal_decision(self, ctx: RunContext, i: int, llm_text: str, step_metrics: Dict,
+                          kind: str = "llm") -> None:
+        # Written before any tool runs, so a resumed run never asks the LLM again
+        if self.journal is not None:
+            self.journal.append({"type": "decision", "run_id": ctx.run_id, "step": i + 1, "kind": kind,
+                                 "llm_text": llm_text, "step_metrics": dict(step_metrics),
+                                 "metrics": dict(ctx.metrics)})
+
+    def _must_sync_journal(self, action: str) -> bool:
+        # A side effect may only run once its decision is on disk: if the process
+        # dies mid-call, resume() then reports it instead of asking the LLM again
+        return self.journal is not None and not self.tools.is_read_only(action)
+
+    def _journal_step(self, ctx: RunContext, kind: str, llm_text: str, batch: bool) -> None:
+        if self.journal is None:
+            return
+        entries = [dict(e) for e in ctx.chain_of_thought[ctx.journaled:]]
+        ctx.journaled = len(ctx.chain_of_thought)
+        self.journal.append({"type": "step", "run_id": ctx.run_id, "kind": kind, "batch": batch,
+                             "llm_text": llm_text, "entries": entries, "metrics": dict(ctx.metrics)})
+
+    def _llm_step_metrics(self, ctx: RunContext, i: int, messages: List[BaseMessage], meta: Dict,
+                          elapsed: float) -> Dict[str, Any]:
+        usage = meta.get("usage") or {}
+        step_metrics = {
+            "llm_ms": round(elapsed * 1000, 3),
+            "tool_ms": 0.0,
+            "retries": meta.get("retries", 0),
+            "cached": meta.get("cached", False),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "prompt_chars": sum(len(m.content) for m in messages),
+        }
+        if "provider_retries" in meta:
+            step_metrics["provider_retries"] = meta["provider_retries"]
+        if "route" in meta:
+            # Set by ModelRouter: which backend answered and whether it was hedged
+            step_metrics.update(route=meta["route"], hedged=meta.get("hedged", False))
+        ctx.metrics["llm_calls"] += 1
+        ctx.metrics["llm_ms"] += step_metrics["llm_ms"]
+        ctx.metrics["retries"] += step_metrics["retries"]
+        ctx.metrics["prompt_tokens"] += step_metrics["prompt_tokens"] or 0
+        ctx.metrics["completion_tokens"] += step_metrics["completion_tokens"] or 0
+        if meta.get("usage_unavailable"):
+            # e.g. a stream cut short before its usage chunk: the token totals are a lower bound
+            ctx.metrics["llm_calls_without_usage"] += 1
+        for hook in self.metrics_hooks:
+            hook.on_llm_call(i + 1, step_metrics)
+        return step_metrics
+
+    def _attach_metrics(self, cot_entries: List[Dict], step_metrics: Dict) -> None:
+        # In a batch the LLM cost belongs to the first entry only, so sums stay correct
+        for k, entry in enumerate(cot_entries):
+            if k == 0:
+                entry["metrics"] = step_metrics
             else:
-                return func(action_input)
-        except TypeError:
-            return func(action_input)
+                entry["metrics"] = dict(step_metrics, llm_ms=0.0, retries=0, prompt_tokens=None,
+                                        completion_tokens=None, batched=True)
 
-    def run(self, scenario: Dict) -> Dict:
-        prompt = self.build_prompt(scenario)
-        final_plan = None
-        recent_actions = []
+    def _observe_tool(self, cot_entry: Dict, elapsed: float) -> None:
+        duration_ms = round(elapsed * 1000, 3)
+        cot_entry["metrics"]["tool_ms"] = duration_ms
+        for hook in self.metrics_hooks:
+            hook.on_tool_call(cot_entry["step"], cot_entry["action"], duration_ms)
 
-        for i in range(self.max_iters):
-            llm_text = self.llm.generate_json(prompt)
-            parsed = self.parse_response(llm_text)
+    def _timed_call_batched(self, cot_entry: Dict) -> Dict:
+        start = time.perf_counter()
+        obs = self._call_batched(cot_entry)
+        self._observe_tool(cot_entry, time.perf_counter() - start)
+        return obs
 
-            action_name = parsed.get("action", "").strip()
-            if "| finish" in action_name.lower() or "|finish" in action_name.lower():
-                action_name = "finish"
-            parsed["action"] = action_name
+    async def _atimed_call_batched(self, cot_entry: Dict) -> Dict:
+        start = time.perf_counter()
+        obs = await self._acall_batched(cot_entry)
+        self._observe_tool(cot_entry, time.perf_counter() - start)
+        return obs
 
-            action_key = (action_name, json.dumps(parsed.get("action_input"), sort_keys=True))
-            self.seen_actions[action_key] = self.seen_actions.get(action_key, 0) + 1
-            recent_actions.append(action_name)
+    def _provider_escalation(self, ctx: RunContext, i: int, exc: Exception) -> Dict:
+        # Provider is unhealthy (circuit open / retries exhausted): take the
+        # ask_human path instead of failing the run
+        reason = {"reason": "llm_provider_unavailable", "detail": str(exc)}
+        ctx.chain_of_thought.append({
+            "step": i + 1,
+            "thought": "LLM provider unavailable, escalating to a human",
+            "action": "ask_human",
+            "action_input": reason,
+            "observation": {"escalated": True, "reason": reason},
+            "metrics": _idle_step_metrics(),
+        })
+        return {"status": "escalated", "reason": reason}
 
-            if self.seen_actions[action_key] > self.repeat_limit or (
-                len(recent_actions) >= 3 and all(a == action_name for a in recent_actions[-3:])
-            ):
-                final_plan = {"status": "incomplete", "reason": "repeated_action_loop"}
-                break
+    def _finish_run(self, ctx: RunContext, final_plan: Optional[Dict]) -> Dict:
+        if not final_plan:
+            final_plan = {"status": "incomplete", "reason": "max_iters_reached"}
+        run_metrics = ctx.metrics
+        run_metrics["llm_ms"] = round(run_metrics["llm_ms"], 3)
+        run_metrics["tool_ms"] = round(run_metrics["tool_ms"], 3)
+        run_metrics["wall_ms"] = round((time.perf_counter() - ctx.started) * 1000, 3)
+        for hook in self.metrics_hooks:
+            hook.on_run_end(final_plan, run_metrics)
+        result = {"cot": ctx.chain_of_thought, "final_plan": final_plan, "metrics": run_metrics}
+        if self.journal is not None:
+            self.journal.append({"type": "run_end", "run_id": ctx.run_id, "ts": time.time(),
+                                 "final_plan": final_plan, "metrics": dict(run_metrics),
+                                 "tail": [dict(e) for e in ctx.chain_of_thought[ctx.journaled:]]})
+            result["run_id"] = ctx.run_id
+        return result
 
-            cot_entry = {
-                "step": i + 1,
-                "thought": parsed.get("thought"),
-                "action": action_name,
-                "action_input": parsed.get("action_input"),
-                "observation": None
-            }
+    def _tool_step(self, ctx: RunContext, thought: Optional[str], action: str, action_input: Dict, kind: str,
+                   resumed: bool = False) -> Dict:
+        # One tool call decided without the LLM (playbook, intake fan-out), journaled
+        # and instrumented like an LLM step. ``resumed`` marks the call that was
+        # interrupted by a crash: it goes through _resumed_call instead.
+        i = len(ctx.chain_of_thought)
+        llm_text = json.dumps({"thought": thought, "action": action, "action_input": action_input})
+        cot_entry = {"step": i + 1, "thought": thought, "action": action, "action_input": action_input,
+                     "observation": None, "metrics": _idle_step_metrics()}
+        action_key = (action, json.dumps(action_input, sort_keys=True))
+        ctx.seen_actions[action_key] = ctx.seen_actions.get(action_key, 0) + 1
+        start = time.perf_counter()
+        if resumed:
+            obs = self._resumed_call(cot_entry)
+        else:
+            self._journal_decision(ctx, i, llm_text, cot_entry["metrics"], kind=kind)
+            if self._must_sync_journal(action):
+                self.journal.flush()
+            obs = self.call_tool(action, action_input)
+        self._observe_tool(cot_entry, time.perf_counter() - start)
+        self._record_observation(ctx, llm_text, cot_entry, obs, kind=kind)
+        return obs
+
+    def _try_playbook(self, ctx: RunContext, record: Optional[Dict] = None) -> Optional[Dict]:
+        # Fast path: returns the playbook's final plan, or None to continue with
+        # the LLM. Each step is journaled as it runs, like an LLM step, and lands
+        # in the context so on fallback the model does not repeat side effects.
+        # On resume ``record`` holds the journal: completed steps are replayed
+        # from it and an interrupted one goes through _resumed_call.
+        if self.policy_engine is None:
+            return None
+        playbook, _ = self.policy_engine.match(ctx.scenario)
+        thought = f"playbook:{playbook['name'] if playbook else None}"
+        done = [s["entries"][0] for s in record["steps"]] if record else []
+        pending = [json.loads(record["pending"]["llm_text"])] if record and record["pending"] else []
+
+        def call(action: str, action_input: Dict) -> Dict:
+            if done and (done[0]["action"], done[0]["action_input"]) == (action, action_input):
+                return done.pop(0)["observation"]
+            done.clear()
+            resumed = bool(pending) and (pending[0]["action"], pending[0]["action_input"]) == (action, action_input)
+            pending.clear()
+            return self._tool_step(ctx, thought, action, action_input, "playbook", resumed)
+
+        outcome = self.policy_engine.resolve(ctx.scenario, call)
+        ctx.step_offset = len(ctx.chain_of_thought)
+        return outcome.get("final_plan") if outcome["status"] in ("resolved", "escalated") else None
+
+    def _in_playbook(self, record: Dict) -> bool:
+        # Playbooks only run before the first LLM step, so a journal holding
+        # nothing else crashed (or fell back) inside one
+        kinds = [s["kind"] for s in record["steps"]]
+        if record["pending"] is not None:
+            kinds.append(record["pending"].get("kind", "llm"))
+        return self.policy_engine is not None and all(k == "playbook" for k in kinds)
+
+    def _start_run(self, scenario: Dict, deadline_s: Optional[float], run_id: Optional[str]) -> RunContext:
+        deadline = Deadline(deadline_s) if deadline_s is not None else None
+        ctx = RunContext(scenario, self.build_messages(scenario), deadline, run_id)
+        if self.journal is not None:
+            self.journal.append({"type": "run_start", "run_id": ctx.run_id, "ts": time.time(), "scenario": scenario})
+        return ctx
+
+    def _restore(self, run_id: str, deadline_s: Optional[float]) -> Tuple[RunContext, Dict]:
+        # Rebuild history, loop-detection state and metrics from the journal
+        # instead of re-running anything
+        record = self.journal.load_run(run_id) if self.journal is not None else None
+        if record is None:
+            raise ValueError(f"run {run_id!r} is not in the journal")
+        scenario = record["scenario"]
+        ctx = RunContext(scenario, self.build_messages(scenario),
+                         Deadline(deadline_s) if deadline_s is not None else None, run_id)
+        llm_steps = set()
+        for step in record["steps"]:
+            entries = step["entries"]
+            ctx.chain_of_thought.extend(entries)
+            for e in entries:
+                action_key = (e["action"], json.dumps(e.get("action_input"), sort_keys=True))
+                ctx.seen_actions[action_key] = ctx.seen_actions.get(action_key, 0) + 1
+            if step["batch"]:
+                ctx.recent_actions.append("batch:" + "+".join(sorted(e["action"] for e in entries)))
+                ctx.history.append_results(step["llm_text"], [{"action": e["action"], "result": e["observation"]}
+                                                              for e in entries])
+            else:
+                if step["kind"] == "llm":
+                    ctx.recent_actions.append(entries[0]["action"])
+                ctx.history.append_step(step["llm_text"], entries[0]["action"], entries[0]["observation"])
+            if step["kind"] == "llm":
+                llm_steps.add(entries[0]["step"])
+        ctx.chain_of_thought.extend(record.get("tail", []))
+        last = record["pending"] or (record["steps"][-1] if record["steps"] else None)
+        if last is not None:
+            ctx.metrics.update(last["metrics"])
+        ctx.journaled = len(ctx.chain_of_thought)
+        ctx.step_offset = max((e["step"] for e in ctx.chain_of_thought), default=0)
+        ctx.iters_used = len(llm_steps)
+        return ctx, record
+
+    def _resolve_pending(self, ctx: RunContext, pending: Optional[Dict]) -> Optional[Dict]:
+        # Finish the step whose LLM decision was journaled but whose tools never
+        # completed. Returns a final plan if that decision ended the run.
+        if pending is None:
+            return None
+        i, llm_text = pending["step"] - 1, pending["llm_text"]
+        step_metrics = dict(pending["step_metrics"], tool_ms=0.0)
+        ctx.step_offset, ctx.iters_used = pending["step"], ctx.iters_used + 1
+        parsed = self._parse_step(llm_text)
+        if "actions" in parsed:
+            cot_entries, final_plan = self._begin_batch(ctx, i, parsed)
+            if final_plan:
+                return final_plan
+            self._attach_metrics(cot_entries, step_metrics)
+            self._record_batch(ctx, llm_text, cot_entries, [self._resumed_call(e) for e in cot_entries])
+            return None
+        cot_entry, final_plan = self._begin_step(ctx, i, parsed)
+        if cot_entry:
+            cot_entry["metrics"] = step_metrics
+        if final_plan:
+            return final_plan
+        self._record_observation(ctx, llm_text, cot_entry, self._resumed_call(cot_entry))
+        return None
+
+    def _resumed_call(self, cot_entry: Dict) -> Dict:
+        # Lookups are safe to repeat. A side-effecting call may already have
+        # happened before the crash, so it is reported rather than re-executed.
+        if self.tools.is_read_only(cot_entry["action"]):
+            return self.call_tool(cot_entry["action"], cot_entry["action_input"])
+        return {"error": "interrupted", "detail": "run was interrupted during this call; it was not repeated "
+                                                  "and its outcome is unknown"}
+
+    def _seeded(self, scenario: Dict):
+        if self.world_seed is None:
+            return nullcontext()
+        key = zlib.crc32(json.dumps(scenario, sort_keys=True, default=str).encode("utf-8"))
+        return seeded_run([self.world_seed, key])
+
+    def run(self, scenario: Dict, deadline_s: Optional[float] = None, run_id: Optional[str] = None) -> Dict:
+        # ``deadline_s`` bounds the whole run; it ends "incomplete" with reason
+        # "deadline_exceeded" rather than waiting on a slow or throttled provider
+        with self._seeded(scenario):
+            ctx = self._start_run(scenario, deadline_s, run_id)
+            final_plan = self._try_playbook(ctx)
+            if final_plan:
+                return self._finish_run(ctx, final_plan)
+            return self._run_loop(ctx)
+
+    def run_steps(self, scenario: Dict, steps: List[Dict], final_plan: Dict, kind: str = "fan_out",
+                  run_id: Optional[str] = None) -> Dict:
+        """Apply an already-decided plan to ``scenario`` as one journaled, instrumented run.
+
+        ``steps`` are cot entries; those marked ``"reused"`` keep their
+        observation, the rest are executed like playbook steps. Used by
+        agent/intake.py to fan a representative's plan out to its members.
+        """
+        with self._seeded(scenario):
+            ctx = self._start_run(scenario, None, run_id)
+            for step in steps:
+                if not step.get("reused"):
+                    self._tool_step(ctx, step.get("thought"), step["action"], step.get("action_input") or {}, kind)
+                    continue
+                entry = dict(step, step=len(ctx.chain_of_thought) + 1)
+                llm_text = json.dumps({"thought": entry.get("thought"), "action": entry["action"],
+                                       "action_input": entry.get("action_input")})
+                ctx.chain_of_thought.append(entry)
+                ctx.history.append_step(llm_text, entry["action"], entry.get("observation"))
+                self._journal_step(ctx, kind, llm_text, batch=False)
+            return self._finish_run(ctx, final_plan)
 
-            if action_name == "finish":
-                final_plan_text = parsed.get("action_input", {}).get("final_plan", "").strip()
-                if not final_plan_text:
-                    final_plan_text = "Final plan generated but was empty — please check scenario setup."
-                final_plan = {"status": "complete", "final_plan": final_plan_text}
-                self.chain_of_thought.append(cot_entry)
+    def resume(self, run_id: str, deadline_s: Optional[float] = None) -> Dict:
+        """Continue a journaled run from its last completed step (see _restore)."""
+        ctx, record = self._restore(run_id, deadline_s)
+        if record["final_plan"] is not None:
+            return {"cot": ctx.chain_of_thought, "final_plan": record["final_plan"], "metrics": record["metrics"],
+                    "run_id": run_id}
+        with self._seeded(ctx.scenario):
+            if self._in_playbook(record):
+                final_plan = self._try_playbook(ctx, record)
+            else:
+                final_plan = self._resolve_pending(ctx, record["pending"])
+            if final_plan:
+                return self._finish_run(ctx, final_plan)
+            return self._run_loop(ctx)
+
+    def _run_loop(self, ctx: RunContext) -> Dict:
+        final_plan = None
+        for i in range(ctx.step_offset, ctx.step_offset + self.max_iters - ctx.iters_used):
+            if ctx.deadline is not None and ctx.deadline.expired:
+                final_plan = {"status": "incomplete", "reason": "deadline_exceeded"}
+                break
+            messages = ctx.history.messages()
+            meta: Dict[str, Any] = {}
+            start = time.perf_counter()
+            try:
+                llm_text = self.llm.generate_json(messages, meta=meta, **self._llm_kwargs(ctx, i))
+            except DeadlineExceeded:
+                final_plan = {"status": "incomplete", "reason": "deadline_exceeded"}
+                break
+            except ProviderUnavailableError as exc:
+                final_plan = self._provider_escalation(ctx, i, exc)
                 break
+            step_metrics = self._llm_step_metrics(ctx, i, messages, meta, time.perf_counter() - start)
+            self._journal_decision(ctx, i, llm_text, step_metrics)
 
-            if action_name == "ask_human":
-                cot_entry["observation"] = {"escalated": True, "reason": parsed.get("action_input")}
-                self.chain_of_thought.append(cot_entry)
-                final_plan = {"status": "escalated", "reason": parsed.get("action_input")}
+            parsed = self._parse_step(llm_text)
+            if "actions" in parsed:
+                cot_entries, final_plan = self._begin_batch(ctx, i, parsed)
+                if final_plan:
+                    break
+                self._attach_metrics(cot_entries, step_metrics)
+                # Each tool call carries the run's context (its seeded simulator RNG)
+                futures = [self._tool_pool.submit(contextvars.copy_context().run, self._timed_call_batched, e)
+                           for e in cot_entries]
+                observations = [f.result() for f in futures]
+                self._record_batch(ctx, llm_text, cot_entries, observations)
+                continue
+
+            cot_entry, final_plan = self._begin_step(ctx, i, parsed)
+            if cot_entry:
+                cot_entry["metrics"] = step_metrics
+            if final_plan:
                 break
 
-            obs = self.call_tool(action_name, parsed.get("action_input", {}))
-            cot_entry["observation"] = obs
-            self.chain_of_thought.append(cot_entry)
+            if self._must_sync_journal(parsed["action"]):
+                self.journal.flush()
+            start = time.perf_counter()
+            obs = self.call_tool(parsed["action"], parsed.get("action_input", {}))
+            self._observe_tool(cot_entry, time.perf_counter() - start)
+            self._record_observation(ctx, llm_text, cot_entry, obs)
 
-            prompt += "\nTOOL_RESULT: " + json.dumps({"action": action_name, "result": obs}) + "\n"
+        return self._finish_run(ctx, final_plan)
 
-        if not final_plan:
-            final_plan = {"status": "incomplete", "reason": "max_iters_reached"}
+    async def arun(self, scenario: Dict, deadline_s: Optional[float] = None, run_id: Optional[str] = None) -> Dict:
+        # ``deadline_s`` bounds the whole run; it ends "incomplete" with reason
+        # "deadline_exceeded" rather than waiting on a slow or throttled provider
+        with self._seeded(scenario):
+            ctx = self._start_run(scenario, deadline_s, run_id)
+            final_plan = await asyncio.to_thread(self._try_playbook, ctx)
+            if final_plan:
+                return self._finish_run(ctx, final_plan)
+            return await self._arun_loop(ctx)
+
+    async def aresume(self, run_id: str, deadline_s: Optional[float] = None) -> Dict:
+        """Continue a journaled run from its last completed step (see _restore)."""
+        ctx, record = await asyncio.to_thread(self._restore, run_id, deadline_s)
+        if record["final_plan"] is not None:
+            return {"cot": ctx.chain_of_thought, "final_plan": record["final_plan"], "metrics": record["metrics"],
+                    "run_id": run_id}
+        with self._seeded(ctx.scenario):
+            if self._in_playbook(record):
+                final_plan = await asyncio.to_thread(self._try_playbook, ctx, record)
+            else:
+                final_plan = await asyncio.to_thread(self._resolve_pending, ctx, record["pending"])
+            if final_plan:
+                return self._finish_run(ctx, final_plan)
+            return await self._arun_loop(ctx)
+
+    async def _arun_loop(self, ctx: RunContext) -> Dict:
+        final_plan = None
+        for i in range(ctx.step_offset, ctx.step_offset + self.max_iters - ctx.iters_used):
+            if ctx.deadline is not None and ctx.deadline.expired:
+                final_plan = {"status": "incomplete", "reason": "deadline_exceeded"}
+                break
+            messages = ctx.history.messages()
+            meta: Dict[str, Any] = {}
+            start = time.perf_counter()
+            try:
+                llm_text = await self.llm.agenerate_json(messages, meta=meta, **self._llm_kwargs(ctx, i))
+            except DeadlineExceeded:
+                final_plan = {"status": "incomplete", "reason": "deadline_exceeded"}
+                break
+            except ProviderUnavailableError as exc:
+                final_plan = self._provider_escalation(ctx, i, exc)
+                break
+            step_metrics = self._llm_step_metrics(ctx, i, messages, meta, time.perf_counter() - start)
+            self._journal_decision(ctx, i, llm_text, step_metrics)
+
+            parsed = self._parse_step(llm_text)
+            if "actions" in parsed:
+                cot_entries, final_plan = self._begin_batch(ctx, i, parsed)
+                if final_plan:
+                    break
+                self._attach_metrics(cot_entries, step_metrics)
+                observations = await asyncio.gather(*(self._atimed_call_batched(e) for e in cot_entries))
+                self._record_batch(ctx, llm_text, cot_entries, list(observations))
+                continue
+
+            cot_entry, final_plan = self._begin_step(ctx, i, parsed)
+            if cot_entry:
+                cot_entry["metrics"] = step_metrics
+            if final_plan:
+                break
 
-        return {"cot": self.chain_of_thought, "final_plan": final_plan}
+            if self._must_sync_journal(parsed["action"]):
+                await asyncio.to_thread(self.journal.flush)
+            start = time.perf_counter()
+            obs = await self.acall_tool(parsed["action"], parsed.get("action_input", {}))
+            self._observe_tool(cot_entry, time.perf_counter() - start)
+            self._record_observation(ctx, llm_text, cot_entry, obs)
 
+        return self._finish_run(ctx, final_plan)
 
 if __name__ == "__main__":
     scenfile = os.path.join(os.path.dirname(os.path.dirname(__file__)), "simulator", "scenarios.json")
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+def make_cache_key(model: str, temperature: float, messages: List[Dict[str, str]], mode: Optional[str] = None,
+                   tools: Optional[List[Dict]] = None) -> str:
+    """Key for one chat request: model, temperature, output mode, tool schemas and the normalized messages.
+
+    ``mode`` is the structured-output mode (None, "json" or "tools"); with
+    "tools" the definitions are hashed too, so a changed registry never
+    replays calls to tools that no longer match.
+    """
+    normalized = [{"role": m["role"], "content": m["content"].strip()} for m in messages]
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+    tools_digest = "-"
+    if tools:
+        tools_digest = hashlib.sha256(json.dumps(tools, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"{model}|{float(temperature)}|{mode or 'text'}|{tools_digest}|{digest}"
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LRUCache:
+    """Thread-safe in-memory response cache with size and TTL eviction."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._data[key]
+                self._stats.evictions += 1
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            self._stats.writes += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats.as_dict(), size=len(self._data))
+
+
+class SQLiteCache:
+    """On-disk response cache, shareable across processes and replays."""
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and time.time() - row[1] > self.ttl:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._stats.evictions += 1
+                row = None
+            if row is None:
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+                               (key, value, time.time()))
+            self._stats.writes += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self._stats.as_dict(), size=len(self))
+
+    def close(self) -> None:
+        self._conn.close()
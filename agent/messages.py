@@ -0,0 +1,51 @@
+from typing import Any, Dict, Optional
+
+# Chat message types used by the agent. They are attribute-compatible with
+# LangChain's (``content``, ``type``, ``response_metadata``), so LangChain
+# messages can be passed anywhere these are accepted, but importing them costs
+# nothing: LangChain is only needed for agent/langchain_adapter.py.
+
+_TYPE_TO_ROLE = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+class BaseMessage:
+    """One chat message; subclasses fix the role."""
+
+    type = ""
+    __slots__ = ("content", "response_metadata")
+
+    def __init__(self, content: str, response_metadata: Optional[Dict[str, Any]] = None):
+        self.content = content
+        self.response_metadata = response_metadata or {}
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, BaseMessage) and (self.type, self.content) == (other.type, other.content)
+
+    def __hash__(self) -> int:
+        return hash((self.type, self.content))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(content={self.content!r})"
+
+
+class SystemMessage(BaseMessage):
+    type = "system"
+    __slots__ = ()
+
+
+class HumanMessage(BaseMessage):
+    type = "human"
+    __slots__ = ()
+
+
+class AIMessage(BaseMessage):
+    type = "ai"
+    __slots__ = ()
+
+
+def to_provider_message(message: Any) -> Optional[Dict[str, str]]:
+    """``{"role", "content"}`` for a message object (ours or LangChain's) or a dict; None for other roles."""
+    if isinstance(message, dict):
+        return {"role": message["role"], "content": message["content"]}
+    role = _TYPE_TO_ROLE.get(getattr(message, "type", None))
+    return {"role": role, "content": message.content} if role else None
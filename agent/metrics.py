@@ -0,0 +1,135 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Histogram buckets (seconds) for LLM and tool latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsHook:
+    """Base class for agent instrumentation; override any of the callbacks.
+
+    Callbacks may arrive from several threads at once (parallel tool calls,
+    batch workers), so implementations must be thread-safe.
+    """
+
+    def on_llm_call(self, step: int, metrics: Dict) -> None:
+        pass
+
+    def on_tool_call(self, step: int, action: str, duration_ms: float) -> None:
+        pass
+
+    def on_run_end(self, final_plan: Dict, metrics: Dict) -> None:
+        pass
+
+
+class CallbackHook(MetricsHook):
+    """Adapts plain functions to the MetricsHook interface."""
+
+    def __init__(self, on_llm_call: Optional[Callable] = None, on_tool_call: Optional[Callable] = None,
+                 on_run_end: Optional[Callable] = None):
+        self._on_llm_call = on_llm_call
+        self._on_tool_call = on_tool_call
+        self._on_run_end = on_run_end
+
+    def on_llm_call(self, step, metrics):
+        if self._on_llm_call:
+            self._on_llm_call(step, metrics)
+
+    def on_tool_call(self, step, action, duration_ms):
+        if self._on_tool_call:
+            self._on_tool_call(step, action, duration_ms)
+
+    def on_run_end(self, final_plan, metrics):
+        if self._on_run_end:
+            self._on_run_end(final_plan, metrics)
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        sep = "," if labels else ""
+        lines = [f'{name}_bucket{{{labels}{sep}le="{b}"}} {c}' for b, c in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {round(self.total, 6)}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class MetricsRecorder(MetricsHook):
+    """Aggregates agent metrics in memory and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._llm = _Histogram()
+        self._tools: Dict[str, _Histogram] = {}
+        self._runs: Dict[str, int] = {}
+        self._counters = {"llm_retries": 0, "llm_provider_retries": 0, "llm_cache_hits": 0, "prompt_tokens": 0,
+                          "completion_tokens": 0}
+
+    def on_llm_call(self, step, metrics):
+        with self._lock:
+            self._llm.observe(metrics["llm_ms"] / 1000.0)
+            self._counters["llm_retries"] += metrics.get("retries") or 0
+            self._counters["llm_provider_retries"] += metrics.get("provider_retries") or 0
+            self._counters["llm_cache_hits"] += 1 if metrics.get("cached") else 0
+            self._counters["prompt_tokens"] += metrics.get("prompt_tokens") or 0
+            self._counters["completion_tokens"] += metrics.get("completion_tokens") or 0
+
+    def on_tool_call(self, step, action, duration_ms):
+        with self._lock:
+            self._tools.setdefault(action, _Histogram()).observe(duration_ms / 1000.0)
+
+    def on_run_end(self, final_plan, metrics):
+        status = (final_plan or {}).get("status", "unknown")
+        with self._lock:
+            self._runs[status] = self._runs.get(status, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "runs": dict(self._runs),
+                "llm_calls": self._llm.count,
+                "llm_seconds": round(self._llm.total, 6),
+                "tool_calls": {name: h.count for name, h in self._tools.items()},
+                **self._counters,
+            }
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines = ["# HELP synapse_llm_call_seconds Wall-clock time per LLM call (including retries).",
+                     "# TYPE synapse_llm_call_seconds histogram"]
+            lines += self._llm.render("synapse_llm_call_seconds")
+            lines += ["# HELP synapse_tool_call_seconds Wall-clock time per tool call.",
+                      "# TYPE synapse_tool_call_seconds histogram"]
+            for name in sorted(self._tools):
+                lines += self._tools[name].render("synapse_tool_call_seconds", f'tool="{name}"')
+            provider = self._counters["llm_provider_retries"]
+            lines += ["# HELP synapse_llm_retries_total Extra LLM requests: provider errors (429/5xx/connection) "
+                      "or invalid JSON re-asks.",
+                      "# TYPE synapse_llm_retries_total counter",
+                      f'synapse_llm_retries_total{{reason="provider"}} {provider}',
+                      f'synapse_llm_retries_total{{reason="json_repair"}} {self._counters["llm_retries"] - provider}',
+                      "# HELP synapse_llm_cache_hits_total LLM calls served from the response cache.",
+                      "# TYPE synapse_llm_cache_hits_total counter",
+                      f"synapse_llm_cache_hits_total {self._counters['llm_cache_hits']}",
+                      "# HELP synapse_llm_tokens_total Tokens reported by the provider.",
+                      "# TYPE synapse_llm_tokens_total counter",
+                      f'synapse_llm_tokens_total{{kind="prompt"}} {self._counters["prompt_tokens"]}',
+                      f'synapse_llm_tokens_total{{kind="completion"}} {self._counters["completion_tokens"]}',
+                      "# HELP synapse_runs_total Finished agent runs by final-plan status.",
+                      "# TYPE synapse_runs_total counter"]
+            lines += [f'synapse_runs_total{{status="{s}"}} {n}' for s, n in sorted(self._runs.items())]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from .history import estimate_tokens
+from .prompts import SCENARIO_TEMPLATE
+from .resilience import Deadline, DeadlineExceeded
+
+_SCENARIO_PREFIX = SCENARIO_TEMPLATE.split("{", 1)[0]
+
+# Scripted trajectories for simulator/scenarios.json, keyed by scenario key. Ids
+# and amounts are what the tools answer in the default world (World.generate(),
+# seed 0) and what the scenarios carry, e.g. the fastest nearby merchant or the
+# order value; tests/test_harness.py checks them against that world.
+DEFAULT_SCRIPTS: Dict[str, List[Dict]] = {
+    "overloaded_restaurant": [
+        {"thought": "Confirm the merchant delay", "action": "get_merchant_status",
+         "action_input": {"merchant_id": "m_spicecorner"}},
+        {"thought": "Prep time too long, look for faster merchants nearby", "action": "get_nearby_merchants",
+         "action_input": {"merchant_id": "m_spicecorner", "radius_km": 1.5}},
+        {"thought": "Reroute the driver to the faster alternative", "action": "re_route_driver",
+         "action_input": {"driver_id": "d123", "new_location": "m_003588"}},
+        {"thought": "Let the customer know", "action": "notify_customer",
+         "action_input": {"customer_id": "c001", "message": "Your order moved to a faster kitchen."}},
+        {"thought": "Resolved", "action": "finish",
+         "action_input": {"final_plan": "Swapped to m_003588, driver re-routed, customer notified"}},
+    ],
+    "damaged_packaging": [
+        {"thought": "Collect evidence from the customer", "action": "collect_evidence",
+         "action_input": {"order_id": "o_12345"}},
+        {"thought": "Analyze who is at fault", "action": "analyze_evidence",
+         "action_input": {"order_id": "o_12345"}},
+        {"thought": "Refund the customer", "action": "issue_instant_refund",
+         "action_input": {"order_id": "o_12345", "amount": 18.5}},
+        {"thought": "Clear the driver", "action": "exonerate_driver", "action_input": {"driver_id": "d222"}},
+        {"thought": "Tell the merchant", "action": "log_merchant_packaging_feedback",
+         "action_input": {"merchant_id": "m_soupshop", "feedback": "Soup container leaked in transit"}},
+        {"thought": "Resolved", "action": "finish",
+         "action_input": {"final_plan": "Refund issued, driver exonerated, merchant feedback logged"}},
+    ],
+    "recipient_unavailable": [
+        {"thought": "Reach the recipient in-app", "action": "contact_recipient_via_chat",
+         "action_input": {"recipient_id": "c555", "message": "Your driver has arrived."}},
+        {"thought": "Find a locker as a fallback", "action": "find_nearby_locker",
+         "action_input": {"location": "customer_address"}},
+        {"thought": "Resolved", "action": "finish",
+         "action_input": {"final_plan": "Recipient contacted; locker suggested or reattempt scheduled"}},
+    ],
+    "traffic_obstruction": [
+        {"thought": "Check traffic on the planned route", "action": "check_traffic",
+         "action_input": {"location": "downtown", "route_id": "downtown-airport", "destination": "airport"}},
+        {"thought": "Route around the accident", "action": "re_route_driver",
+         "action_input": {"driver_id": "d789", "new_location": "9.803,18.062"}},
+        {"thought": "Keep the passenger informed", "action": "notify_customer",
+         "action_input": {"customer_id": "p001", "message": "Rerouting around an accident; ETA updated."}},
+        {"thought": "Resolved", "action": "finish",
+         "action_input": {"final_plan": "Driver re-routed around the accident, passenger notified"}},
+    ],
+}
+
+UNSCRIPTED_RESPONSE = {"thought": "No scripted response for this scenario", "action": "ask_human",
+                       "action_input": {"reason": "unscripted scenario"}}
+
+
+def _content(m) -> str:
+    return m["content"] if isinstance(m, dict) else m.content
+
+
+def _is_assistant(m) -> bool:
+    return m.get("role") == "assistant" if isinstance(m, dict) else m.type == "ai"
+
+
+class MockLLM:
+    """Deterministic offline stand-in for GroqLLM.
+
+    Replays a scripted list of JSON actions per scenario description. The
+    step is derived from the message history (assistant turns since the live
+    scenario message), so one instance is safe to share across concurrent
+    runs. ``latency``/``jitter`` (seconds) simulate provider response time.
+    """
+
+    def __init__(self, scripts: Optional[Dict[str, List[Dict]]] = None, latency: float = 0.0,
+                 jitter: float = 0.0, seed: int = 0, fallback: Optional[Dict] = None):
+        self.scripts = scripts or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.fallback = fallback or UNSCRIPTED_RESPONSE
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def for_scenarios(cls, scenarios: Dict[str, Dict], scripts: Optional[Dict[str, List[Dict]]] = None,
+                      **kwargs) -> "MockLLM":
+        """Map scenario keys (e.g. from scenarios.json) to scripts via their descriptions."""
+        scripts = scripts or DEFAULT_SCRIPTS
+        by_description = {scen["description"]: scripts[key] for key, scen in scenarios.items() if key in scripts}
+        return cls(by_description, **kwargs)
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "MockLLM":
+        """Replay recorded runs: one ``{"description": ..., "responses": [...]}`` per line."""
+        scripts = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    scripts[rec["description"]] = rec["responses"]
+        return cls(scripts, **kwargs)
+
+    @staticmethod
+    def script_from_cot(cot: Iterable[Dict]) -> List[Dict]:
+        # Turn a recorded chain of thought back into the responses that produced it
+        return [{"thought": s.get("thought"), "action": s["action"], "action_input": s.get("action_input")}
+                for s in cot]
+
+    def _fill_meta(self, meta: Optional[Dict], messages, text: str) -> None:
+        # Estimated token usage so instrumentation looks like a real provider's
+        if meta is not None:
+            meta.update(retries=0, cached=False, usage={
+                "prompt_tokens": sum(estimate_tokens(_content(m)) for m in messages),
+                "completion_tokens": estimate_tokens(text),
+            })
+
+    def _delay(self) -> float:
+        if not self.latency and not self.jitter:
+            return 0.0
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def respond(self, messages) -> str:
+        with self._lock:
+            self.calls += 1
+        start = max((i for i, m in enumerate(messages) if _content(m).startswith(_SCENARIO_PREFIX)), default=0)
+        description = _content(messages[start])[len(_SCENARIO_PREFIX):]
+        step = sum(1 for m in messages[start:] if _is_assistant(m))
+        script = self.scripts.get(description)
+        if script is None:
+            return json.dumps(self.fallback)
+        return json.dumps(script[min(step, len(script) - 1)])
+
+    def _bounded_delay(self, deadline: Optional[Deadline]) -> Tuple[float, bool]:
+        # Like a real provider call, give up once the caller's deadline passes
+        delay = self._delay()
+        if deadline is not None and delay > deadline.remaining():
+            return deadline.remaining(), True
+        return delay, False
+
+    def generate_json(self, messages, on_thought=None, meta: Optional[Dict] = None,
+                      deadline: Optional[Deadline] = None) -> str:
+        delay, late = self._bounded_delay(deadline)
+        if delay:
+            time.sleep(delay)
+        if late:
+            raise DeadlineExceeded("mock LLM latency exceeds the deadline")
+        text = self.respond(messages)
+        self._fill_meta(meta, messages, text)
+        if on_thought is not None:
+            on_thought(json.loads(text).get("thought") or "")
+        return text
+
+    async def agenerate_json(self, messages, on_thought=None, meta: Optional[Dict] = None,
+                        deadline: Optional[Deadline] = None) -> str:
+        delay, late = self._bounded_delay(deadline)
+        if delay:
+            await asyncio.sleep(delay)
+        if late:
+            raise DeadlineExceeded("mock LLM latency exceeds the deadline")
+        text = self.respond(messages)
+        self._fill_meta(meta, messages, text)
+        if on_thought is not None:
+            on_thought(json.loads(text).get("thought") or "")
+        return text
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PLAYBOOKS_FILE = os.path.join(os.path.dirname(__file__), "playbooks.json")
+
+_PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+_MISSING = object()
+
+
+def _lookup(path: str, scope: Dict) -> Any:
+    # Dotted path into scenario fields and saved observations; list indexes are numeric
+    value: Any = scope
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _resolve(expr: str, scope: Dict) -> Any:
+    # "{path|fallback}": fallback is another path if it resolves, else a JSON/str literal
+    path, _, fallback = expr.partition("|")
+    value = _lookup(path.strip(), scope)
+    if value is not _MISSING or not fallback:
+        return value
+    value = _lookup(fallback.strip(), scope)
+    if value is not _MISSING:
+        return value
+    try:
+        return json.loads(fallback)
+    except json.JSONDecodeError:
+        return fallback
+
+
+def render(template: Any, scope: Dict) -> Any:
+    """Fill ``{placeholders}``; a string that is exactly one placeholder keeps the value's type."""
+    if isinstance(template, dict):
+        return {k: render(v, scope) for k, v in template.items()}
+    if isinstance(template, list):
+        return [render(v, scope) for v in template]
+    if not isinstance(template, str):
+        return template
+    whole = _PLACEHOLDER_RE.fullmatch(template)
+    if whole:
+        value = _resolve(whole.group(1), scope)
+        if value is _MISSING:
+            raise KeyError(whole.group(1))
+        return value
+
+    def sub(m):
+        value = _resolve(m.group(1), scope)
+        if value is _MISSING:
+            raise KeyError(m.group(1))
+        return str(value)
+
+    return _PLACEHOLDER_RE.sub(sub, template)
+
+
+def _check(cond: Dict, scope: Dict) -> bool:
+    # Operands may be placeholders ("gt": "{promised_min}"); a missing one raises KeyError
+    cond = {k: v if k == "path" else render(v, scope) for k, v in cond.items()}
+    value = _lookup(cond["path"], scope)
+    if value is _MISSING:
+        if "default" not in cond:
+            return cond.get("exists") is False
+        value = cond["default"]
+    if "exists" in cond:
+        return bool(cond["exists"])
+    if "equals" in cond:
+        return value == cond["equals"]
+    if "in" in cond:
+        return value in cond["in"]
+    try:
+        if "gte" in cond and not value >= cond["gte"]:
+            return False
+        if "lte" in cond and not value <= cond["lte"]:
+            return False
+        if "gt" in cond and not value > cond["gt"]:
+            return False
+        if "lt" in cond and not value < cond["lt"]:
+            return False
+    except TypeError:
+        return False
+    return True
+
+
+class PolicyEngine:
+    """Deterministic fast path: resolves scenarios that match a declarative playbook.
+
+    A playbook (see ``agent/playbooks.json``) matches on keyword groups in the
+    scenario description plus required scenario fields. Its steps are tool
+    calls and ``check`` guards over earlier observations, whose operands may
+    reference scenario fields or observations. A failed guard either
+    escalates (``ask_human``) or hands the run back to the LLM with the steps
+    taken so far (``fallback``). Guards should come before side-effecting steps.
+    """
+
+    def __init__(self, playbooks: List[Dict], min_confidence: float = 0.6):
+        self.playbooks = playbooks
+        self.min_confidence = min_confidence
+        for pb in self.playbooks:
+            pb["_keywords"] = [[k.lower() for k in group] for group in pb.get("keywords", [])]
+
+    @classmethod
+    def from_file(cls, path: str = PLAYBOOKS_FILE, **kwargs) -> "PolicyEngine":
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def match(self, scenario: Dict) -> Tuple[Optional[Dict], float]:
+        """Best playbook and its confidence: the share of keyword groups found in the description."""
+        text = scenario.get("description", "").lower()
+        best, best_score = None, 0.0
+        for pb in self.playbooks:
+            if any(not scenario.get(f) for f in pb.get("required_fields", [])):
+                continue
+            groups = pb["_keywords"]
+            if not groups:
+                continue
+            score = sum(1 for group in groups if any(k in text for k in group)) / len(groups)
+            if score > best_score:
+                best, best_score = pb, score
+        return best, round(best_score, 3)
+
+    def resolve(self, scenario: Dict, call_tool: Callable[[str, Dict], Dict]) -> Dict:
+        """Run the matching playbook.
+
+        Returns ``{"status": "no_match" | "resolved" | "escalated" | "fallback",
+        "steps": [...], "final_plan": ...}``; ``steps`` lists the executed tool
+        calls with their observations and timings.
+        """
+        playbook, confidence = self.match(scenario)
+        if playbook is None or confidence < self.min_confidence:
+            return {"status": "no_match", "confidence": confidence, "steps": []}
+
+        scope = dict(scenario)
+        steps: List[Dict] = []
+        base = {"source": "playbook", "playbook": playbook["name"], "confidence": confidence}
+        try:
+            for step in playbook["steps"]:
+                if "check" in step:
+                    if _check(step["check"], scope):
+                        continue
+                    if step.get("on_fail") == "escalate":
+                        reason = {"reason": step.get("reason", "playbook guard failed"), "check": step["check"]}
+                        return {"status": "escalated", "steps": steps,
+                                "final_plan": {"status": "escalated", "reason": reason, **base}}
+                    return {"status": "fallback", "steps": steps, "failed_check": step["check"], **base}
+
+                action_input = render(step.get("action_input", {}), scope)
+                start = time.perf_counter()
+                obs = call_tool(step["action"], action_input)
+                steps.append({"action": step["action"], "action_input": action_input, "observation": obs,
+                              "tool_ms": round((time.perf_counter() - start) * 1000, 3)})
+                if isinstance(obs, dict) and "error" in obs:
+                    return {"status": "fallback", "steps": steps, "failed_action": step["action"], **base}
+                if step.get("save_as"):
+                    scope[step["save_as"]] = obs
+
+            final_text = render(playbook["final_plan"], scope)
+        except KeyError as e:
+            # A template referenced data the scenario or tools did not provide
+            return {"status": "fallback", "steps": steps, "missing": str(e), **base}
+
+        final_plan = {"status": "complete", "final_plan": final_text, "actions": [s["action"] for s in steps], **base}
+        return {"status": "resolved", "steps": steps, "final_plan": final_plan}
@@ -1,3 +1,16 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
 SYSTEM_PROMPT = """
 You are Synapse — an autonomous last-mile delivery coordinator.
 
@@ -26,6 +39,45 @@ Rules:
 - Do NOT output anything except valid JSON — no explanations or extra text.
 """
 
+# Appended to the system prompt when the agent runs in multi-action mode
+MULTI_ACTION_RULES = """
+Multi-action mode:
+- To gather several independent facts in one step, you MAY instead respond with a list of actions:
+{
+  "thought": "short natural language reasoning",
+  "actions": [
+    { "action": "check_traffic", "action_input": { "location": "..." } },
+    { "action": "get_merchant_status", "action_input": { "merchant_id": "..." } }
+  ]
+}
+- Only read-only lookups may be batched: check_traffic, get_merchant_status, get_nearby_merchants, find_nearby_locker.
+- All results come back together in one TOOL_RESULT message.
+- Side-effecting tools, finish and ask_human MUST be issued as a single action.
+"""
+
+# Structured-output mode: the same contract in far fewer tokens, with the tool
+# list rendered from the registry's function signatures (one per line)
+COMPACT_SYSTEM_PROMPT = """You are Synapse, an autonomous last-mile delivery coordinator.
+Reply with one JSON object: {{"thought": str, "action": str, "action_input": object}}
+Tools (action(param:type=default)):
+{tools}
+finish(final_plan:str)  - one-sentence resolution, never empty
+ask_human(reason:str)   - if compensation > $50 or confidence < 0.7
+Gather facts with tools before finishing; never invent tool results; do not repeat a call with the same input."""
+
+# Extra rule per "thought" verbosity; "full" keeps the prompt unchanged
+THOUGHT_RULES = {
+    "full": "",
+    "brief": '\n- Keep "thought" to at most 10 words.',
+    "none": '\n- Omit "thought": reply with only "action" and "action_input".',
+}
+
+# Prefix of the user message that carries a tool observation back to the model
+TOOL_RESULT_PREFIX = "TOOL_RESULT: "
+
+# Sent as an extra user message when the model's reply fails to parse as JSON
+JSON_REPAIR_PROMPT = "IMPORTANT: Respond ONLY with valid JSON per schema."
+
 FEW_SHOT_EXAMPLES = [
     # Example 1 — Overloaded restaurant
     {
@@ -109,4 +161,200 @@ FEW_SHOT_EXAMPLES = [
             "action_input": {"final_plan": "Recipient unresponsive; locker delivery at locker1 offered"}
         }
     }
+]
+
+
+# ---------------------------------------------------------------------------
+# Prompt template: static prefix rendered once + a per-scenario slot
+# ---------------------------------------------------------------------------
+
+# The only per-scenario text; it always comes after the static prefix so the
+# prefix stays byte-identical across requests (provider-side prefix caching).
+SCENARIO_TEMPLATE = "Scenario: {description}"
+
+
+def render_scenario(scenario: Dict) -> str:
+    return SCENARIO_TEMPLATE.format(description=scenario.get("description", ""))
+
+
+def _dumps(obj) -> str:
+    # Fixed separators so the rendered prefix never depends on call-site defaults
+    return json.dumps(obj, separators=(", ", ": "))
+
+
+def _example_action(action: Dict, thought: str) -> Dict:
+    return {k: v for k, v in action.items() if k != "thought"} if thought == "none" else action
+
+
+def example_messages(example: Dict, thought: str = "full") -> List[Tuple[str, str]]:
+    """One worked example as (role, content) pairs: scenario, action, observation, next action."""
+    return [
+        ("user", SCENARIO_TEMPLATE.format(description=example["user"])),
+        ("assistant", _dumps(_example_action(example["assistant"], thought))),
+        ("user", TOOL_RESULT_PREFIX + _dumps(example["tool_observation"])),
+        ("assistant", _dumps(_example_action(example["assistant_next"], thought))),
+    ]
+
+
+@lru_cache(maxsize=None)
+def prompt_prefix(multi_action: bool = False, tool_schema: Optional[str] = None,
+                  thought: str = "full", examples: bool = True) -> Tuple[Tuple[str, str], ...]:
+    """System prompt and few-shot exchanges as (role, content) pairs, rendered once per mode.
+
+    With ``tool_schema`` (see ToolRegistry.compact_schema) the compact system
+    prompt is used; ``thought`` is "full", "brief" or "none". ``examples=False``
+    leaves out FEW_SHOT_EXAMPLES, for agents that pick them per scenario from
+    an ExampleStore.
+    """
+    system = COMPACT_SYSTEM_PROMPT.format(tools=tool_schema) if tool_schema else SYSTEM_PROMPT
+    if multi_action:
+        system += MULTI_ACTION_RULES
+    system += THOUGHT_RULES[thought]
+    messages = [("system", system)]
+    if examples:
+        for ex in FEW_SHOT_EXAMPLES:
+            messages.extend(example_messages(ex, thought))
+    return tuple(messages)
+
+
+@lru_cache(maxsize=None)
+def prefix_fingerprint(multi_action: bool = False, tool_schema: Optional[str] = None,
+                       thought: str = "full", examples: bool = True) -> Dict[str, object]:
+    """Hash and size of the static prefix, for checking cache-friendly layout in production."""
+    prefix = prompt_prefix(multi_action, tool_schema, thought, examples)
+    serialized = _dumps([{"role": r, "content": c} for r, c in prefix])
+    return {
+        "sha256": hashlib.sha256(serialized.encode("utf-8")).hexdigest(),
+        "chars": len(serialized),
+        "messages": len(prefix),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Example store: few-shots retrieved per scenario
+# ---------------------------------------------------------------------------
+
+def _ngram_buckets(text: str, ngram: Tuple[int, int], dim: int) -> np.ndarray:
+    # Character n-grams of the normalized text, hashed with crc32 (stable across
+    # processes, unlike hash()) into ``dim`` buckets
+    text = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+    grams = [text[i:i + n] for n in range(ngram[0], ngram[1] + 1) for i in range(len(text) - n + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams))
+
+
+class ExampleStore:
+    """Worked examples indexed by TF-IDF weighted, hashed character n-gram vectors.
+
+    Fully offline (NumPy only). Rows are L2-normalized, so a lookup is one
+    matrix-vector product plus a partial sort; build once and persist with
+    save() / load(). ``stats()`` reports retrieval latency and how many prompt
+    characters top-k selection saves over sending every example.
+    """
+
+    def __init__(self, examples: Iterable[Dict], dim: int = 2048, ngram: Tuple[int, int] = (3, 5),
+                 _vectors: Optional[np.ndarray] = None, _idf: Optional[np.ndarray] = None):
+        self.examples = list(examples)
+        self.dim = dim
+        self.ngram = tuple(ngram)
+        if _vectors is None:
+            counts = np.zeros((len(self.examples), dim), dtype=np.float32)
+            for row, ex in enumerate(self.examples):
+                counts[row] = np.bincount(_ngram_buckets(ex["user"], self.ngram, dim), minlength=dim)
+            df = np.count_nonzero(counts, axis=0)
+            _idf = (np.log((1 + len(self.examples)) / (1 + df)) + 1).astype(np.float32)
+            _vectors = self._normalize(counts * _idf)
+        self.vectors = _vectors
+        self.idf = _idf
+        # Rendered size per example ("full" thought), for prompt-savings reporting
+        self._chars = np.array([sum(len(c) for _, c in example_messages(ex)) for ex in self.examples])
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._retrieval_ms: Deque[float] = deque(maxlen=1024)
+        self._selected_chars = 0
+
+    def __getstate__(self):
+        # Picklable for process-pool workers; the lock and counters start fresh
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "ExampleStore":
+        """One example per line, shaped like FEW_SHOT_EXAMPLES entries."""
+        with open(path) as f:
+            return cls([json.loads(line) for line in f if line.strip()], **kwargs)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, vectors=self.vectors, idf=self.idf, dim=self.dim, ngram=np.array(self.ngram),
+                            examples=np.array([json.dumps(ex) for ex in self.examples], dtype=str))
+
+    @classmethod
+    def load(cls, path: str) -> "ExampleStore":
+        """A store saved with save() (precomputed vectors), or a .jsonl file to index now."""
+        if path.endswith(".jsonl"):
+            return cls.from_jsonl(path)
+        data = np.load(path, allow_pickle=False)
+        return cls([json.loads(ex) for ex in data["examples"]], int(data["dim"]), tuple(data["ngram"].tolist()),
+                   _vectors=data["vectors"], _idf=data["idf"])
+
+    def search(self, description: str, k: int = 2) -> List[Tuple[int, float]]:
+        """Indices and cosine similarities of the ``k`` examples closest to ``description``."""
+        start = time.perf_counter()
+        query = np.bincount(_ngram_buckets(description, self.ngram, self.dim), minlength=self.dim)
+        query = self._normalize(query.astype(np.float32) * self.idf)
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._lookups += 1
+            self._retrieval_ms.append(elapsed_ms)
+            self._selected_chars += int(self._chars[top].sum())
+        return [(int(i), float(scores[i])) for i in top]
+
+    def select(self, description: str, k: int = 2) -> List[Dict]:
+        return [self.examples[i] for i, _ in self.search(description, k)]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            latencies = sorted(self._retrieval_ms)
+            lookups, selected = self._lookups, self._selected_chars
+        all_chars = int(self._chars.sum())
+        return {
+            "examples": len(self.examples),
+            "lookups": lookups,
+            # Over the most recent 1024 lookups
+            "retrieval_ms_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "retrieval_ms_max": round(latencies[-1], 3) if latencies else None,
+            "prompt_chars_all_examples": all_chars,
+            "prompt_chars_selected_mean": round(selected / lookups, 1) if lookups else None,
+            "prompt_chars_saved_mean": round(all_chars - selected / lookups, 1) if lookups else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a persisted few-shot example index")
+    parser.add_argument("examples", help="JSONL file, one example per line (FEW_SHOT_EXAMPLES shape)")
+    parser.add_argument("output", help="Where to write the .npz index")
+    parser.add_argument("--dim", type=int, default=2048, help="Hashed n-gram vector size")
+    args = parser.parse_args()
+    store = ExampleStore.from_jsonl(args.examples, dim=args.dim)
+    store.save(args.output)
+    print(json.dumps({"examples": len(store), "output": args.output}))
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's time budget ran out before the provider answered."""
+
+
+class ProviderUnavailableError(RuntimeError):
+    """The LLM provider kept failing (429/5xx/connection) after all retries."""
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    """Calls are short-circuited because the provider was recently unhealthy."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider circuit is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """Absolute point in time a run (and every LLM call in it) must finish by."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        # Per-request timeout: whatever is left, never more than ``cap``
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute`` tokens/min.
+
+    reserve() debits immediately and returns how long the caller must wait,
+    so callers queue up fairly and the same bucket serves threads and asyncio.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = float(burst or per_minute)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, n: float = 1.0) -> float:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def refund(self, n: float) -> None:
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self.capacity, self._tokens + n)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def scale(self, factor: float, floor: float = 0.1) -> None:
+        # Adaptive rate: shrink on throttling, grow back towards the configured limit
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = min(self.base_rate, max(self.base_rate * floor, self.rate * factor))
+
+
+class RateLimiter:
+    """Client-side requests/min and tokens/min limits for one provider account.
+
+    Share a single instance between every LLM that uses the same API key. On a
+    429 the effective rate is halved and the provider's Retry-After honored;
+    each success recovers a little of the configured rate (AIMD).
+    """
+
+    def __init__(self, requests_per_min: Optional[float] = None, tokens_per_min: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.requests = TokenBucket(requests_per_min, clock=clock) if requests_per_min else None
+        self.tokens = TokenBucket(tokens_per_min, clock=clock) if tokens_per_min else None
+
+    def _costs(self, tokens: int) -> List[Tuple[TokenBucket, float]]:
+        # One request and ``tokens`` tokens, for whichever limits are configured
+        return [(b, cost) for b, cost in ((self.requests, 1.0), (self.tokens, tokens)) if b is not None]
+
+    def reserve(self, tokens: int = 0) -> float:
+        return max((bucket.reserve(cost) for bucket, cost in self._costs(tokens)), default=0.0)
+
+    def _cancel(self, tokens: int) -> None:
+        for bucket, cost in self._costs(tokens):
+            bucket.refund(cost)
+
+    def _wait_for(self, tokens: int, deadline: Optional[Deadline]) -> float:
+        wait = self.reserve(tokens)
+        if deadline is not None and wait > deadline.remaining():
+            self._cancel(tokens)
+            raise DeadlineExceeded(f"rate limit wait {wait:.2f}s exceeds the remaining deadline")
+        return wait
+
+    def acquire(self, tokens: int = 0, deadline: Optional[Deadline] = None) -> float:
+        wait = self._wait_for(tokens, deadline)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0, deadline: Optional[Deadline] = None) -> float:
+        wait = self._wait_for(tokens, deadline)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        # Correct the up-front token estimate once the real usage is known
+        if self.tokens is None or actual is None:
+            return
+        if actual > estimated:
+            self.tokens.reserve(actual - estimated)
+        elif actual < estimated:
+            self.tokens.refund(estimated - actual)
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        for bucket, _ in self._costs(0):
+            bucket.scale(0.5)
+            if retry_after:
+                bucket.pause(retry_after)
+
+    def succeeded(self) -> None:
+        for bucket, _ in self._costs(0):
+            bucket.scale(1.05)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive provider failures.
+
+    While open every call fails fast with CircuitOpenError; after
+    ``reset_timeout`` one probe call is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or self._clock() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = self._clock() - self._opened_at
+            if waited < self.reset_timeout or self._probing:
+                raise CircuitOpenError(max(0.0, self.reset_timeout - waited))
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        # The probe was abandoned without an answer (cancelled, interrupted): let the next call probe
+        with self._lock:
+            self._probing = False
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    return getattr(exc, "status_code", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429s, 5xx and connection/timeout errors are transient; 4xx are not."""
+    code = status_code(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    from groq import APIConnectionError  # deferred: keeps the Groq SDK out of import time
+    return isinstance(exc, APIConnectionError)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; Retry-After wins when the provider sends it."""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 rng: Optional[random.Random] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        if hint is not None:
+            return min(hint, self.max_delay)
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class _Attempt:
+    # Shared bookkeeping for the sync and async retry loops
+    def __init__(self, policy: RetryPolicy, breaker: Optional[CircuitBreaker],
+                 limiter: Optional[RateLimiter], deadline: Optional[Deadline], timeout: Optional[float],
+                 tokens: int):
+        self.policy = policy
+        self.breaker = breaker
+        self.limiter = limiter
+        self.deadline = deadline
+        self.timeout = timeout
+        self.tokens = tokens
+        self.retries = 0
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and self.deadline.expired:
+            raise DeadlineExceeded("deadline expired before the LLM call")
+
+    def start(self) -> None:
+        # Called after the rate-limit wait, so a half-open probe is only taken
+        # when the request is actually about to go out
+        if self.breaker is None:
+            return
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            if self.limiter is not None:
+                self.limiter._cancel(self.tokens)
+            raise
+
+    def abandoned(self) -> None:
+        if self.breaker is not None:
+            self.breaker.release_probe()
+
+    def call_timeout(self) -> Optional[float]:
+        # Computed after any rate-limit wait so the request never outlives the deadline
+        return self.deadline.timeout(self.timeout) if self.deadline is not None else self.timeout
+
+    def succeeded(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+        if self.limiter is not None:
+            self.limiter.succeeded()
+
+    def failed(self, exc: BaseException) -> float:
+        # Returns the backoff delay, or raises when the call should not be retried
+        if not is_retryable(exc):
+            # The provider answered (e.g. 400), so it is healthy
+            if self.breaker is not None:
+                self.breaker.record_success()
+            raise exc
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        hint = retry_after(exc)
+        if self.limiter is not None and status_code(exc) == 429:
+            self.limiter.throttled(hint)
+        if self.deadline is not None and self.deadline.expired:
+            raise DeadlineExceeded("deadline expired during the LLM call") from exc
+        if self.retries >= self.policy.max_retries:
+            raise ProviderUnavailableError(f"LLM provider failed after {self.retries + 1} attempts: {exc}") from exc
+        delay = self.policy.delay(self.retries, hint)
+        if self.deadline is not None and delay >= self.deadline.remaining():
+            raise DeadlineExceeded("no time left to retry the LLM call") from exc
+        self.retries += 1
+        return delay
+
+
+def call_with_retries(send: Callable[[Optional[float]], Any], policy: Optional[RetryPolicy] = None,
+                      breaker: Optional[CircuitBreaker] = None, limiter: Optional[RateLimiter] = None,
+                      deadline: Optional[Deadline] = None, timeout: Optional[float] = None,
+                      tokens: int = 0) -> Tuple[Any, int]:
+    """Run ``send(timeout)`` under the limiter, breaker and retry policy.
+
+    Returns (result, retries). Raises DeadlineExceeded, CircuitOpenError or
+    ProviderUnavailableError instead of hanging or retrying forever.
+    """
+    attempt = _Attempt(policy or RetryPolicy(), breaker, limiter, deadline, timeout, tokens)
+    while True:
+        attempt.check_deadline()
+        if limiter is not None:
+            limiter.acquire(tokens, deadline)
+        attempt.start()
+        try:
+            result = send(attempt.call_timeout())
+        except Exception as exc:
+            delay = attempt.failed(exc)
+        except BaseException:
+            attempt.abandoned()
+            raise
+        else:
+            attempt.succeeded()
+            return result, attempt.retries
+        time.sleep(delay)
+
+
+async def acall_with_retries(send: Callable[[Optional[float]], Awaitable[Any]],
+                             policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                             limiter: Optional[RateLimiter] = None, deadline: Optional[Deadline] = None,
+                             timeout: Optional[float] = None, tokens: int = 0) -> Tuple[Any, int]:
+    attempt = _Attempt(policy or RetryPolicy(), breaker, limiter, deadline, timeout, tokens)
+    while True:
+        attempt.check_deadline()
+        if limiter is not None:
+            await limiter.aacquire(tokens, deadline)
+        attempt.start()
+        try:
+            result = await send(attempt.call_timeout())
+        except Exception as exc:
+            delay = attempt.failed(exc)
+        except BaseException:
+            # e.g. CancelledError when a losing hedge is cancelled mid-probe
+            attempt.abandoned()
+            raise
+        else:
+            attempt.succeeded()
+            return result, attempt.retries
+        await asyncio.sleep(delay)
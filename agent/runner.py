@@ -0,0 +1,176 @@
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .llm_agent import SynapseAgent
+
+
+async def arun_scenarios(
+    scenarios: Iterable[Dict],
+    agent: Optional[SynapseAgent] = None,
+    concurrency: int = 32,
+    llm=None,
+    **agent_kwargs: Any,
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """Run many scenarios on one event loop, yielding (index, result) as each finishes.
+
+    At most ``concurrency`` runs are in flight at once, all on one shared agent
+    (per-run state lives in a RunContext). A run that raises yields an
+    ``error`` final plan instead of aborting the batch.
+    """
+    if agent is None:
+        agent = SynapseAgent(llm=llm, **agent_kwargs)
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(index: int, scenario: Dict) -> Tuple[int, Dict]:
+        async with sem:
+            try:
+                return index, await agent.arun(scenario)
+            except Exception as e:
+                return index, {"cot": [], "final_plan": {"status": "error", "reason": str(e)}}
+
+    tasks = [asyncio.ensure_future(_one(i, scen)) for i, scen in enumerate(scenarios)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Batch mode: thread/process pools with streaming results
+# ---------------------------------------------------------------------------
+
+def iter_scenarios_jsonl(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (id, scenario) from a JSONL file, one scenario object per line.
+
+    A line may be a bare scenario or ``{"id": ..., "scenario": {...}}``; blank
+    lines are skipped and ids default to the line number.
+    """
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            scenario = obj.get("scenario", obj)
+            yield str(obj.get("id") or obj.get("key") or lineno), scenario
+
+
+def iter_scenarios_file(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (key, scenario) for every entry of a scenarios.json-style file."""
+    with open(path) as f:
+        scenarios = json.load(f)
+    yield from scenarios.items()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest-rank percentile over an already sorted list
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class BatchStats:
+    """Running latency/status totals; keeps only floats, never results."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies: List[float] = []
+        self.status_counts: Dict[str, int] = {}
+
+    def add(self, record: Dict) -> None:
+        self.latencies.append(record["latency_s"])
+        status = (record.get("final_plan") or {}).get("status", "unknown")
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def summary(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        lat = sorted(self.latencies)
+        return {
+            "scenarios": len(lat),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(len(lat) / elapsed, 3) if elapsed > 0 else 0.0,
+            "p50_latency_s": round(percentile(lat, 50), 3),
+            "p95_latency_s": round(percentile(lat, 95), 3),
+            "status_counts": self.status_counts,
+        }
+
+
+def _timed_run(agent: SynapseAgent, scenario_id: str, scenario: Dict) -> Dict:
+    start = time.perf_counter()
+    try:
+        result = agent.run(scenario)
+    except Exception as e:
+        result = {"cot": [], "final_plan": {"status": "error", "reason": str(e)}}
+    return {
+        "id": scenario_id,
+        "latency_s": round(time.perf_counter() - start, 4),
+        "final_plan": result["final_plan"],
+        "metrics": result.get("metrics"),
+        "cot": result["cot"],
+    }
+
+
+# Per-process agent for the process pool; clients are not picklable, so every
+# worker process builds its own agent once in the initializer.
+_worker_agent: Optional[SynapseAgent] = None
+
+
+def _init_process_worker(agent_kwargs: Dict[str, Any]) -> None:
+    global _worker_agent
+    _worker_agent = SynapseAgent(**agent_kwargs)
+
+
+def _process_run(scenario_id: str, scenario: Dict) -> Dict:
+    return _timed_run(_worker_agent, scenario_id, scenario)
+
+
+def run_batch(
+    items: Iterable[Tuple[str, Dict]],
+    workers: int = 4,
+    executor: str = "thread",
+    llm=None,
+    **agent_kwargs: Any,
+) -> Iterator[Dict]:
+    """Run (id, scenario) pairs on a worker pool, yielding one record per scenario as it finishes.
+
+    ``items`` is consumed lazily and at most ``2 * workers`` runs are queued at
+    once, so memory stays flat however long the input is. With
+    ``executor="process"`` each worker process builds its own Groq client and
+    ``llm`` is ignored.
+    """
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker,
+                                   initargs=(agent_kwargs,))
+
+        def submit(scenario_id, scenario):
+            return pool.submit(_process_run, scenario_id, scenario)
+    elif executor == "thread":
+        agent = SynapseAgent(llm=llm, **agent_kwargs)
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+        def submit(scenario_id, scenario):
+            return pool.submit(_timed_run, agent, scenario_id, scenario)
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+
+    max_pending = 2 * workers
+    pending = set()
+    with pool:
+        for scenario_id, scenario in items:
+            pending.add(submit(scenario_id, scenario))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Callable, Optional
+
+_THOUGHT_RE = re.compile(r'"thought"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+_PARTIAL_UNICODE_RE = re.compile(r'(?<!\\)((?:\\\\)*)\\u[0-9a-fA-F]{0,3}$')
+
+
+def _decode_partial_string(raw: str) -> str:
+    # Drop a dangling escape sequence at the end of a half-received JSON string
+    if (len(raw) - len(raw.rstrip("\\"))) % 2:
+        raw = raw[:-1]
+    raw = _PARTIAL_UNICODE_RE.sub(r"\1", raw)
+    try:
+        return json.loads('"' + raw + '"')
+    except json.JSONDecodeError:
+        return raw
+
+
+class JsonObjectScanner:
+    """Incremental scanner for the first top-level JSON object in a token stream.
+
+    ``feed`` returns the object's text as soon as its closing brace arrives,
+    so the caller can stop reading the stream. Anything before the first
+    ``{`` (code fences, chatter) is ignored. If ``on_thought`` is given it is
+    called with each newly received piece of the ``thought`` string.
+    """
+
+    def __init__(self, on_thought: Optional[Callable[[str], None]] = None):
+        self.on_thought = on_thought
+        self.text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._result: Optional[str] = None
+        self._thought_sent = 0
+
+    @property
+    def complete(self) -> bool:
+        return self._result is not None
+
+    def result(self) -> Optional[str]:
+        return self._result
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self._result is not None:
+            return self._result
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._start is None:
+                if ch == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._result = text[self._start:i + 1]
+                    break
+        self._pos = len(text)
+        self._emit_thought()
+        return self._result
+
+    def _emit_thought(self) -> None:
+        if self.on_thought is None or self._start is None:
+            return
+        match = _THOUGHT_RE.search(self.text, self._start)
+        if not match:
+            return
+        thought = _decode_partial_string(match.group(1))
+        if len(thought) > self._thought_sent:
+            self.on_thought(thought[self._thought_sent:])
+            self._thought_sent = len(thought)
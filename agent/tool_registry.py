@@ -0,0 +1,286 @@
+import copy
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from simulator import tools
+from simulator.world import in_seeded_run
+
+
+# Annotation -> (schema type name, JSON Schema type)
+_PARAM_TYPES = {str: ("str", "string"), int: ("int", "integer"), float: ("float", "number"),
+                bool: ("bool", "boolean")}
+
+# Terminal actions the model may choose besides the registered tools
+CONTROL_ACTIONS = {
+    "finish": {"final_plan": str},
+    "ask_human": {"reason": str},
+}
+
+
+def _coerce(value: Any, expected: Optional[type]) -> Any:
+    # Accept what the model plausibly meant ("1.5" for a float, 42 for an id) and
+    # raise ValueError on anything else
+    if value is None or expected is None:
+        return value
+    if isinstance(value, bool) and expected is not bool:
+        raise ValueError
+    if isinstance(value, expected):
+        return value
+    if expected is str and isinstance(value, (int, float)):
+        return str(value)
+    if expected is float and isinstance(value, int):
+        return float(value)
+    if expected in (int, float) and isinstance(value, str):
+        return expected(value.strip())
+    raise ValueError
+
+
+class ToolParam:
+    def __init__(self, name: str, annotation: Any, default: Any, required: bool):
+        self.name = name
+        self.type = annotation if annotation in _PARAM_TYPES else None
+        self.default = default
+        self.required = required
+
+    def signature(self) -> str:
+        text = f"{self.name}:{_PARAM_TYPES[self.type][0]}" if self.type else self.name
+        if not self.required and self.default not in (None, ""):
+            text += f"={self.default!r}" if isinstance(self.default, str) else f"={self.default}"
+        return text
+
+
+class ToolSpec:
+    def __init__(self, name: str, func: Callable, cacheable: bool = False, ttl: float = 0.0,
+                 uses_rng: bool = False):
+        self.name = name
+        self.func = func
+        # Only read-only lookups may be cached; side-effecting tools always run
+        self.cacheable = cacheable
+        self.ttl = ttl
+        # Draws from the simulator's per-run RNG: never cached inside a seeded run
+        self.uses_rng = uses_rng
+        # Parameters come from the function signature; **kwargs tools accept anything
+        self.params: Dict[str, ToolParam] = {}
+        self.open_kwargs = False
+        for p in inspect.signature(func).parameters.values():
+            if p.kind is p.VAR_KEYWORD:
+                self.open_kwargs = True
+            elif p.kind is not p.VAR_POSITIONAL:
+                required = p.default is p.empty
+                self.params[p.name] = ToolParam(p.name, p.annotation, None if required else p.default, required)
+
+    def signature(self) -> str:
+        """Compact one-line schema, e.g. ``get_nearby_merchants(merchant_id:str, radius_km:float=2.0)``."""
+        return f"{self.name}({', '.join(p.signature() for p in self.params.values())})"
+
+    def definition(self) -> Dict[str, Any]:
+        """Function definition for tool-calling chat APIs."""
+        return _function_definition(self.name, {n: p.type for n, p in self.params.items()},
+                                    [n for n, p in self.params.items() if p.required])
+
+    def bind(self, action_input: Any) -> Dict[str, Any]:
+        """Validate ``action_input`` against the signature; returns call kwargs or raises ValueError."""
+        if action_input is None:
+            action_input = {}
+        if not isinstance(action_input, dict):
+            # A bare value is meant for the first parameter
+            if not self.params:
+                raise ValueError(f"{self.name} takes no arguments")
+            action_input = {next(iter(self.params)): action_input}
+        kwargs = {}
+        for key, value in action_input.items():
+            param = self.params.get(key)
+            if param is None:
+                if not self.open_kwargs:
+                    raise ValueError(f"unexpected argument '{key}'")
+                kwargs[key] = value
+                continue
+            try:
+                kwargs[key] = _coerce(value, param.type)
+            except (TypeError, ValueError):
+                raise ValueError(f"'{key}' must be {_PARAM_TYPES[param.type][0]}, got {value!r}") from None
+        missing = [n for n, p in self.params.items() if p.required and n not in kwargs]
+        if missing:
+            raise ValueError(f"missing argument '{missing[0]}'")
+        return kwargs
+
+
+def _function_definition(name: str, params: Dict[str, Optional[type]], required: List[str]) -> Dict[str, Any]:
+    properties = {n: ({"type": _PARAM_TYPES[t][1]} if t else {}) for n, t in params.items()}
+    return {"type": "function", "function": {
+        "name": name,
+        "parameters": {"type": "object", "properties": properties, "required": required},
+    }}
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolRegistry:
+    """Name -> tool mapping with per-tool caching and single-flight coalescing.
+
+    Cacheable tools keep results for ``ttl`` seconds, keyed on name + arguments,
+    and concurrent identical calls share one in-flight execution. Other tools
+    are invoked directly on every call, as are ``uses_rng`` tools inside a
+    seeded run (simulator.world.seeded_run), so that run's random draws never
+    come from another run's cached result. The cache is an LRU of at most
+    ``max_cache_entries`` results; expired ones are dropped when looked up or
+    when the cache fills up.
+    """
+
+    def __init__(self, max_cache_entries: int = 4096):
+        self._tools: Dict[str, ToolSpec] = {}
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], _InFlight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "cache_hits": 0, "coalesced": 0, "executions": 0, "invalid": 0,
+                       "evictions": 0}
+
+    def register(self, name: str, func: Callable, cacheable: bool = False, ttl: float = 0.0,
+                 uses_rng: bool = False) -> None:
+        self._tools[name] = ToolSpec(name, func, cacheable, ttl, uses_rng)
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._tools.get(name)
+
+    def is_read_only(self, name: str) -> bool:
+        spec = self._tools.get(name)
+        return spec is not None and spec.cacheable
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def compact_schema(self) -> str:
+        """One signature per line, generated from the registered functions."""
+        return "\n".join(spec.signature() for spec in self._tools.values())
+
+    def tool_definitions(self) -> List[Dict[str, Any]]:
+        """Tool-calling definitions for every tool plus the finish/ask_human control actions."""
+        definitions = [spec.definition() for spec in self._tools.values()]
+        for name, params in CONTROL_ACTIONS.items():
+            definitions.append(_function_definition(name, params, list(params)))
+        return definitions
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def cache_size(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def _cache_get(self, key: Tuple[str, str], now: float) -> Optional[Tuple[Any, float]]:
+        # Caller holds the lock
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        if hit[1] <= now:
+            del self._cache[key]
+            self._stats["evictions"] += 1
+            return None
+        self._cache.move_to_end(key)
+        return hit
+
+    def _cache_put(self, key: Tuple[str, str], value: Any, expires: float, now: float) -> None:
+        # Caller holds the lock. When full, expired entries go first, then the least recently used
+        if expires <= now:
+            return
+        self._cache[key] = (value, expires)
+        self._cache.move_to_end(key)
+        if len(self._cache) <= self.max_cache_entries:
+            return
+        for stale in [k for k, (_, exp) in self._cache.items() if exp <= now]:
+            del self._cache[stale]
+            self._stats["evictions"] += 1
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def call(self, name: str, action_input: Any) -> Dict:
+        spec = self._tools.get(name)
+        if not spec:
+            return {"error": "unknown_action"}
+        with self._lock:
+            self._stats["calls"] += 1
+        # Arguments are checked against the signature before anything runs; the
+        # model gets the problem back as an observation and can correct itself
+        try:
+            kwargs = spec.bind(action_input)
+        except ValueError as e:
+            with self._lock:
+                self._stats["invalid"] += 1
+            return {"error": "invalid_arguments", "detail": str(e), "expected": spec.signature()}
+        if not spec.cacheable or (spec.uses_rng and in_seeded_run()):
+            with self._lock:
+                self._stats["executions"] += 1
+            return spec.func(**kwargs)
+
+        key = (name, json.dumps(kwargs, sort_keys=True, default=str))
+        with self._lock:
+            hit = self._cache_get(key, time.monotonic())
+            if hit is not None:
+                self._stats["cache_hits"] += 1
+                return copy.deepcopy(hit[0])
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = spec.func(**kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and not (isinstance(call.result, dict) and "error" in call.result):
+                    now = time.monotonic()
+                    self._cache_put(key, call.result, now + spec.ttl, now)
+            call.done.set()
+        return copy.deepcopy(call.result)
+
+
+def build_default_registry() -> ToolRegistry:
+    registry = ToolRegistry()
+    # Read-only lookups: safe to cache briefly and coalesce
+    registry.register("check_traffic", tools.check_traffic, cacheable=True, ttl=30, uses_rng=True)
+    registry.register("get_merchant_status", tools.get_merchant_status, cacheable=True, ttl=30, uses_rng=True)
+    registry.register("get_nearby_merchants", tools.get_nearby_merchants, cacheable=True, ttl=300)
+    registry.register("find_nearby_locker", tools.find_nearby_locker, cacheable=True, ttl=300)
+    # Side-effecting or per-order tools: never cached
+    registry.register("re_route_driver", tools.re_route_driver)
+    registry.register("notify_customer", tools.notify_customer)
+    registry.register("initiate_mediation_flow", tools.initiate_mediation_flow)
+    registry.register("collect_evidence", tools.collect_evidence)
+    registry.register("analyze_evidence", tools.analyze_evidence)
+    registry.register("issue_instant_refund", tools.issue_instant_refund)
+    registry.register("exonerate_driver", tools.exonerate_driver)
+    registry.register("log_merchant_packaging_feedback", tools.log_merchant_packaging_feedback)
+    registry.register("contact_recipient_via_chat", tools.contact_recipient_via_chat)
+    return registry
+
+
+# Built once at import and shared by every agent in the process
+DEFAULT_REGISTRY = build_default_registry()
@@ -0,0 +1,201 @@
+"""Offline load-testing benchmarks for the Synapse agent loop.
+
+Runs entirely against MockLLM, so no GROQ_API_KEY or network is needed:
+
+    python benchmarks/bench_agent.py                      # print results
+    python benchmarks/bench_agent.py --save benchmarks/baseline.json
+    python benchmarks/bench_agent.py --compare benchmarks/baseline.json --tolerance 0.3
+
+--compare exits non-zero if any metric regressed by more than the tolerance.
+The microsecond timings (step overhead, tool dispatch) are the median of
+``--rounds`` runs and get their own, wider ``--us-tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agent.llm_agent import SynapseAgent  # noqa: E402
+from agent.mock_llm import DEFAULT_SCRIPTS, MockLLM  # noqa: E402
+from agent.runner import percentile  # noqa: E402
+from agent.tool_registry import build_default_registry  # noqa: E402
+
+SCENARIOS_FILE = os.path.join(ROOT, "simulator", "scenarios.json")
+
+# Metric name -> True if higher is better
+DIRECTIONS = {"step_overhead_us": False, "tool_dispatch_us": False, "final_prompt_chars": False,
+              "throughput_per_s": True, "p95_latency_s": False}
+
+
+class PromptRecorder:
+    """Wraps an LLM and records the prompt size (chars) sent on every call."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.sizes: List[int] = []
+
+    def generate_json(self, messages, **kwargs):
+        self.sizes.append(sum(len(m.content) for m in messages))
+        return self.llm.generate_json(messages, **kwargs)
+
+
+def bench_step_overhead(scenarios: Dict, repeats: int) -> Dict:
+    agent = SynapseAgent(llm=MockLLM.for_scenarios(scenarios))
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for scen in scenarios.values():
+            steps += len(agent.run(scen)["cot"])
+    elapsed = time.perf_counter() - start
+    return {"steps": steps, "step_overhead_us": round(elapsed / steps * 1e6, 2)}
+
+
+def bench_prompt_growth(scenarios: Dict) -> Dict:
+    out = {}
+    for key, scen in scenarios.items():
+        recorder = PromptRecorder(MockLLM.for_scenarios(scenarios))
+        SynapseAgent(llm=recorder).run(scen)
+        out[key] = {"prompt_chars_per_step": recorder.sizes, "final_prompt_chars": recorder.sizes[-1]}
+    return out
+
+
+def bench_tool_dispatch(calls: int) -> Dict:
+    samples = {}
+    for script in DEFAULT_SCRIPTS.values():
+        for step in script:
+            if step["action"] not in ("finish", "ask_human"):
+                samples.setdefault(step["action"], step["action_input"])
+    out = {}
+    for name, action_input in samples.items():
+        registry = build_default_registry()
+        start = time.perf_counter()
+        for _ in range(calls):
+            registry.call(name, action_input)
+        out[name] = {"tool_dispatch_us": round((time.perf_counter() - start) / calls * 1e6, 2),
+                     "cacheable": registry.is_read_only(name)}
+    return out
+
+
+async def _throughput(scenarios: Dict, concurrency: int, runs: int, latency: float, jitter: float) -> Dict:
+    agent = SynapseAgent(llm=MockLLM.for_scenarios(scenarios, latency=latency, jitter=jitter, seed=concurrency))
+    items = list(scenarios.values())
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            await agent.arun(items[i % len(items)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(runs)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"runs": runs, "throughput_per_s": round(runs / elapsed, 2),
+            "p50_latency_s": round(percentile(latencies, 50), 4),
+            "p95_latency_s": round(percentile(latencies, 95), 4)}
+
+
+def bench_throughput(scenarios: Dict, levels: List[int], runs_per_worker: int, latency: float, jitter: float) -> Dict:
+    return {str(c): asyncio.run(_throughput(scenarios, c, max(20, c * runs_per_worker), latency, jitter))
+            for c in levels}
+
+
+def _median_of(bench: Callable[[], Dict], rounds: int) -> Dict:
+    # Same result shape as one run, with every compared metric replaced by its median
+    runs = [bench() for _ in range(rounds)]
+
+    def merge(values: List):
+        first = values[0]
+        if isinstance(first, dict):
+            return {k: merge([v[k] for v in values]) for k in first}
+        if isinstance(first, (int, float)) and not isinstance(first, bool):
+            return type(first)(statistics.median(values))
+        return first
+
+    return merge(runs)
+
+
+def run_all(quick: bool = False, rounds: int = 5) -> Dict:
+    with open(SCENARIOS_FILE) as f:
+        scenarios = json.load(f)
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "quick": quick,
+                 "rounds": rounds},
+        "step_overhead": _median_of(lambda: bench_step_overhead(scenarios, repeats=5 if quick else 50), rounds),
+        "prompt_growth": bench_prompt_growth(scenarios),
+        "tool_dispatch": _median_of(lambda: bench_tool_dispatch(calls=200 if quick else 5000), rounds),
+        "throughput": bench_throughput(scenarios, [1, 10, 100], runs_per_worker=2 if quick else 10,
+                                       latency=0.005 if quick else 0.02, jitter=0.002 if quick else 0.005),
+    }
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif key in DIRECTIONS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, us_tolerance: float = 0.6) -> List[str]:
+    """Return one message per metric that regressed by more than its tolerance (a fraction).
+
+    ``us_tolerance`` applies to the ``*_us`` timings, which move with CPU
+    frequency and cache state far more than counts or throughput do.
+    """
+    regressions = []
+    cur, base = _flatten(current), _flatten(baseline)
+    for path, old in base.items():
+        new = cur.get(path)
+        if new is None or not old:
+            continue
+        higher_is_better = DIRECTIONS[path.rsplit(".", 1)[-1]]
+        change = (old - new) / old if higher_is_better else (new - old) / old
+        if change > (us_tolerance if path.endswith("_us") else tolerance):
+            regressions.append(f"{path}: {old} -> {new} ({change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Synapse agent benchmarks (MockLLM)")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and lower simulated latency")
+    parser.add_argument("--save", metavar="PATH", help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed regression fraction (default 0.3)")
+    parser.add_argument("--us-tolerance", type=float, default=0.6,
+                        help="Allowed regression fraction for microsecond timings (default 0.6)")
+    parser.add_argument("--rounds", type=int, default=5, help="Runs of the microsecond benchmarks (median is kept)")
+    args = parser.parse_args()
+
+    results = run_all(quick=args.quick, rounds=args.rounds)
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.us_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
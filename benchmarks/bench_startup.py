@@ -0,0 +1,97 @@
+"""Cold-start import benchmark, based on ``python -X importtime``.
+
+Imports each entry point in a fresh interpreter and reports the cumulative
+import time plus any heavy optional dependency that got pulled in:
+
+    python benchmarks/bench_startup.py            # print results
+    python benchmarks/bench_startup.py --check    # exit non-zero if over budget
+
+tests/test_startup.py enforces the same budgets.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed per entry point (ms). The agent modules pay
+# for NumPy (simulator world, example store); cli.py defers even those.
+BUDGETS_MS = {"cli": 150, "agent.llm_agent": 600, "agent.runner": 600, "service": 700}
+
+# Must not be imported by any entry point: LangChain is an optional adapter,
+# the Groq SDK / httpx load with the first GroqLLM, dotenv in main().
+DEFERRED = ("langchain", "langchain_core", "langsmith", "pydantic", "groq", "httpx", "dotenv")
+
+
+def parse_importtime(stderr: str, module: str) -> Dict[str, int]:
+    """Cumulative import time (us) of ``module`` and everything it imported, from ``-X importtime``.
+
+    Lines are printed children-first and indented by depth, so the subtree of
+    ``module`` is the indented run of lines right before its own line; this
+    leaves out interpreter startup (site, .pth files).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((depth, name.strip(), int(cumulative)))
+    end = max(i for i, (depth, name, _) in enumerate(rows) if depth == 0 and name == module)
+    start = end
+    while start > 0 and rows[start - 1][0] > 0:
+        start -= 1
+    return {name: us for depth, name, us in rows[start:end + 1]}
+
+
+def measure(module: str, repeats: int = 3) -> Dict:
+    """Best-of-``repeats`` cold import of ``module`` in a fresh interpreter."""
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                              capture_output=True, text=True, check=True)
+        times = parse_importtime(proc.stderr, module)
+        if best is None or times[module] < best[module]:
+            best = times
+    deferred_loaded = sorted({name.split(".")[0] for name in best} & set(DEFERRED))
+    slowest = sorted(((t, name) for name, t in best.items() if name != module and "." not in name),
+                     reverse=True)[:5]
+    return {
+        "import_ms": round(best[module] / 1000, 1),
+        "budget_ms": BUDGETS_MS.get(module),
+        "deferred_loaded": deferred_loaded,
+        "slowest_top_level": {name: round(t / 1000, 1) for t, name in slowest},
+    }
+
+
+def violations(results: Dict[str, Dict]) -> List[str]:
+    out = []
+    for module, r in results.items():
+        if r["budget_ms"] is not None and r["import_ms"] > r["budget_ms"]:
+            out.append(f"{module}: {r['import_ms']} ms > {r['budget_ms']} ms budget")
+        if r["deferred_loaded"]:
+            out.append(f"{module}: imports {', '.join(r['deferred_loaded'])} at startup")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import times of the Synapse entry points")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if a budget is exceeded")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module (best is kept)")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.repeats) for module in BUDGETS_MS}
+    print(json.dumps(results, indent=2))
+    if args.check:
+        problems = violations(results)
+        for line in problems:
+            print(f"OVER BUDGET {line}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
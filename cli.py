@@ -2,11 +2,11 @@
 import argparse
 import json
 import os
-from agent.llm_agent import SynapseAgent
-from dotenv import load_dotenv
+import sys
 
-# Load .env early so GROQ_API_KEY is available
-load_dotenv()
+# Agent modules (and through them the Groq SDK and NumPy) are imported inside
+# the functions that need them, after argument parsing, so --help, argument
+# errors and --prompt-info start fast; see benchmarks/bench_startup.py.
 
 # Optional: color output for better readability
 try:
@@ -18,38 +18,243 @@ except ImportError:
     Fore = Style = Dummy()
 
 
+class ThoughtPrinter:
+    """on_thought callback that renders each step's thought live."""
+
+    def __init__(self):
+        self.step = None
+
+    def __call__(self, step: int, text: str):
+        if step != self.step:
+            prefix = "\n" if self.step is not None else ""
+            sys.stdout.write(f"{prefix}{Fore.GREEN}Step {step} (live){Style.RESET_ALL}: ")
+            self.step = step
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+def print_latency_breakdown(result):
+    metrics = result.get("metrics")
+    if not metrics:
+        return
+    print(f"\n{Fore.YELLOW}===== LATENCY BREAKDOWN ====={Style.RESET_ALL}")
+    for step in result["cot"]:
+        m = step.get("metrics") or {}
+        tokens = f"{m.get('prompt_tokens') or '-'}/{m.get('completion_tokens') or '-'}"
+        route = f"  via {m['route']}{' (hedged)' if m.get('hedged') else ''}" if "route" in m else ""
+        print(f"  Step {step['step']} {step['action']:<32} llm {m.get('llm_ms', 0):>9.1f} ms  "
+              f"tool {m.get('tool_ms', 0):>8.1f} ms  retries {m.get('retries', 0)}  "
+              f"tokens {tokens}  prompt {m.get('prompt_chars', 0)} chars{route}")
+    print(f"  {Fore.CYAN}Total:{Style.RESET_ALL} {metrics['wall_ms']:.1f} ms wall = "
+          f"{metrics['llm_ms']:.1f} ms LLM ({metrics['llm_calls']} calls, {metrics['retries']} retries) + "
+          f"{metrics['tool_ms']:.1f} ms tools ({metrics['tool_calls']} calls); "
+          f"tokens {metrics['prompt_tokens']} prompt / {metrics['completion_tokens']} completion"
+          + (f" (usage unknown for {metrics['llm_calls_without_usage']} calls)"
+             if metrics.get("llm_calls_without_usage") else ""))
+
+
 def load_scenarios(path: str):
     with open(path) as f:
         return json.load(f)
 
 
+def policy_engine(args):
+    from agent.playbooks import PolicyEngine
+
+    return None if args.no_playbooks else PolicyEngine.from_file()
+
+
+def example_store(args):
+    from agent.prompts import ExampleStore
+
+    return ExampleStore.load(args.examples) if args.examples else None
+
+
+def build_llm(args):
+    from agent.llm_agent import GroqLLM, ModelRouter
+
+    structured = "json" if args.structured else None
+    llm = GroqLLM(streaming=args.stream, structured=structured)
+    if args.strong_model:
+        llm = ModelRouter(llm, GroqLLM(model=args.strong_model, streaming=args.stream, structured=structured))
+    return llm
+
+
+def run_batch_mode(args):
+    from agent.journal import RunJournal
+    from agent.runner import BatchStats, iter_scenarios_file, iter_scenarios_jsonl, run_batch
+
+    if args.batch:
+        if not os.path.exists(args.batch):
+            print(f"{Fore.RED}Batch file not found: {args.batch}", file=sys.stderr)
+            return
+        items = iter_scenarios_jsonl(args.batch)
+    else:
+        if not os.path.exists(args.scenarios_file):
+            print(f"{Fore.RED}Scenarios file not found: {args.scenarios_file}", file=sys.stderr)
+            return
+        items = iter_scenarios_file(args.scenarios_file)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    stats = BatchStats()
+    journal = RunJournal(args.journal) if args.journal else None
+    agent_kwargs = dict(multi_action=args.multi_action, policy_engine=policy_engine(args),
+                        structured=args.structured, thought=args.thought, journal=journal,
+                        world_seed=args.seed, example_store=example_store(args), few_shot_k=args.few_shot)
+    if args.executor == "thread":
+        # One shared LLM (or fast/strong router) for every worker thread; thoughts
+        # are not printed live in batch mode, --stream only stops reading early
+        agent_kwargs["llm"] = build_llm(args)
+    intake = None
+    if args.dedup_window is not None:
+        from agent.intake import IncidentIntake
+
+        # Near-duplicate scenarios share one agent run per incident
+        intake = IncidentIntake(workers=args.workers, window_s=args.dedup_window, **agent_kwargs)
+        records = intake.run(items)
+    else:
+        records = run_batch(items, workers=args.workers, executor=args.executor, **agent_kwargs)
+    try:
+        # One JSON line per scenario, flushed as soon as it finishes
+        for record in records:
+            stats.add(record)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if intake is not None:
+            intake.close()
+        if journal is not None:
+            journal.close()
+
+    summary = stats.summary()
+    if intake is not None:
+        summary["intake"] = intake.stats()
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+
+
 def main():
-    parser = argparse.ArgumentParser(description="Run Project Synapse Agent (Groq + LangChain)")
-    parser.add_argument("--scenario", required=True, help="Scenario key from simulator/scenarios.json")
+    parser = argparse.ArgumentParser(description="Run Project Synapse Agent (Groq)")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--scenario", help="Scenario key from simulator/scenarios.json")
+    mode.add_argument("--batch", metavar="JSONL", help="Run every scenario in a JSONL file (one per line)")
+    mode.add_argument("--all", action="store_true", help="Run every scenario in --scenarios-file")
+    mode.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run from --journal")
+    mode.add_argument("--prompt-info", action="store_true",
+                      help="Print the static prompt prefix hash/length and exit")
     parser.add_argument("--scenarios-file", default="simulator/scenarios.json")
+    parser.add_argument("--workers", type=int, default=4, help="Batch mode: parallel workers")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="Batch mode: worker pool type")
+    parser.add_argument("--output", help="Batch mode: write JSONL results here instead of stdout")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream completions, stopping once the action is complete; with --scenario "
+                             "also print each step's thought as it arrives")
+    parser.add_argument("--no-playbooks", action="store_true",
+                        help="Skip the rule-based playbook fast path and always use the LLM")
+    parser.add_argument("--multi-action", action="store_true",
+                        help="Let the model batch independent read-only tool calls into one step")
+    parser.add_argument("--structured", action="store_true",
+                        help="Compact tool schema prompt and Groq JSON mode for every step")
+    parser.add_argument("--thought", choices=["full", "brief", "none"], default="full",
+                        help="How much reasoning text the model writes per step")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="Append every step to this run journal (query it with python -m agent.journal)")
+    parser.add_argument("--strong-model", metavar="MODEL",
+                        help="Route finish/ask_human decisions to this Groq model, other steps to the default one")
+    parser.add_argument("--dedup-window", type=float, metavar="SECONDS",
+                        help="Batch mode: group near-duplicate scenarios reported within this window and "
+                             "resolve each group with one agent run (thread executor only)")
+    parser.add_argument("--world", metavar="PATH",
+                        help="Simulator world (.npz or .json) of merchants, drivers and lockers")
+    parser.add_argument("--examples", metavar="PATH",
+                        help="Few-shot example store (.npz from python -m agent.prompts, or .jsonl); "
+                             "each scenario gets only its --few-shot most similar examples")
+    parser.add_argument("--few-shot", type=int, default=2, help="Examples retrieved per scenario with --examples")
+    parser.add_argument("--seed", type=int, help="Seed the simulator's per-run RNG for reproducible tool results")
     args = parser.parse_args()
 
-    scen_file = args.scenarios_file
-    if not os.path.exists(scen_file):
-        print(f"{Fore.RED}Scenarios file not found: {scen_file}")
+    if args.world:
+        # Read lazily by simulator.world.get_world(), in this and any worker process
+        os.environ["SYNAPSE_WORLD"] = args.world
+
+    if args.prompt_info:
+        from agent.prompts import prefix_fingerprint
+        from agent.tool_registry import DEFAULT_REGISTRY
+
+        tool_schema = DEFAULT_REGISTRY.compact_schema() if args.structured else None
+        print(json.dumps(prefix_fingerprint(args.multi_action, tool_schema, args.thought)))
         return
 
-    scens = load_scenarios(scen_file)
+    # Read .env only for commands that may talk to Groq
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    if args.journal and args.executor == "process" and (args.batch or args.all):
+        print(f"{Fore.RED}--journal needs --executor thread (one journal writer per process)", file=sys.stderr)
+        return
+    if args.dedup_window is not None and args.executor == "process":
+        print(f"{Fore.RED}--dedup-window needs --executor thread", file=sys.stderr)
+        return
+    if (args.stream or args.strong_model) and args.executor == "process" and (args.batch or args.all):
+        print(f"{Fore.RED}--stream and --strong-model need --executor thread (worker processes build their own "
+              f"default LLM)", file=sys.stderr)
+        return
+    if args.resume and not args.journal:
+        print(f"{Fore.RED}--resume needs --journal")
+        return
 
-    if args.scenario not in scens:
-        print(f"{Fore.RED}Scenario '{args.scenario}' not found in {scen_file}")
+    if args.batch or args.all:
+        if not os.getenv("GROQ_API_KEY"):
+            print(f"{Fore.RED}Error: GROQ_API_KEY is not set in environment or .env file.", file=sys.stderr)
+            return
+        run_batch_mode(args)
         return
 
+    if args.scenario:
+        scen_file = args.scenarios_file
+        if not os.path.exists(scen_file):
+            print(f"{Fore.RED}Scenarios file not found: {scen_file}")
+            return
+
+        scens = load_scenarios(scen_file)
+
+        if args.scenario not in scens:
+            print(f"{Fore.RED}Scenario '{args.scenario}' not found in {scen_file}")
+            return
+
     # Ensure GROQ_API_KEY is set
     if not os.getenv("GROQ_API_KEY"):
         print(f"{Fore.RED}Error: GROQ_API_KEY is not set in environment or .env file.")
         return
 
-    # Create agent with Groq LLM through LangChain
-    agent = SynapseAgent()
-    print(f"{Fore.CYAN}Running scenario: {args.scenario}{Style.RESET_ALL}\n")
+    from agent.journal import RunJournal
+    from agent.llm_agent import SynapseAgent
 
-    result = agent.run(scens[args.scenario])
+    # Create agent with the Groq LLM
+    llm = build_llm(args)
+    journal = RunJournal(args.journal) if args.journal else None
+    store = example_store(args)
+    agent = SynapseAgent(llm=llm, multi_action=args.multi_action,
+                         on_thought=ThoughtPrinter() if args.stream else None, policy_engine=policy_engine(args),
+                         structured=args.structured, thought=args.thought, journal=journal,
+                         world_seed=args.seed, example_store=store, few_shot_k=args.few_shot)
+    try:
+        if args.resume:
+            print(f"{Fore.CYAN}Resuming run: {args.resume}{Style.RESET_ALL}\n")
+            result = agent.resume(args.resume)
+        else:
+            print(f"{Fore.CYAN}Running scenario: {args.scenario}{Style.RESET_ALL}\n")
+            result = agent.run(scens[args.scenario])
+    finally:
+        if journal is not None:
+            journal.close()
+    if args.stream:
+        print("\n")
 
     print(f"{Fore.YELLOW}===== CHAIN OF THOUGHT ====={Style.RESET_ALL}")
     for step in result['cot']:
@@ -61,6 +266,11 @@ def main():
     print(f"{Fore.YELLOW}===== FINAL PLAN ====={Style.RESET_ALL}")
     print(json.dumps(result['final_plan'], indent=2))
 
+    print_latency_breakdown(result)
+    if store is not None:
+        print(f"{Fore.YELLOW}===== FEW-SHOT RETRIEVAL ====={Style.RESET_ALL}")
+        print(json.dumps(store.stats(), indent=2))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,304 @@
+# service.py
+import argparse
+import json
+import math
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from agent.llm_agent import GroqLLM, SynapseAgent
+from agent.metrics import MetricsRecorder
+from agent.playbooks import PolicyEngine
+from agent.resilience import RateLimiter
+from agent.runner import percentile
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("queue full")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, scenario: Dict):
+        self.id = uuid.uuid4().hex
+        self.scenario = scenario
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def as_dict(self) -> Dict:
+        out = {"job_id": self.id, "status": self.status, "submitted": self.submitted,
+               "started": self.started, "finished": self.finished}
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+class AgentService:
+    """Bounded job queue in front of one shared SynapseAgent and a worker pool.
+
+    ``submit`` never blocks: when the queue is full it raises QueueFull with a
+    retry-after estimate, so memory stays bounded under overload. Finished
+    jobs are kept for lookup up to ``max_jobs``, oldest evicted first.
+    ``run_deadline`` (seconds, counted from submission) bounds each run.
+    """
+
+    def __init__(self, agent: SynapseAgent, workers: int = 4, queue_size: int = 64,
+                 max_jobs: int = 10000, latency_window: int = 1000, run_deadline: Optional[float] = None):
+        self.agent = agent
+        self.run_deadline = run_deadline
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "in_flight": 0}
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"synapse-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _retry_after(self) -> int:
+        with self._lock:
+            lat = sorted(self._latencies)
+        typical = percentile(lat, 50) if lat else 1.0
+        return max(1, math.ceil(self._queue.qsize() * typical / max(1, self.workers)))
+
+    def submit(self, scenario: Dict) -> Job:
+        job = Job(scenario)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise QueueFull(self._retry_after())
+        with self._lock:
+            self._counters["accepted"] += 1
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._counters["in_flight"] += 1
+            job.status, job.started = "running", time.time()
+            try:
+                if self.run_deadline is None:
+                    job.result = self.agent.run(job.scenario)
+                else:
+                    # Time spent queued counts against the deadline
+                    remaining = self.run_deadline - (job.started - job.submitted)
+                    job.result = self.agent.run(job.scenario, deadline_s=max(0.0, remaining))
+                job.status = "done"
+            except Exception as e:
+                job.error, job.status = str(e), "failed"
+            job.finished = time.time()
+            with self._lock:
+                self._counters["in_flight"] -= 1
+                self._counters["completed" if job.status == "done" else "failed"] += 1
+                self._latencies.append(job.finished - job.started)
+            job.done.set()
+
+    def health(self) -> Dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            counters = dict(self._counters)
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            **counters,
+            "latency_s": {"p50": round(percentile(lat, 50), 4), "p95": round(percentile(lat, 95), 4),
+                          "p99": round(percentile(lat, 99), 4), "window": len(lat)},
+        }
+
+    def render_prometheus(self) -> str:
+        h = self.health()
+        lines = ["# TYPE synapse_queue_depth gauge", f"synapse_queue_depth {h['queue_depth']}",
+                 "# TYPE synapse_in_flight_runs gauge", f"synapse_in_flight_runs {h['in_flight']}",
+                 "# TYPE synapse_jobs_total counter"]
+        lines += [f'synapse_jobs_total{{outcome="{k}"}} {h[k]}' for k in ("accepted", "rejected", "completed", "failed")]
+        lines += ["# TYPE synapse_run_latency_seconds summary"]
+        lines += [f'synapse_run_latency_seconds{{quantile="{q}"}} {h["latency_s"]["p" + q[2:]]}'
+                  for q in ("0.50", "0.95", "0.99")]
+        return "\n".join(lines) + "\n"
+
+
+def make_handler(service: AgentService, metrics: Optional[MetricsRecorder] = None, sync_timeout: float = 60.0,
+                 max_sync_timeout: float = 300.0, max_body_bytes: int = 64 * 1024):
+    # ``max_sync_timeout`` caps ?timeout= so a client cannot pin a handler thread
+    # indefinitely; ``max_body_bytes`` bounds what is read into memory per request
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, code: int, body, content_type: str = "application/json", headers: Dict = None):
+            data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, str(v))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                return self._send(200, service.health())
+            if path == "/metrics":
+                text = service.render_prometheus() + (metrics.render_prometheus() if metrics else "")
+                return self._send(200, text, "text/plain; version=0.0.4")
+            if path.startswith("/runs/"):
+                job = service.get(path[len("/runs/"):])
+                if job is None:
+                    return self._send(404, {"error": "unknown job"})
+                return self._send(200, job.as_dict())
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/runs":
+                return self._send(404, {"error": "not found"})
+            # Everything is validated before submit(), so a bad request never starts a run
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The body cannot be delimited, so the connection cannot be reused
+                self.close_connection = True
+                return self._send(400, {"error": "Content-Length must be a non-negative integer"})
+            if length > max_body_bytes:
+                # The body is left unread, so the connection cannot be reused either
+                self.close_connection = True
+                return self._send(413, {"error": f"body exceeds {max_body_bytes} bytes"})
+            body = self.rfile.read(length)
+            params = parse_qs(url.query)
+            wait = params.get("wait", ["false"])[0].lower() in ("1", "true", "yes")
+            try:
+                timeout = float(params.get("timeout", [sync_timeout])[0])
+            except ValueError:
+                timeout = -1.0
+            if not 0 <= timeout < math.inf:
+                return self._send(400, {"error": "timeout must be a non-negative number of seconds"})
+            timeout = min(timeout, max_sync_timeout)
+            try:
+                scenario = json.loads(body or b"null")
+            except ValueError:
+                return self._send(400, {"error": "body must be a JSON scenario"})
+            if not isinstance(scenario, dict) or not isinstance(scenario.get("description"), str):
+                return self._send(400, {"error": "scenario must be an object with a 'description' string"})
+
+            try:
+                job = service.submit(scenario)
+            except QueueFull as e:
+                return self._send(429, {"error": "queue full", "retry_after_s": e.retry_after},
+                                  headers={"Retry-After": e.retry_after})
+
+            if wait and job.done.wait(timeout):
+                return self._send(200, job.as_dict())
+            self._send(202, job.as_dict(), headers={"Location": f"/runs/{job.id}"})
+
+    return Handler
+
+
+def build_server(agent: SynapseAgent, host: str = "0.0.0.0", port: int = 8080, workers: int = 4,
+                 queue_size: int = 64, metrics: Optional[MetricsRecorder] = None,
+                 run_deadline: Optional[float] = None, max_sync_timeout: float = 300.0,
+                 max_body_bytes: int = 64 * 1024):
+    service = AgentService(agent, workers=workers, queue_size=queue_size, run_deadline=run_deadline)
+    handler = make_handler(service, metrics, max_sync_timeout=max_sync_timeout, max_body_bytes=max_body_bytes)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Synapse agent over HTTP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent agent runs")
+    parser.add_argument("--queue-size", type=int, default=128, help="Queued runs before 429s")
+    parser.add_argument("--deadline", type=float, help="Seconds a run may take, queue time included")
+    parser.add_argument("--max-wait", type=float, default=300.0,
+                        help="Upper bound in seconds for POST /runs?wait=true&timeout=")
+    parser.add_argument("--max-body-bytes", type=int, default=64 * 1024,
+                        help="Larger POST bodies are rejected with 413")
+    parser.add_argument("--rpm", type=float, help="Client-side Groq requests/min limit")
+    parser.add_argument("--tpm", type=float, help="Client-side Groq tokens/min limit")
+    parser.add_argument("--no-playbooks", action="store_true",
+                        help="Skip the rule-based playbook fast path and always use the LLM")
+    parser.add_argument("--mock", action="store_true",
+                        help="Use the offline MockLLM (no GROQ_API_KEY needed)")
+    parser.add_argument("--scenarios-file", default="simulator/scenarios.json",
+                        help="With --mock: scenarios whose scripts MockLLM replays")
+    args = parser.parse_args()
+
+    metrics = MetricsRecorder()
+    if args.mock:
+        from agent.mock_llm import MockLLM
+        with open(args.scenarios_file) as f:
+            llm = MockLLM.for_scenarios(json.load(f), latency=0.05, jitter=0.02)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        if not os.getenv("GROQ_API_KEY"):
+            raise SystemExit("Error: GROQ_API_KEY is not set in environment or .env file.")
+        llm = GroqLLM(rate_limiter=RateLimiter(args.rpm, args.tpm) if args.rpm or args.tpm else None)
+    agent = SynapseAgent(llm=llm, metrics_hooks=[metrics],
+                         policy_engine=None if args.no_playbooks else PolicyEngine.from_file())
+
+    server, service = build_server(agent, args.host, args.port, args.workers, args.queue_size, metrics,
+                                   run_deadline=args.deadline, max_sync_timeout=args.max_wait,
+                                   max_body_bytes=args.max_body_bytes)
+    service.start()
+    print(f"Synapse service listening on {args.host}:{args.port} "
+          f"({args.workers} workers, queue {args.queue_size})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
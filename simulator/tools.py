@@ -1,7 +1,11 @@
-import random
+from simulator.world import get_world, rng
 
-def check_traffic(location: str = None, route_id: str = None):
-    """Simulate checking traffic conditions."""
+# Tools answer from the stateful world (simulator/world.py): merchants,
+# drivers and lockers with coordinates behind a spatial index. Random values
+# come from the per-run generator, so seeded runs are reproducible.
+
+def check_traffic(location: str = None, route_id: str = None, destination: str = None):
+    """Simulate checking traffic conditions; with a destination, also suggest an alternate route."""
     loc_info = {}
     if location:
         loc_info["location"] = location
@@ -9,22 +13,39 @@ def check_traffic(location: str = None, route_id: str = None):
         loc_info["route_id"] = route_id
     if not loc_info:
         loc_info["location"] = "unknown"
-    return {
+    gen = rng()
+    result = {
         "location": loc_info,
-        "traffic_level": random.choice(["low", "moderate", "heavy"]),
-        "eta_min": random.randint(5, 45)
+        "traffic_level": str(gen.choice(["low", "moderate", "heavy"])),
+        "eta_min": int(gen.integers(5, 46))
     }
+    if location and destination:
+        result["alternate_route"] = {"via": get_world().detour(location, destination), "to": destination}
+    return result
 
 def get_merchant_status(merchant_id: str = None):
     """Simulate retrieving merchant status."""
     if not merchant_id:
         return {"error": "merchant_id_missing"}
+    merchants = get_world().merchants
+    n = merchants.pos.get(merchant_id)
+    if n is None:
+        # Merchants outside the world file (hand-written scenarios) stay open with random load
+        gen = rng()
+        return {
+            "merchant_id": merchant_id,
+            "open": True,
+            "prep_time_min": int(gen.integers(10, 51)),
+            "queue_len": int(gen.integers(0, 6)),
+            "note": "Operational"
+        }
+    is_open = bool(merchants.attrs["open"][n])
     return {
         "merchant_id": merchant_id,
-        "open": True,
-        "prep_time_min": random.randint(10, 50),
-        "queue_len": random.randint(0, 5),
-        "note": "Operational"
+        "open": is_open,
+        "prep_time_min": int(merchants.attrs["prep_time_min"][n]),
+        "queue_len": int(merchants.attrs["queue_len"][n]),
+        "note": "Operational" if is_open else "Closed"
     }
 
 def get_nearby_merchants(merchant_id: str = None, radius_km: float = 2.0):
@@ -34,15 +55,16 @@ def get_nearby_merchants(merchant_id: str = None, radius_km: float = 2.0):
     return {
         "merchant_id": merchant_id,
         "radius_km": radius_km,
-        "alternatives": [
-            {"id": merchant_id + "_alt1", "prep_time_min": 15},
-            {"id": merchant_id + "_alt2", "prep_time_min": 20}
-        ]
+        "alternatives": get_world().nearby_merchants(merchant_id, float(radius_km))
     }
 
 def re_route_driver(driver_id: str = None, new_location: str = None):
     """Simulate re-routing a driver."""
-    return {"driver_id": driver_id, "rerouted_to": new_location, "status": "success"}
+    result = {"driver_id": driver_id, "rerouted_to": new_location, "status": "success"}
+    distance = get_world().move_driver(driver_id, new_location)
+    if distance is not None:
+        result["distance_km"] = round(distance, 3)
+    return result
 
 def notify_customer(customer_id: str = None, message: str = ""):
     """Simulate notifying a customer."""
@@ -62,10 +84,11 @@ def collect_evidence(order_id: str = None):
 
 def analyze_evidence(order_id: str = None):
     """Simulate evidence analysis."""
+    gen = rng()
     return {
         "order_id": order_id,
-        "fault": random.choice(["driver", "merchant", "customer"]),
-        "confidence": round(random.uniform(0.5, 0.95), 2)
+        "fault": str(gen.choice(["driver", "merchant", "customer"])),
+        "confidence": round(float(gen.uniform(0.5, 0.95)), 2)
     }
 
 def issue_instant_refund(order_id: str = None, amount: float = 0.0):
@@ -80,7 +103,8 @@ def log_merchant_packaging_feedback(merchant_id: str = None, feedback: str = "")
     """Simulate logging feedback for a merchant."""
     if not merchant_id:
         return {"error": "merchant_id_missing"}
-    return {"merchant_id": merchant_id, "feedback_logged": feedback}
+    count = get_world().record_feedback(merchant_id)
+    return {"merchant_id": merchant_id, "feedback_logged": feedback, "feedback_count": count}
 
 def contact_recipient_via_chat(recipient_id: str = None, message: str = ""):
     """Simulate contacting recipient via chat."""
@@ -90,8 +114,5 @@ def find_nearby_locker(location: str = None):
     """Simulate finding a nearby parcel locker."""
     return {
         "location": location or "unknown",
-        "lockers": [
-            {"id": "locker1", "distance_km": 0.5},
-            {"id": "locker2", "distance_km": 1.2}
-        ]
+        "lockers": get_world().nearest_lockers(location or "unknown")
     }
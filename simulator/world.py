@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# Per-run randomness
+# ---------------------------------------------------------------------------
+
+_RUN_RNG: ContextVar[Optional[np.random.Generator]] = ContextVar("synapse_run_rng", default=None)
+_DEFAULT_RNG = np.random.default_rng()
+
+
+def rng() -> np.random.Generator:
+    """The current run's generator, or a process-wide unseeded one outside seeded_run()."""
+    return _RUN_RNG.get() or _DEFAULT_RNG
+
+
+def in_seeded_run() -> bool:
+    return _RUN_RNG.get() is not None
+
+
+@contextmanager
+def seeded_run(seed: Union[int, Sequence[int]]) -> Iterator[np.random.Generator]:
+    """Give everything in this context (thread / asyncio task) its own seeded RNG.
+
+    Context variables follow asyncio tasks and ``asyncio.to_thread``, so
+    concurrent runs never share or reorder each other's random draws.
+    """
+    token = _RUN_RNG.set(np.random.default_rng(seed))
+    try:
+        yield _RUN_RNG.get()
+    finally:
+        _RUN_RNG.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# Spatial index
+# ---------------------------------------------------------------------------
+
+class GridIndex:
+    """Uniform grid over 2-D points (km), stored as one sorted array of cell keys.
+
+    Points are bucketed into ``cell_km`` squares with key ``cx * ny + cy``, so
+    each grid row in a query window is one contiguous slice found with
+    ``searchsorted``; distances are then computed vectorized over the slices.
+    """
+
+    def __init__(self, xy: np.ndarray, cell_km: float = 1.0):
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        self.cell = cell_km
+        if len(self.xy):
+            self.origin = self.xy.min(axis=0)
+            cells = np.floor((self.xy - self.origin) / cell_km).astype(np.int64)
+            self.shape = cells.max(axis=0) + 1
+        else:
+            self.origin = np.zeros(2)
+            cells = np.zeros((0, 2), dtype=np.int64)
+            self.shape = np.ones(2, dtype=np.int64)
+        keys = cells[:, 0] * self.shape[1] + cells[:, 1]
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def _candidates(self, point: np.ndarray, radius: float) -> np.ndarray:
+        lo = np.floor((point - radius - self.origin) / self.cell).astype(np.int64)
+        hi = np.floor((point + radius - self.origin) / self.cell).astype(np.int64)
+        lo, hi = np.maximum(lo, 0), np.minimum(hi, self.shape - 1)
+        if np.any(lo > hi):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.arange(lo[0], hi[0] + 1) * self.shape[1]
+        starts = np.searchsorted(self.keys, rows + lo[1], side="left")
+        ends = np.searchsorted(self.keys, rows + hi[1], side="right")
+        return np.concatenate([self.order[s:e] for s, e in zip(starts, ends)])
+
+    def within(self, point: Sequence[float], radius: float,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and distances of points within ``radius`` km, nearest first."""
+        point = np.asarray(point, dtype=np.float64)
+        idx = self._candidates(point, radius)
+        if mask is not None:
+            idx = idx[mask[idx]]
+        dist = np.hypot(*(self.xy[idx] - point).T)
+        keep = dist <= radius
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return idx[order], dist[order]
+
+    def nearest(self, point: Sequence[float], k: int = 1,
+                mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``k`` nearest points (optionally only where ``mask``), nearest first.
+
+        Searches a growing radius; once k points lie within r they are exactly
+        the k nearest, since everything outside is farther than r.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        reach = np.hypot(*(np.abs(point - self.origin) + self.shape * self.cell))
+        radius = self.cell
+        while True:
+            idx, dist = self.within(point, radius, mask)
+            if len(idx) >= k or radius >= reach:
+                return idx[:k], dist[:k]
+            radius *= 2
+
+
+# ---------------------------------------------------------------------------
+# World model
+# ---------------------------------------------------------------------------
+
+class EntityTable:
+    """One entity kind: ids, coordinates and per-entity attribute columns."""
+
+    def __init__(self, ids: Sequence[str], xy: np.ndarray, attrs: Optional[Dict[str, np.ndarray]] = None,
+                 cell_km: float = 1.0):
+        self.ids = [str(i) for i in ids]
+        self.pos = {entity_id: n for n, entity_id in enumerate(self.ids)}
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        self.attrs = {k: np.asarray(v) for k, v in (attrs or {}).items()}
+        self.cell_km = cell_km
+        self._index: Optional[GridIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def index(self) -> GridIndex:
+        # Built on first query and again after anything moved
+        if self._index is None:
+            self._index = GridIndex(self.xy, self.cell_km)
+        return self._index
+
+    def move(self, n: int, point: np.ndarray) -> None:
+        self.xy[n] = point
+        self._index = None
+
+
+def _table_from_records(records: List[Dict], cell_km: float) -> EntityTable:
+    ids = [r["id"] for r in records]
+    xy = np.array([[r["x"], r["y"]] for r in records], dtype=np.float64)
+    extra = sorted({k for r in records for k in r} - {"id", "x", "y"})
+    attrs = {k: np.array([r.get(k) for r in records]) for k in extra}
+    return EntityTable(ids, xy, attrs, cell_km)
+
+
+class World:
+    """Stateful merchants, drivers and lockers on a plane (coordinates in km).
+
+    Tools in simulator/tools.py read and update it: radius / nearest queries go
+    through each table's GridIndex, re-routes move drivers, feedback is
+    counted per merchant. Mutations are guarded by one lock.
+    """
+
+    KINDS = ("merchants", "drivers", "lockers")
+
+    def __init__(self, merchants: EntityTable, drivers: EntityTable, lockers: EntityTable):
+        self.merchants = merchants
+        self.drivers = drivers
+        self.lockers = lockers
+        self.lock = threading.Lock()
+        points = [t.xy for t in (merchants, drivers, lockers) if len(t)]
+        allxy = np.vstack(points) if points else np.zeros((1, 2))
+        self.bounds = (allxy.min(axis=0), allxy.max(axis=0))
+        self.merchant_feedback: Dict[str, int] = {}
+
+    @classmethod
+    def generate(cls, merchants: int = 5000, drivers: int = 1000, lockers: int = 500, size_km: float = 20.0,
+                 seed: int = 0, cell_km: float = 1.0) -> "World":
+        """Synthetic city: uniformly scattered entities with plausible attributes."""
+        gen = np.random.default_rng(seed)
+
+        def points(n):
+            return gen.uniform(0.0, size_km, size=(n, 2))
+
+        return cls(
+            EntityTable([f"m_{i:06d}" for i in range(merchants)], points(merchants), {
+                "open": gen.random(merchants) > 0.1,
+                "prep_time_min": gen.integers(5, 50, merchants),
+                "queue_len": gen.integers(0, 8, merchants),
+            }, cell_km),
+            EntityTable([f"d_{i:06d}" for i in range(drivers)], points(drivers), {}, cell_km),
+            EntityTable([f"locker_{i:05d}" for i in range(lockers)], points(lockers), {
+                "free_slots": gen.integers(0, 20, lockers),
+            }, cell_km),
+        )
+
+    @classmethod
+    def from_file(cls, path: str, cell_km: float = 1.0) -> "World":
+        """Load a world saved with save() (.npz) or a JSON file of
+        ``{"merchants": [{"id", "x", "y", ...attrs}], "drivers": [...], "lockers": [...]}``."""
+        if path.endswith(".npz"):
+            data = np.load(path, allow_pickle=False)
+            tables = []
+            for kind in cls.KINDS:
+                prefix = f"{kind}__"
+                attrs = {k[len(prefix):]: data[k] for k in data.files
+                         if k.startswith(prefix) and k not in (prefix + "ids", prefix + "xy")}
+                tables.append(EntityTable(data[prefix + "ids"].tolist(), data[prefix + "xy"], attrs, cell_km))
+            return cls(*tables)
+        with open(path) as f:
+            raw = json.load(f)
+        return cls(*(_table_from_records(raw.get(kind, []), cell_km) for kind in cls.KINDS))
+
+    def save(self, path: str) -> None:
+        arrays = {}
+        for kind in self.KINDS:
+            table = getattr(self, kind)
+            arrays[f"{kind}__ids"] = np.array(table.ids, dtype=str)
+            arrays[f"{kind}__xy"] = table.xy
+            for name, column in table.attrs.items():
+                arrays[f"{kind}__{name}"] = column
+        np.savez_compressed(path, **arrays)
+
+    def locate(self, name: Optional[str]) -> np.ndarray:
+        """Coordinates for an entity id, an "x,y" string, or any other label.
+
+        Unknown labels (addresses, ids from hand-written scenarios) hash to a
+        stable point inside the world, so every location string is usable.
+        """
+        name = str(name or "unknown")
+        for table in (self.merchants, self.drivers, self.lockers):
+            n = table.pos.get(name)
+            if n is not None:
+                return table.xy[n].copy()
+        try:
+            x, y = (float(v) for v in name.split(","))
+            return np.array([x, y])
+        except ValueError:
+            pass
+        digest = hashlib.sha256(name.encode("utf-8")).digest()
+        frac = np.frombuffer(digest[:16], dtype=np.uint64) / np.float64(2 ** 64)
+        lo, hi = self.bounds
+        return lo + frac * (hi - lo)
+
+    def detour(self, origin: str, destination: str, offset: float = 0.25) -> str:
+        """Waypoint beside the straight origin-destination line, as an "x,y" location string."""
+        a, b = self.locate(origin), self.locate(destination)
+        d = b - a
+        lo, hi = self.bounds
+        via = np.clip((a + b) / 2 + offset * np.array([-d[1], d[0]]), lo, hi)
+        return f"{via[0]:.3f},{via[1]:.3f}"
+
+    def nearby_merchants(self, merchant_id: str, radius_km: float, limit: int = 5) -> List[Dict]:
+        """Open merchants within the radius, fastest prep first, excluding ``merchant_id`` itself."""
+        table = self.merchants
+        mask = table.attrs["open"].astype(bool) if "open" in table.attrs else None
+        idx, dist = table.index.within(self.locate(merchant_id), radius_km, mask)
+        self_n = table.pos.get(merchant_id)
+        keep = idx != self_n if self_n is not None else np.ones(len(idx), dtype=bool)
+        idx, dist = idx[keep], dist[keep]
+        if "prep_time_min" in table.attrs:
+            order = np.lexsort((dist, table.attrs["prep_time_min"][idx]))[:limit]
+        else:
+            order = np.arange(min(limit, len(idx)))
+        return [self._merchant_summary(int(idx[o]), float(dist[o])) for o in order]
+
+    def _merchant_summary(self, n: int, distance: float) -> Dict:
+        out = {"id": self.merchants.ids[n], "distance_km": round(distance, 3)}
+        if "prep_time_min" in self.merchants.attrs:
+            out["prep_time_min"] = int(self.merchants.attrs["prep_time_min"][n])
+        return out
+
+    def nearest_lockers(self, location: str, k: int = 3) -> List[Dict]:
+        table = self.lockers
+        mask = table.attrs["free_slots"] > 0 if "free_slots" in table.attrs else None
+        idx, dist = table.index.nearest(self.locate(location), k, mask)
+        lockers = []
+        for n, d in zip(idx, dist):
+            entry = {"id": table.ids[int(n)], "distance_km": round(float(d), 3)}
+            if "free_slots" in table.attrs:
+                entry["free_slots"] = int(table.attrs["free_slots"][int(n)])
+            lockers.append(entry)
+        return lockers
+
+    def move_driver(self, driver_id: str, location: str) -> Optional[float]:
+        """Move a known driver; returns the distance travelled in km (None for unknown drivers)."""
+        n = self.drivers.pos.get(driver_id)
+        if n is None:
+            return None
+        target = self.locate(location)
+        with self.lock:
+            distance = float(np.hypot(*(target - self.drivers.xy[n])))
+            self.drivers.move(n, target)
+        return distance
+
+    def record_feedback(self, merchant_id: str) -> int:
+        with self.lock:
+            self.merchant_feedback[merchant_id] = self.merchant_feedback.get(merchant_id, 0) + 1
+            return self.merchant_feedback[merchant_id]
+
+
+_WORLD: Optional[World] = None
+_WORLD_LOCK = threading.Lock()
+
+
+def get_world() -> World:
+    """The process-wide world: ``$SYNAPSE_WORLD`` if set, else a generated default city."""
+    global _WORLD
+    with _WORLD_LOCK:
+        if _WORLD is None:
+            path = os.getenv("SYNAPSE_WORLD")
+            _WORLD = World.from_file(path) if path else World.generate()
+        return _WORLD
+
+
+def set_world(world: Optional[World]) -> None:
+    """Install a world for every tool call in the process (None restores the default)."""
+    global _WORLD
+    with _WORLD_LOCK:
+        _WORLD = world
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+SCRIPT = [
+    {"thought": "check merchant", "action": "get_merchant_status", "action_input": {"merchant_id": "m1"}},
+    {"thought": "done", "action": "finish", "action_input": {"final_plan": "Order moved, customer notified"}},
+]
+
+
+def current_step(messages):
+    # Number of assistant turns since the live "Scenario:" message
+    start = max(i for i, m in enumerate(messages) if m.content.startswith("Scenario:"))
+    return sum(1 for m in messages[start:] if m.type == "ai")
+
+
+class FakeLLM:
+    """Replays SCRIPT, using the message history to know which step it is on."""
+
+    def __init__(self, delay: float = 0.0, script=None):
+        self.delay = delay
+        self.script = script or SCRIPT
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def generate_json(self, messages, **kwargs):
+        self.calls += 1
+        return json.dumps(self.script[current_step(messages)])
+
+    async def agenerate_json(self, messages, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return self.generate_json(messages)
@@ -0,0 +1,48 @@
+import copy
+import pickle
+from agent.llm_agent import SynapseAgent
+from agent.prompts import FEW_SHOT_EXAMPLES, SYSTEM_PROMPT, ExampleStore
+from fakes import FakeLLM
+
+
+def make_examples(n):
+    # Thousands of variants of the built-in examples, plus one distinctive target
+    examples = []
+    for i in range(n):
+        ex = copy.deepcopy(FEW_SHOT_EXAMPLES[i % len(FEW_SHOT_EXAMPLES)])
+        ex["user"] = f"{ex['user']} (case {i})"
+        examples.append(ex)
+    target = copy.deepcopy(FEW_SHOT_EXAMPLES[2])
+    target["user"] = "Parcel locker full; courier cannot drop the package at the locker."
+    return examples + [target]
+
+
+def test_search_ranks_the_most_similar_example_first(tmp_path):
+    store = ExampleStore(make_examples(3000))
+    hits = store.search("Courier can't drop the parcel, the locker is full", k=3)
+    assert hits[0][0] == 3000
+    assert hits[0][1] >= hits[1][1] >= hits[2][1]
+
+    path = str(tmp_path / "examples.npz")
+    store.save(path)
+    loaded = ExampleStore.load(path)
+    assert [i for i, _ in loaded.search("Courier can't drop the parcel, the locker is full", k=3)] == \
+        [i for i, _ in hits]
+    assert pickle.loads(pickle.dumps(loaded)).search("soup leaking", k=1)
+
+    stats = store.stats()
+    assert stats["lookups"] == 1 and stats["retrieval_ms_p50"] is not None
+    assert stats["prompt_chars_saved_mean"] > 0.99 * stats["prompt_chars_all_examples"]
+
+
+def test_agent_sends_only_the_top_k_examples_after_the_system_prompt():
+    agent = SynapseAgent(llm=FakeLLM(), example_store=ExampleStore(FEW_SHOT_EXAMPLES), few_shot_k=1)
+    messages = agent.build_messages({"description": "Soup container leaked in the bag"}).messages()
+    assert messages[0].content == SYSTEM_PROMPT
+    # system + one 4-message example + scenario
+    assert len(messages) == 6
+    assert messages[1].content == "Scenario: " + FEW_SHOT_EXAMPLES[1]["user"]
+    assert messages[-1].content == "Scenario: Soup container leaked in the bag"
+
+    result = agent.run({"description": "Order stuck"})
+    assert result["final_plan"]["status"] == "complete"
@@ -2,6 +2,9 @@ import json
 import os
 import pytest
 from agent.llm_agent import SynapseAgent
+from agent.mock_llm import MockLLM
+from agent.playbooks import render
+from simulator.world import World, set_world
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 SCENARIOS_FILE = os.path.join(BASE_DIR, "simulator", "scenarios.json")
@@ -14,17 +17,29 @@ with open(SCENARIOS_FILE) as f:
 with open(GOLD_PLANS_FILE) as f:
     GOLD_PLANS = json.load(f)
 
+@pytest.fixture(scope="module", autouse=True)
+def default_world():
+    # Gold inputs reference tool output, so pin the world regardless of $SYNAPSE_WORLD
+    set_world(World.generate())
+    yield
+    set_world(None)
+
+
 @pytest.mark.parametrize("scenario_key", SCENARIOS.keys())
 def test_scenario_against_gold_plan(scenario_key):
-    """Runs the agent and compares the final plan against gold data."""
-    agent = SynapseAgent(max_iters=3)
+    """Runs the agent (offline, MockLLM) and compares the final plan against gold data."""
+    agent = SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS))
 
     # Run the agent for the scenario
     result = agent.run(SCENARIOS[scenario_key])
     final_plan = result.get("final_plan")
+    assert final_plan["status"] == "complete", f"{scenario_key} did not complete: {final_plan}"
 
-    # Expected from gold_plans.json
-    gold_entry = GOLD_PLANS[scenario_key]["final_plan"]
+    # Expected from gold_plans.json; placeholders name scenario fields or an
+    # earlier tool's observation ("{get_nearby_merchants.alternatives.0.id}")
+    scope = dict(SCENARIOS[scenario_key])
+    scope.update((step["action"], step["observation"]) for step in result["cot"])
+    gold_entry = render(GOLD_PLANS[scenario_key]["final_plan"], scope)
 
     # Handle both string and structured gold plan formats
     if isinstance(gold_entry, str):
@@ -44,12 +59,15 @@ def test_scenario_against_gold_plan(scenario_key):
             assert gold_entry["summary"].lower() in str(final_plan).lower(), \
                 f"Summary mismatch for {scenario_key}"
         if "actions" in gold_entry:
-            assert isinstance(final_plan, dict), \
-                f"Expected structured dict final_plan for {scenario_key}, got {type(final_plan)}"
-            agent_actions = final_plan.get("actions", [])
+            # Tools the run actually called
+            agent_actions = [step["action"] for step in result["cot"]]
             for action in gold_entry["actions"]:
                 assert action in agent_actions, \
                     f"Action '{action}' missing in {scenario_key} final_plan"
+        for action, expected in gold_entry.get("inputs", {}).items():
+            called = [step["action_input"] for step in result["cot"] if step["action"] == action]
+            assert any(all(inp.get(k) == v for k, v in expected.items()) for inp in called), \
+                f"{scenario_key}: {action} called with {called}, expected {expected}"
 
     else:
         raise ValueError(f"Unsupported gold_plans format for {scenario_key}")
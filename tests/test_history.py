@@ -0,0 +1,43 @@
+import json
+from agent.messages import HumanMessage, SystemMessage
+from agent.history import MessageHistory, TOOL_RESULT_PREFIX
+from agent.llm_agent import SynapseAgent
+from agent.prompts import SYSTEM_PROMPT
+from fakes import FakeLLM
+
+
+def test_system_prompt_sent_once_and_prefix_fixed():
+    agent = SynapseAgent(llm=FakeLLM())
+    history = agent.build_messages({"description": "Merchant is slow."})
+    before = history.messages()
+    history.append_step('{"action": "x"}', "get_merchant_status", {"prep_time_min": 40})
+    after = history.messages()
+
+    assert after[:len(before)] == before
+    assert len(after) == len(before) + 2
+    assert sum(SYSTEM_PROMPT in m.content for m in after) == 1
+
+
+def test_token_budget_summarizes_oldest_observations_first():
+    big = {"payload": "x" * 2000}
+    history = MessageHistory([SystemMessage(content="sys"), HumanMessage(content="Scenario: s")],
+                             max_tokens=700, keep_recent=1)
+    for i in range(3):
+        history.append_step("{}", f"tool{i}", big)
+
+    observations = [m.content for m in history.messages() if m.content.startswith(TOOL_RESULT_PREFIX)]
+    assert '"summary"' in observations[0]
+    assert json.loads(observations[-1][len(TOOL_RESULT_PREFIX):])["result"] == big
+    assert history.token_estimate() < 3 * 500
+
+
+def test_prompt_prefix_is_shared_and_stable():
+    from agent.prompts import prefix_fingerprint
+
+    agent = SynapseAgent(llm=FakeLLM())
+    a = agent.build_messages({"description": "Merchant is slow."}).messages()
+    b = agent.build_messages({"description": "Recipient not home."}).messages()
+    assert a[:-1] == b[:-1]
+    assert a[-1].content == "Scenario: Merchant is slow."
+    info = prefix_fingerprint()
+    assert len(info["sha256"]) == 64 and info["chars"] > len(SYSTEM_PROMPT)
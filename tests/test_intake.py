@@ -0,0 +1,120 @@
+import json
+import os
+from agent.intake import IncidentIntake, normalize_scenario
+from agent.journal import RunJournal
+from agent.llm_agent import SynapseAgent
+from agent.metrics import MetricsRecorder
+from agent.mock_llm import MockLLM
+from agent.tool_registry import build_default_registry
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+with open(os.path.join(BASE_DIR, "simulator", "scenarios.json")) as f:
+    SCENARIOS = json.load(f)
+
+TRAFFIC = SCENARIOS["traffic_obstruction"]
+
+
+def outage(n):
+    # The scripted representative uses d789/p001; every other report is a different trip
+    items = [("trip-0", dict(TRAFFIC))]
+    for i in range(1, n):
+        items.append((f"trip-{i}", dict(TRAFFIC, driver_id=f"d9{i:03d}", passenger_id=f"p9{i:03d}",
+                                        description=TRAFFIC["description"].replace("major", "serious"))))
+    return items
+
+
+class CountingRegistry:
+    def __init__(self):
+        self.registry = build_default_registry()
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.registry, name)
+
+    def call(self, action, action_input):
+        self.calls.append((action, action_input))
+        return self.registry.call(action, action_input)
+
+
+def test_normalize_masks_numbers_and_keys_on_route():
+    a = normalize_scenario({"description": "Prep is 40 minutes", "merchant_id": " M1 ", "driver_id": "d1"})
+    b = normalize_scenario({"description": "prep is 25  minutes", "merchant_id": "m1", "driver_id": "d2"})
+    assert a["anchor"] == b["anchor"] and a["tokens"] == b["tokens"]
+    assert normalize_scenario(TRAFFIC)["anchor"][2] == "downtown->airport"
+
+
+def test_outage_runs_the_agent_once_and_fans_out_per_order_tools():
+    llm = MockLLM.for_scenarios(SCENARIOS)
+    tools = CountingRegistry()
+    with IncidentIntake(SynapseAgent(llm=llm, tool_registry=tools), workers=4) as intake:
+        records = {r["id"]: r for r in intake.run(outage(50))}
+        assert intake.stats() == {"scenarios": 50, "incidents": 1, "agent_runs": 1, "fanned_out": 49,
+                                  "duplicates": 0, "runs_saved": 49}
+    assert llm.calls == 4
+
+    member = records["trip-7"]
+    assert member["incident"]["role"] == "member" and member["final_plan"]["status"] == "complete"
+    steps = {e["action"]: e for e in member["cot"]}
+    assert steps["re_route_driver"]["action_input"]["driver_id"] == "d9007"
+    assert steps["notify_customer"]["observation"]["customer_id"] == "p9007"
+    assert steps["check_traffic"]["reused"] is True
+    # check_traffic once for the incident; re-route and notify once per trip
+    actions = [a for a, _ in tools.calls]
+    assert actions.count("check_traffic") == 1
+    assert actions.count("re_route_driver") == actions.count("notify_customer") == 50
+
+
+def test_dissimilar_or_late_reports_start_their_own_incident():
+    now = [1000.0]
+    intake = IncidentIntake(SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS)), window_s=60, clock=lambda: now[0])
+    with intake:
+        intake.submit("a", dict(TRAFFIC)).result()
+        intake.submit("b", dict(TRAFFIC, description="Passenger forgot a bag in the car")).result()
+        now[0] += 120
+        late = intake.submit("c", dict(TRAFFIC, driver_id="d1")).result()
+    assert late["incident"]["role"] == "representative"
+    assert intake.stats()["incidents"] == 3
+
+
+def test_repeat_report_of_the_same_order_does_not_repeat_side_effects():
+    tools = CountingRegistry()
+    with IncidentIntake(SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS), tool_registry=tools)) as intake:
+        first = intake.submit("a", dict(TRAFFIC)).result()
+        again = intake.submit("b", dict(TRAFFIC)).result()
+    assert again["incident"]["role"] == "duplicate" and again["final_plan"] == first["final_plan"]
+    actions = [a for a, _ in tools.calls]
+    assert actions.count("re_route_driver") == actions.count("notify_customer") == 1
+    assert intake.stats()["duplicates"] == 1
+
+
+def test_expired_incidents_are_swept_on_every_submit():
+    now = [1000.0]
+    intake = IncidentIntake(SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS)), window_s=60, clock=lambda: now[0])
+    with intake:
+        for i in range(5):
+            intake.submit(f"m{i}", {"description": "Merchant slow", "merchant_id": f"m{i}"}).result()
+        assert intake.open_incidents() == 5
+        now[0] += 120
+        # A report with a different key still clears every expired incident
+        intake.submit("t", dict(TRAFFIC)).result()
+        assert intake.open_incidents() == 1
+
+
+def test_member_side_effects_are_journaled_and_instrumented(tmp_path):
+    journal = RunJournal(str(tmp_path / "runs.ndjson"))
+    recorder = MetricsRecorder()
+    agent = SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS), journal=journal, metrics_hooks=[recorder])
+    with IncidentIntake(agent, workers=2) as intake:
+        records = {r["id"]: r for r in intake.run(outage(3))}
+
+    member = records["trip-2"]
+    assert member["metrics"]["tool_calls"] == 2
+    runs = journal.query(action="notify_customer", scenario="p9002")
+    assert len(runs) == 1 and runs[0]["status"] == "complete"
+    steps = journal.load_run(runs[0]["run_id"])["steps"]
+    executed = [e["action"] for s in steps for e in s["entries"] if not e.get("reused")]
+    assert executed == ["re_route_driver", "notify_customer"]
+    snapshot = recorder.snapshot()
+    assert snapshot["runs"] == {"complete": 3}
+    assert snapshot["tool_calls"]["notify_customer"] == 3
+    journal.close()
@@ -0,0 +1,143 @@
+import os
+import signal
+import subprocess
+import sys
+import pytest
+from agent.journal import JournalIndex, RunJournal
+from agent.llm_agent import SynapseAgent
+from agent.playbooks import PolicyEngine
+from agent.tool_registry import build_default_registry
+from fakes import FakeLLM
+
+SCRIPT = [
+    {"thought": "check merchant", "action": "get_merchant_status", "action_input": {"merchant_id": "m1"}},
+    {"thought": "tell customer", "action": "notify_customer", "action_input": {"customer_id": "c1", "message": "late"}},
+    {"thought": "done", "action": "finish", "action_input": {"final_plan": "Customer notified"}},
+]
+SCENARIO = {"description": "Merchant m1 is slow", "merchant_id": "m1"}
+
+
+def registry_with_notify(notify):
+    registry = build_default_registry()
+    registry.register("notify_customer", notify)
+    return registry
+
+
+def test_completed_runs_are_journaled_and_queryable(tmp_path):
+    journal = RunJournal(str(tmp_path / "runs.ndjson"))
+    agent = SynapseAgent(llm=FakeLLM(script=SCRIPT), journal=journal)
+    result = agent.run(SCENARIO)
+    agent.run({"description": "Other incident"})
+
+    assert journal.query(status="complete", action="notify_customer", scenario="m1")[0]["run_id"] == result["run_id"]
+    assert len(journal.query(action="finish")) == 2
+    assert journal.query(status="running") == []
+    assert agent.resume(result["run_id"])["final_plan"] == result["final_plan"]
+    journal.close()
+
+
+def test_resume_skips_the_llm_and_never_repeats_side_effects(tmp_path):
+    path = str(tmp_path / "runs.ndjson")
+
+    def crash(customer_id=None, message=""):
+        raise RuntimeError("process died")
+
+    journal = RunJournal(path)
+    with pytest.raises(RuntimeError):
+        SynapseAgent(llm=FakeLLM(script=SCRIPT), journal=journal,
+                     tool_registry=registry_with_notify(crash)).run(SCENARIO, run_id="r1")
+    journal.close()
+    # Simulate a torn write at the moment of the crash
+    with open(path, "a") as f:
+        f.write('{"type": "step", "run_id": "r1", "ent')
+
+    notified = []
+    journal = RunJournal(path)
+    llm = FakeLLM(script=SCRIPT)
+    agent = SynapseAgent(llm=llm, journal=journal,
+                         tool_registry=registry_with_notify(lambda customer_id=None, message="": notified.append(1)))
+    assert [r["run_id"] for r in journal.query(status="running")] == ["r1"]
+
+    result = agent.resume("r1")
+    assert result["final_plan"] == {"status": "complete", "final_plan": "Customer notified"}
+    assert [s["action"] for s in result["cot"]] == ["get_merchant_status", "notify_customer", "finish"]
+    assert result["cot"][1]["observation"]["error"] == "interrupted"
+    assert notified == [] and llm.calls == 1
+    journal.close()
+
+    index = JournalIndex(path)
+    assert index.find(status="complete")[0]["steps"] == 3
+    assert index.load_run("r1")["final_plan"]["status"] == "complete"
+    index.close()
+
+
+KILLED_RUN = """
+import os, signal, sys
+sys.path.insert(0, "tests")
+from agent.journal import RunJournal
+from agent.llm_agent import SynapseAgent
+from agent.playbooks import PolicyEngine
+from fakes import FakeLLM
+from test_journal import SCENARIO, SCRIPT, registry_with_notify
+
+def die(customer_id=None, message=""):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+# Nothing is fsynced on the writer's own schedule before the kill
+journal = RunJournal(sys.argv[1], fsync_every=1000, fsync_interval=60)
+SynapseAgent(llm=FakeLLM(script=SCRIPT), journal=journal,
+             tool_registry=registry_with_notify(die)).run(SCENARIO, run_id="r1")
+"""
+
+
+def test_decision_is_durable_before_a_side_effect_when_the_process_is_killed(tmp_path):
+    path = str(tmp_path / "runs.ndjson")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-c", KILLED_RUN, path], cwd=root, capture_output=True, text=True)
+    assert proc.returncode == -signal.SIGKILL, proc.stderr
+
+    notified = []
+    journal = RunJournal(path)
+    llm = FakeLLM(script=SCRIPT)
+    agent = SynapseAgent(llm=llm, journal=journal,
+                         tool_registry=registry_with_notify(lambda customer_id=None, message="": notified.append(1)))
+    result = agent.resume("r1")
+    assert result["cot"][1]["observation"]["error"] == "interrupted"
+    assert notified == [] and llm.calls == 1
+    journal.close()
+
+
+def test_resume_replays_a_playbook_interrupted_after_its_refund(tmp_path):
+    path = str(tmp_path / "runs.ndjson")
+    scenario = {"description": "Soup container is leaking", "order_id": "o1", "driver_id": "d1",
+                "merchant_id": "m1", "order_value": 18.5}
+    refunds = []
+
+    def registry(exonerate):
+        registry = build_default_registry()
+        registry.register("analyze_evidence", lambda order_id=None: {"fault": "merchant", "confidence": 0.9})
+        registry.register("issue_instant_refund", lambda order_id=None, amount=0: refunds.append(amount) or {})
+        registry.register("exonerate_driver", exonerate)
+        return registry
+
+    def crash(driver_id=None):
+        raise RuntimeError("process died")
+
+    journal = RunJournal(path)
+    with pytest.raises(RuntimeError):
+        SynapseAgent(llm=FakeLLM(), journal=journal, tool_registry=registry(crash),
+                     policy_engine=PolicyEngine.from_file()).run(scenario, run_id="r1")
+    journal.close()
+
+    journal = RunJournal(path)
+    # FakeLLM indexes its script by assistant turn; the four playbook steps come first
+    llm = FakeLLM(script=[{}] * 4 + [{"thought": "done", "action": "finish", "action_input": {"final_plan": "Refunded"}}])
+    agent = SynapseAgent(llm=llm, journal=journal, tool_registry=registry(lambda driver_id=None: {}),
+                         policy_engine=PolicyEngine.from_file())
+    result = agent.resume("r1")
+    actions = [s["action"] for s in result["cot"]]
+    assert actions == ["collect_evidence", "analyze_evidence", "issue_instant_refund", "exonerate_driver", "finish"]
+    assert result["cot"][3]["observation"]["error"] == "interrupted"
+    # The refund ran once, before the crash; the model only decided what came after
+    assert refunds == [18.5] and llm.calls == 1
+    journal.close()
@@ -0,0 +1,79 @@
+import time
+import pytest
+from agent.messages import AIMessage, HumanMessage, SystemMessage
+from agent.llm_agent import LangChainGroqLLM
+from agent.llm_cache import LRUCache, SQLiteCache, make_cache_key
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "Scenario: x"}]
+
+
+def test_lru_evicts_by_size_and_ttl():
+    cache = LRUCache(maxsize=2, ttl=0.05)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")  # "b" is least recently used
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["evictions"] == 2
+
+
+def test_sqlite_cache_persists(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    key = make_cache_key("m", 0, MESSAGES)
+    first = SQLiteCache(path)
+    first.set(key, '{"action": "finish"}')
+    first.close()
+    assert SQLiteCache(path).get(key) == '{"action": "finish"}'
+    assert make_cache_key("m", 0.5, MESSAGES) != key
+    assert make_cache_key("m", 0, MESSAGES, mode="json") != key
+    tools = [{"type": "function", "function": {"name": "finish"}}]
+    assert make_cache_key("m", 0, MESSAGES, mode="tools", tools=tools) != \
+        make_cache_key("m", 0, MESSAGES, mode="tools", tools=tools + tools)
+
+
+@pytest.fixture
+def scripted_groq(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    replies = []
+
+    def fake_generate(self, messages, **kwargs):
+        return AIMessage(content=replies.pop(0))
+
+    monkeypatch.setattr(LangChainGroqLLM, "_generate", fake_generate)
+    return replies
+
+
+def test_generate_json_hits_cache_and_skips_invalid_output(scripted_groq):
+    cache = LRUCache()
+    llm = LangChainGroqLLM(cache=cache)
+    messages = [SystemMessage(content="sys"), HumanMessage(content="Scenario: x")]
+
+    scripted_groq.extend(["not json", '{"action": "finish"}'])
+    assert llm.generate_json(messages) == '{"action": "finish"}'
+    assert llm.generate_json(messages) == '{"action": "finish"}'  # served from cache
+    assert scripted_groq == []
+    assert cache.stats()["writes"] == 1 and cache.stats()["hits"] == 1
+
+    scripted_groq.extend(["nope", "still nope"])
+    other = [SystemMessage(content="sys"), HumanMessage(content="Scenario: y")]
+    with pytest.raises(ValueError):
+        llm.generate_json(other)
+    assert len(cache) == 1
+
+
+def test_sampled_replies_are_only_cached_on_opt_in(scripted_groq):
+    messages = [SystemMessage(content="sys"), HumanMessage(content="Scenario: x")]
+    cache = LRUCache()
+    llm = LangChainGroqLLM(cache=cache, temperature=0.7)
+    scripted_groq.extend(['{"action": "finish"}', '{"action": "ask_human"}'])
+    assert llm.generate_json(messages) == '{"action": "finish"}'
+    assert llm.generate_json(messages) == '{"action": "ask_human"}'
+    assert len(cache) == 0
+
+    llm = LangChainGroqLLM(cache=cache, temperature=0.7, cache_sampled=True)
+    scripted_groq.append('{"action": "finish"}')
+    llm.generate_json(messages)
+    assert llm.generate_json(messages) == '{"action": "finish"}' and cache.stats()["hits"] == 1
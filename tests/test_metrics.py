@@ -0,0 +1,44 @@
+import json
+import os
+from agent.llm_agent import SynapseAgent
+from agent.metrics import CallbackHook, MetricsRecorder
+from agent.mock_llm import MockLLM
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+with open(os.path.join(BASE_DIR, "simulator", "scenarios.json")) as f:
+    SCENARIOS = json.load(f)
+
+
+def test_every_step_records_llm_and_tool_timing():
+    tool_calls = []
+    recorder = MetricsRecorder()
+    agent = SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS),
+                         metrics_hooks=[recorder, CallbackHook(on_tool_call=lambda *a: tool_calls.append(a))])
+    result = agent.run(SCENARIOS["damaged_packaging"])
+
+    for step in result["cot"]:
+        m = step["metrics"]
+        assert m["llm_ms"] >= 0 and m["retries"] == 0 and m["prompt_chars"] > 0
+        assert m["prompt_tokens"] > 0 and m["completion_tokens"] > 0
+    assert [s["metrics"]["prompt_chars"] for s in result["cot"]] == \
+        sorted(s["metrics"]["prompt_chars"] for s in result["cot"])
+
+    totals = result["metrics"]
+    assert totals["llm_calls"] == len(result["cot"])
+    assert totals["tool_calls"] == len(tool_calls) == len(result["cot"]) - 1
+    assert totals["wall_ms"] >= totals["llm_ms"]
+
+    snap = recorder.snapshot()
+    assert snap["runs"] == {"complete": 1} and snap["llm_calls"] == totals["llm_calls"]
+    text = recorder.render_prometheus()
+    assert 'synapse_tool_call_seconds_count{tool="issue_instant_refund"} 1' in text
+    assert 'synapse_runs_total{status="complete"} 1' in text
+
+
+def test_retries_counter_is_split_by_reason():
+    recorder = MetricsRecorder()
+    recorder.on_llm_call(1, {"llm_ms": 5.0, "retries": 3, "provider_retries": 2})
+    recorder.on_llm_call(2, {"llm_ms": 5.0, "retries": 1})
+    text = recorder.render_prometheus()
+    assert 'synapse_llm_retries_total{reason="provider"} 2' in text
+    assert 'synapse_llm_retries_total{reason="json_repair"} 2' in text
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import os
+import time
+from agent.llm_agent import SynapseAgent
+from agent.mock_llm import MockLLM
+from benchmarks.bench_agent import _median_of, compare
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+with open(os.path.join(BASE_DIR, "simulator", "scenarios.json")) as f:
+    SCENARIOS = json.load(f)
+
+
+def test_mock_llm_resolves_every_scenario_deterministically():
+    llm = MockLLM.for_scenarios(SCENARIOS)
+    for scen in SCENARIOS.values():
+        first = SynapseAgent(llm=llm).run(scen)
+        second = SynapseAgent(llm=llm).run(scen)
+        assert first["final_plan"]["status"] == "complete"
+        assert [s["action_input"] for s in first["cot"]] == [s["action_input"] for s in second["cot"]]
+
+    unscripted = SynapseAgent(llm=llm).run({"description": "Something new"})
+    assert unscripted["final_plan"]["status"] == "escalated"
+
+
+def test_mock_llm_latency_and_replay(tmp_path):
+    scen = SCENARIOS["recipient_unavailable"]
+    recorded = SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS)).run(scen)
+    path = tmp_path / "replay.jsonl"
+    path.write_text(json.dumps({"description": scen["description"],
+                                "responses": MockLLM.script_from_cot(recorded["cot"])}) + "\n")
+
+    llm = MockLLM.from_jsonl(str(path), latency=0.02, jitter=0.005)
+    start = time.perf_counter()
+    replayed = asyncio.run(SynapseAgent(llm=llm).arun(scen))
+    assert time.perf_counter() - start >= 0.015 * len(recorded["cot"])
+    assert replayed["final_plan"] == recorded["final_plan"]
+
+
+def test_benchmark_compare_flags_regressions():
+    baseline = {"throughput": {"10": {"throughput_per_s": 100.0}}, "step_overhead": {"step_overhead_us": 50.0}}
+    current = {"throughput": {"10": {"throughput_per_s": 60.0}}, "step_overhead": {"step_overhead_us": 55.0}}
+    regressions = compare(current, baseline, tolerance=0.3)
+    assert len(regressions) == 1 and "throughput_per_s" in regressions[0]
+
+    # Microsecond timings get the wider us_tolerance and are medians over rounds
+    noisy = iter([{"step_overhead_us": v, "steps": 9} for v in (70.0, 200.0, 72.0)])
+    assert _median_of(lambda: next(noisy), rounds=3) == {"step_overhead_us": 72.0, "steps": 9}
+    current = {"step_overhead": {"step_overhead_us": 72.0}}
+    assert compare(current, baseline, tolerance=0.3) == []
+    assert compare({"step_overhead": {"step_overhead_us": 110.0}}, baseline, tolerance=0.3)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import time
+from agent.llm_agent import SynapseAgent
+from agent.tool_registry import ToolRegistry
+from fakes import FakeLLM
+
+BATCH_SCRIPT = [
+    {"thought": "gather facts", "actions": [
+        {"action": "check_traffic", "action_input": {"location": "a"}},
+        {"action": "get_merchant_status", "action_input": {"merchant_id": "m1"}},
+        {"action": "refund", "action_input": {"order_id": "o1"}},
+    ]},
+    {"thought": "done", "action": "finish", "action_input": {"final_plan": "Rerouted"}},
+]
+
+
+def slow_registry(delay):
+    def lookup(**kwargs):
+        time.sleep(delay)
+        return dict(kwargs)
+
+    registry = ToolRegistry()
+    registry.register("check_traffic", lookup, cacheable=True, ttl=0)
+    registry.register("get_merchant_status", lookup, cacheable=True, ttl=0)
+    registry.register("refund", lambda order_id=None: {"refunded": order_id})
+    return registry
+
+
+def check_result(result, llm):
+    assert result["final_plan"] == {"status": "complete", "final_plan": "Rerouted"}
+    assert llm.calls == 2
+    batch = [s for s in result["cot"] if s["step"] == 1]
+    assert [s["action"] for s in batch] == ["check_traffic", "get_merchant_status", "refund"]
+    assert batch[0]["observation"] == {"location": "a"}
+    assert batch[2]["observation"]["error"] == "not_batchable"
+
+
+def test_sync_batch_runs_read_only_tools_concurrently():
+    llm = FakeLLM(script=BATCH_SCRIPT)
+    agent = SynapseAgent(llm=llm, multi_action=True, tool_registry=slow_registry(0.1))
+    start = time.perf_counter()
+    result = agent.run({"description": "Merchant is slow."})
+    assert time.perf_counter() - start < 0.19
+    check_result(result, llm)
+
+    history = agent.build_messages({"description": "x"}).messages()
+    assert "Multi-action mode" in history[0].content
+
+
+def test_async_batch_and_single_tool_result_block():
+    llm = FakeLLM(script=BATCH_SCRIPT)
+    agent = SynapseAgent(llm=llm, multi_action=True, tool_registry=slow_registry(0.0))
+    check_result(asyncio.run(agent.arun({"description": "Merchant is slow."})), llm)
+
+
+def test_repeated_batches_hit_loop_detection():
+    batch = {"thought": "again", "actions": [
+        {"action": "check_traffic", "action_input": {"location": "a"}},
+        {"action": "get_merchant_status", "action_input": {"merchant_id": "m1"}},
+    ]}
+    agent = SynapseAgent(llm=FakeLLM(script=[batch] * 5), multi_action=True, tool_registry=slow_registry(0))
+    result = agent.run({"description": "x"})
+    assert result["final_plan"]["reason"] == "repeated_action_loop"
+    assert json.dumps(result)  # observations stay JSON-serializable
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import httpx
+import pytest
+from groq import BadRequestError, InternalServerError, RateLimitError
+from agent.llm_agent import LangChainGroqLLM, SynapseAgent
+from agent.mock_llm import MockLLM
+from agent.resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, Deadline,
+                              ProviderUnavailableError, RateLimiter, RetryPolicy, TokenBucket,
+                              acall_with_retries, call_with_retries)
+from fakes import SCRIPT
+
+NO_WAIT = RetryPolicy(base_delay=0.0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def api_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=httpx.Request("POST", "http://groq.test"))
+    return cls("provider error", response=response, body=None)
+
+
+class FlakySend:
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def test_token_bucket_waits_for_refill_and_honors_pause():
+    clock = Clock()
+    bucket = TokenBucket(60, clock=clock)  # 1 token/s, burst 60
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0)
+    clock.now = 10.0
+    bucket.pause(30)
+    assert bucket.reserve(1) == pytest.approx(30.0)
+
+
+def test_rate_limiter_refuses_waits_past_the_deadline():
+    clock = Clock()
+    limiter = RateLimiter(requests_per_min=1, tokens_per_min=1000, clock=clock)
+    limiter.acquire(tokens=100)
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(tokens=100, deadline=Deadline(5, clock=clock))
+    # The refused reservation was refunded to the tokens bucket
+    assert limiter.tokens.reserve(900) == 0.0
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    limiter = RateLimiter(requests_per_min=6000)
+    send = FlakySend([api_error(RateLimitError, 429, {"retry-after": "0"}),
+                      api_error(InternalServerError, 503)])
+    result, retries = call_with_retries(send, NO_WAIT, limiter=limiter, timeout=30.0)
+    assert (result, retries) == ("ok", 2)
+    assert send.timeouts == [30.0, 30.0, 30.0]
+    # One 429 halved the rate, two successes/recoveries did not fully restore it
+    assert limiter.requests.rate < limiter.requests.base_rate
+
+
+def test_client_errors_are_not_retried_and_exhausted_retries_raise():
+    send = FlakySend([api_error(BadRequestError, 400)])
+    with pytest.raises(BadRequestError):
+        call_with_retries(send, NO_WAIT)
+    assert len(send.timeouts) == 1
+
+    send = FlakySend([api_error(InternalServerError, 500)] * 5)
+    with pytest.raises(ProviderUnavailableError):
+        call_with_retries(send, RetryPolicy(max_retries=2, base_delay=0.0))
+    assert len(send.timeouts) == 3
+
+
+def test_circuit_breaker_opens_fails_fast_and_probes_after_reset():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    with pytest.raises(ProviderUnavailableError):
+        call_with_retries(FlakySend([api_error(InternalServerError, 502)] * 2),
+                          RetryPolicy(max_retries=1, base_delay=0.0), breaker=breaker)
+    assert breaker.state == "open"
+    send = FlakySend([])
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(send, NO_WAIT, breaker=breaker)
+    assert send.timeouts == []
+
+    clock.now = 10.0
+    assert call_with_retries(send, NO_WAIT, breaker=breaker) == ("ok", 0)
+    assert breaker.state == "closed"
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    with pytest.raises(ProviderUnavailableError):
+        call_with_retries(FlakySend([api_error(InternalServerError, 502)]), RetryPolicy(max_retries=0),
+                          breaker=breaker)
+    clock.now = 10.0
+    return breaker
+
+
+def test_rate_limit_deadline_does_not_take_the_half_open_probe():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    limiter = RateLimiter(requests_per_min=1, clock=clock)
+    limiter.acquire()
+    with pytest.raises(DeadlineExceeded):
+        call_with_retries(FlakySend([]), NO_WAIT, breaker=breaker, limiter=limiter,
+                          deadline=Deadline(5, clock=clock))
+    assert breaker.state == "half_open"
+    assert call_with_retries(FlakySend([]), NO_WAIT, breaker=breaker) == ("ok", 0)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_the_breaker():
+    clock = Clock()
+    breaker = open_breaker(clock)
+
+    async def hang(timeout):
+        await asyncio.sleep(60)
+
+    async def ok(timeout):
+        return "ok"
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(acall_with_retries(hang, NO_WAIT, breaker=breaker))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await acall_with_retries(ok, NO_WAIT, breaker=breaker)
+
+    assert asyncio.run(cancel_probe()) == ("ok", 0)
+    assert breaker.state == "closed"
+
+
+def test_groq_llm_backs_off_on_429(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    llm = LangChainGroqLLM(retry_policy=NO_WAIT, request_timeout=5.0)
+    completion = type("Completion", (), {
+        "choices": [type("Choice", (), {"message": type("Msg", (), {"content": json.dumps(SCRIPT[1])})})],
+        "usage": None,
+    })
+    send = FlakySend([api_error(RateLimitError, 429)], result=completion)
+    fake_client = type("Client", (), {})()
+    fake_client.chat = type("Chat", (), {})()
+    fake_client.chat.completions = type("Completions", (), {"create": lambda self, **kw: send(kw["timeout"])})()
+    llm._client = fake_client
+
+    meta = {}
+    assert json.loads(llm.generate_json("Scenario: test", meta=meta)) == SCRIPT[1]
+    assert meta["retries"] == meta["provider_retries"] == 1
+    assert send.timeouts == [5.0, 5.0]
+
+
+class DownLLM:
+    def generate_json(self, messages, **kwargs):
+        raise CircuitOpenError(12.0)
+
+    async def agenerate_json(self, messages, **kwargs):
+        self.generate_json(messages)
+
+
+def test_unhealthy_provider_escalates_to_ask_human():
+    result = SynapseAgent(llm=DownLLM()).run({"description": "Order stuck"})
+    assert result["final_plan"]["status"] == "escalated"
+    assert result["final_plan"]["reason"]["reason"] == "llm_provider_unavailable"
+    assert [s["action"] for s in result["cot"]] == ["ask_human"]
+
+    result = asyncio.run(SynapseAgent(llm=DownLLM()).arun({"description": "Order stuck"}))
+    assert result["final_plan"]["status"] == "escalated"
+
+
+def test_run_deadline_reaches_the_llm():
+    scenario = {"description": "Order stuck"}
+    llm = MockLLM.for_scenarios({"s": scenario}, scripts={"s": SCRIPT}, latency=0.5)
+    result = SynapseAgent(llm=llm).run(scenario, deadline_s=0.05)
+    assert result["final_plan"] == {"status": "incomplete", "reason": "deadline_exceeded"}
+    assert result["metrics"]["wall_ms"] < 400
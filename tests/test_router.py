@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+import time
+from agent.llm_agent import ModelRouter, SynapseAgent
+from fakes import SCRIPT, FakeLLM
+
+
+class SlowFirstLLM:
+    """Backend whose first request stalls; later ones answer quickly."""
+
+    def __init__(self, stall=0.5, fast=0.01):
+        self.stall = stall
+        self.fast = fast
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _latency(self):
+        with self._lock:
+            self.calls += 1
+            return self.stall if self.calls == 1 else self.fast
+
+    def generate_json(self, messages, meta=None, **kwargs):
+        time.sleep(self._latency())
+        return json.dumps(SCRIPT[0])
+
+    async def agenerate_json(self, messages, meta=None, **kwargs):
+        await asyncio.sleep(self._latency())
+        return json.dumps(SCRIPT[0])
+
+
+def test_decisions_go_to_the_strong_model():
+    fast, strong = FakeLLM(), FakeLLM()
+    router = ModelRouter(fast, strong, hedge=False)
+    result = SynapseAgent(llm=router).run({"description": "Order stuck"})
+    assert result["final_plan"]["status"] == "complete"
+    assert (fast.calls, strong.calls) == (2, 1)
+    assert [s["metrics"]["route"] for s in result["cot"]] == ["fast", "strong"]
+    assert router.stats()["escalated"] == 1
+
+
+def test_hedged_request_beats_a_stalled_primary():
+    router = ModelRouter(SlowFirstLLM(), hedge_after_s=0.05)
+    meta = {}
+    start = time.perf_counter()
+    assert json.loads(router.generate_json("Scenario: x", meta=meta)) == SCRIPT[0]
+    assert time.perf_counter() - start < 0.3
+    assert meta["hedged"] is True
+
+    time.sleep(0.6)  # let the stalled request finish so it lands in the unhedged baseline
+    stats = router.stats()
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+    assert stats["unhedged_ms"]["p99"] >= 400
+    assert stats["p99_saved_ms"] > 300
+
+
+def test_async_hedge_wins_over_a_stalled_primary():
+    router = ModelRouter(SlowFirstLLM(), hedge_after_s=0.05)
+    meta = {}
+    start = time.perf_counter()
+    asyncio.run(router.agenerate_json("Scenario: x", meta=meta))
+    assert time.perf_counter() - start < 0.3
+    assert meta["hedged"] is True and router.stats()["hedge_wins"] == 1
+
+
+def test_hedge_threshold_tracks_recent_p95():
+    router = ModelRouter(SlowFirstLLM(stall=0.02), hedge_min_samples=3)
+    assert router.stats()["hedge_after_ms"] == {"fast": None}
+    for _ in range(3):
+        router.generate_json("Scenario: x")
+    # p95 over three samples is the slowest one
+    assert router.stats()["hedge_after_ms"]["fast"] >= 20
+
+
+def test_load_alone_does_not_trigger_hedges():
+    class SteadyLLM:
+        def __init__(self):
+            self.calls = 0
+            self._lock = threading.Lock()
+
+        def generate_json(self, messages, meta=None, **kwargs):
+            with self._lock:
+                self.calls += 1
+            time.sleep(0.1)
+            return json.dumps(SCRIPT[0])
+
+    backend = SteadyLLM()
+    router = ModelRouter(backend, hedge_min_samples=3, max_hedge_threads=8, max_inflight_hedges=2)
+    for _ in range(3):
+        router.generate_json("Scenario: x")
+    threads = [threading.Thread(target=router.generate_json, args=("Scenario: x",)) for _ in range(64)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Calls that found the pool full ran inline; hedges stay within the cap
+    assert backend.calls <= 3 + 64 + 2
+    assert router.stats()["fast"] == 67
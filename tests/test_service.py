@@ -0,0 +1,107 @@
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from agent.llm_agent import SynapseAgent
+from agent.metrics import MetricsRecorder
+from agent.mock_llm import MockLLM
+from service import build_server
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+with open(os.path.join(BASE_DIR, "simulator", "scenarios.json")) as f:
+    SCENARIOS = json.load(f)
+
+
+@pytest.fixture
+def serve():
+    started = []
+
+    def _serve(latency=0.0, workers=2, queue_size=8, **server_kwargs):
+        metrics = MetricsRecorder()
+        agent = SynapseAgent(llm=MockLLM.for_scenarios(SCENARIOS, latency=latency), metrics_hooks=[metrics])
+        server, service = build_server(agent, "127.0.0.1", 0, workers, queue_size, metrics, **server_kwargs)
+        service.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((server, service))
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield _serve
+    for server, service in started:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+
+def request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as resp:
+            return resp.status, resp.headers, resp.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read().decode()
+
+
+def test_bad_timeout_or_content_length_is_rejected_before_submit(serve):
+    base = serve()
+    for timeout in ("abc", "-1", "nan", "inf"):
+        status, _, body = request(f"{base}/runs?wait=true&timeout={timeout}", SCENARIOS["recipient_unavailable"])
+        assert status == 400 and "timeout" in json.loads(body)["error"]
+
+    host, port = base[len("http://"):].split(":")
+    for length in ("-5", "abc"):
+        conn = http.client.HTTPConnection(host, int(port))
+        conn.putrequest("POST", "/runs")
+        conn.putheader("Content-Length", length)
+        conn.endheaders()
+        resp = conn.getresponse()
+        assert resp.status == 400 and "Content-Length" in json.loads(resp.read())["error"]
+        conn.close()
+    assert json.loads(request(base + "/health")[2])["accepted"] == 0
+
+
+def test_oversized_body_and_long_waits_are_bounded(serve):
+    base = serve(latency=1.0, max_sync_timeout=0.1, max_body_bytes=1024)
+    scenario = dict(SCENARIOS["recipient_unavailable"], notes="x" * 2048)
+    status, _, body = request(base + "/runs", scenario)
+    assert status == 413 and "1024" in json.loads(body)["error"]
+    assert json.loads(request(base + "/health")[2])["accepted"] == 0
+
+    # The client asks to wait a minute; the server gives up after its own cap
+    start = time.perf_counter()
+    status, headers, _ = request(base + "/runs?wait=true&timeout=60", SCENARIOS["recipient_unavailable"])
+    assert status == 202 and headers["Location"].startswith("/runs/")
+    assert time.perf_counter() - start < 0.9
+
+
+def test_sync_and_job_id_runs(serve):
+    base = serve()
+    status, _, body = request(base + "/runs?wait=true", SCENARIOS["recipient_unavailable"])
+    assert status == 200
+    assert json.loads(body)["result"]["final_plan"]["status"] == "complete"
+
+    status, headers, body = request(base + "/runs", SCENARIOS["damaged_packaging"])
+    assert status == 202 and headers["Location"].startswith("/runs/")
+    job_id = json.loads(body)["job_id"]
+    while json.loads(request(base + "/runs/" + job_id)[2])["status"] in ("queued", "running"):
+        time.sleep(0.01)
+    assert json.loads(request(base + "/runs/" + job_id)[2])["status"] == "done"
+
+    assert request(base + "/runs", {"no": "description"})[0] == 400
+    assert request(base + "/runs/missing")[0] == 404
+
+
+def test_backpressure_and_health(serve):
+    base = serve(latency=0.05, workers=1, queue_size=1)
+    codes = [request(base + "/runs", SCENARIOS["overloaded_restaurant"]) for _ in range(6)]
+    rejected = [c for c in codes if c[0] == 429]
+    assert rejected and int(rejected[0][1]["Retry-After"]) >= 1
+
+    health = json.loads(request(base + "/health")[2])
+    assert health["rejected"] == len(rejected)
+    assert {"queue_depth", "in_flight", "latency_s"} <= set(health)
+    metrics = request(base + "/metrics")[2]
+    assert "synapse_queue_depth" in metrics and "synapse_jobs_total" in metrics
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+import pytest
+from benchmarks.bench_startup import BUDGETS_MS, ROOT, measure, violations
+
+
+def test_entry_points_start_within_budget_without_heavy_dependencies():
+    results = {module: measure(module, repeats=2) for module in BUDGETS_MS}
+    assert violations(results) == []
+
+
+def test_cli_help_does_not_import_the_agent():
+    code = ("import sys, runpy; sys.argv = ['cli.py', '--help']\n"
+            "try:\n    runpy.run_path('cli.py', run_name='__main__')\nexcept SystemExit:\n    pass\n"
+            "print([m for m in sys.modules if m.split('.')[0] in ('agent', 'numpy', 'groq')])")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_langchain_adapter_wraps_any_backend():
+    messages = pytest.importorskip("langchain_core.messages")
+    from agent.langchain_adapter import as_chat_model
+    from agent.mock_llm import MockLLM
+
+    step = {"thought": "done", "action": "finish", "action_input": {"final_plan": "ok"}}
+    model = as_chat_model(MockLLM({"x": [step]}))
+    reply = model.invoke([messages.SystemMessage(content="sys"), messages.HumanMessage(content="Scenario: x")])
+    assert reply.content == '{"thought": "done", "action": "finish", "action_input": {"final_plan": "ok"}}'
+    assert reply.response_metadata["cached"] is False
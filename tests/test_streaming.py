@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+import httpx
+from groq import RateLimitError
+from agent.llm_agent import LangChainGroqLLM
+from agent.resilience import RetryPolicy
+from agent.streaming import JsonObjectScanner
+
+ACTION = {"thought": "Check the \"merchant\" first", "action": "get_merchant_status",
+          "action_input": {"merchant_id": "m_{1}"}}
+
+
+def chunks(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_scanner_completes_on_closing_brace_and_streams_thought():
+    pieces = []
+    scanner = JsonObjectScanner(on_thought=pieces.append)
+    text = "```json\n" + json.dumps(ACTION) + "\n```\nextra chatter {"
+    result = None
+    for piece in chunks(text):
+        result = scanner.feed(piece)
+        if result:
+            break
+    assert json.loads(result) == ACTION
+    assert "".join(pieces) == ACTION["thought"]
+    assert len(pieces) > 1
+
+
+class FakeStream:
+    def __init__(self, text):
+        self.pieces = chunks(text)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.read += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+class StreamOf(list):
+    def close(self):
+        pass
+
+
+def test_streaming_generate_json_stops_reading_after_action(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    stream = FakeStream(json.dumps(ACTION) + " trailing tokens that should never be read" * 5)
+    llm = LangChainGroqLLM(streaming=True)
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: stream)))
+
+    thoughts = []
+    assert json.loads(llm.generate_json("Scenario: x", on_thought=thoughts.append)) == ACTION
+    assert stream.closed and stream.read < len(stream.pieces)
+    assert "".join(thoughts) == ACTION["thought"]
+
+
+def test_streaming_records_provider_retries_and_marks_missing_usage(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    response = httpx.Response(429, request=httpx.Request("POST", "http://groq.test"))
+    errors = [RateLimitError("rate limited", response=response, body=None)]
+
+    def create(**kwargs):
+        if errors:
+            raise errors.pop()
+        return FakeStream(json.dumps(ACTION) + " trailing")
+
+    llm = LangChainGroqLLM(streaming=True, retry_policy=RetryPolicy(base_delay=0.0))
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    meta = {}
+    llm.generate_json("Scenario: x", meta=meta)
+    assert meta["retries"] == meta["provider_retries"] == 1
+    # The stream stopped before its usage chunk: tokens are unknown, not zero
+    assert meta["usage_unavailable"] is True and "usage" not in meta
+
+    usage = SimpleNamespace(prompt_tokens=40, completion_tokens=12)
+    final = SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=json.dumps(ACTION)))],
+                            x_groq=SimpleNamespace(usage=usage))
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: StreamOf([final]))))
+    meta = {}
+    llm.generate_json("Scenario: y", meta=meta)
+    assert meta["usage"] == {"prompt_tokens": 40, "completion_tokens": 12} and "usage_unavailable" not in meta
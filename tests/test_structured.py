@@ -0,0 +1,71 @@
+import json
+from types import SimpleNamespace
+import httpx
+from groq import BadRequestError
+from agent.llm_agent import GroqLLM, SynapseAgent, _completion_text, _failed_generation, _repair_json
+from agent.prompts import prefix_fingerprint
+from agent.tool_registry import DEFAULT_REGISTRY
+from fakes import FakeLLM
+
+
+def tool_call(name, arguments):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_compact_prompt_is_generated_from_the_registry_and_smaller():
+    agent = SynapseAgent(llm=FakeLLM(), structured=True, thought="none")
+    system = agent.build_messages({"description": "x"}).messages()[0].content
+    assert "get_nearby_merchants(merchant_id:str, radius_km:float=2.0)" in system
+    assert '"thought"' not in agent.build_messages({"description": "x"}).messages()[2].content
+    compact = prefix_fingerprint(False, DEFAULT_REGISTRY.compact_schema(), "none")
+    assert compact["chars"] < 0.8 * prefix_fingerprint()["chars"]
+
+
+def test_thought_is_optional():
+    llm = FakeLLM(script=[{"action": "finish", "action_input": {"final_plan": "Done"}}])
+    result = SynapseAgent(llm=llm, thought="none").run({"description": "x"})
+    assert result["final_plan"] == {"status": "complete", "final_plan": "Done"}
+    assert result["cot"][0]["thought"] == ""
+
+
+def test_tool_calls_fold_into_the_action_protocol():
+    message = SimpleNamespace(content=None, tool_calls=[tool_call("get_merchant_status", '{"merchant_id": "m1"}')])
+    assert json.loads(_completion_text(message)) == {"action": "get_merchant_status",
+                                                     "action_input": {"merchant_id": "m1"}}
+    message = SimpleNamespace(content="both", tool_calls=[tool_call("check_traffic", "{}"),
+                                                         tool_call("find_nearby_locker", '{"location": "a"}')])
+    assert [a["action"] for a in json.loads(_completion_text(message))["actions"]] == \
+        ["check_traffic", "find_nearby_locker"]
+
+
+def test_local_repair_saves_a_second_call():
+    assert json.loads(_repair_json('{"action": "finish", "action_input": {"final_plan": "ok",},}')) == \
+        {"action": "finish", "action_input": {"final_plan": "ok"}}
+    assert json.loads(_repair_json('```json\n{"items": [1, 2,], "note": "a,}"}\n```')) == \
+        {"items": [1, 2], "note": "a,}"}
+    # Truncated output is never completed: the cut-off value could be anything
+    assert _repair_json('{"action": "issue_instant_refund", "action_input": {"amount": 1') is None
+    assert _repair_json('{"thought": "cut off mid str') is None
+    assert _repair_json("not json at all") is None
+
+    response = httpx.Response(400, request=httpx.Request("POST", "http://groq.test"))
+    body = {"error": {"code": "json_validate_failed", "failed_generation": '{"action": "finish"'}}
+    assert _failed_generation(BadRequestError("bad", response=response, body=body)) == '{"action": "finish"'
+
+
+def test_truncated_output_takes_the_retry_path(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    llm = GroqLLM()
+    replies = ['{"action": "issue_instant_refund", "action_input": {"order_id": "o1", "amount": 1',
+               '{"action": "issue_instant_refund", "action_input": {"order_id": "o1", "amount": 150}}']
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs["messages"])
+        message = SimpleNamespace(content=replies[len(requests) - 1], tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    meta = {}
+    assert json.loads(llm.generate_json("Scenario: refund", meta=meta))["action_input"]["amount"] == 150
+    assert len(requests) == 2 and meta["retries"] == 1
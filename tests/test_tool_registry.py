@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent.tool_registry import DEFAULT_REGISTRY, ToolRegistry
+
+
+def test_default_registry_policies():
+    assert len(DEFAULT_REGISTRY.names()) == 13
+    assert DEFAULT_REGISTRY.get("get_merchant_status").cacheable
+    assert not DEFAULT_REGISTRY.get("issue_instant_refund").cacheable
+    assert not DEFAULT_REGISTRY.get("re_route_driver").cacheable
+    assert DEFAULT_REGISTRY.call("no_such_tool", {}) == {"error": "unknown_action"}
+
+
+def test_cacheable_tool_is_memoized_but_side_effects_are_not():
+    calls = {"lookup": 0, "refund": 0}
+
+    def lookup(merchant_id=None):
+        calls["lookup"] += 1
+        return {"merchant_id": merchant_id}
+
+    def refund(order_id=None):
+        calls["refund"] += 1
+        return {"order_id": order_id}
+
+    registry = ToolRegistry()
+    registry.register("lookup", lookup, cacheable=True, ttl=60)
+    registry.register("refund", refund)
+    for _ in range(3):
+        registry.call("lookup", {"merchant_id": "m1"})
+        registry.call("refund", {"order_id": "o1"})
+    registry.call("lookup", {"merchant_id": "m2"})
+
+    assert calls == {"lookup": 2, "refund": 3}
+    assert registry.stats()["cache_hits"] == 2
+
+
+def test_cache_is_bounded_and_drops_expired_entries():
+    registry = ToolRegistry(max_cache_entries=3)
+    registry.register("lookup", lambda key=None: {"key": key}, cacheable=True, ttl=60)
+    registry.register("flash", lambda key=None: {"key": key}, cacheable=True, ttl=0)
+    for key in "abcd":
+        registry.call("lookup", {"key": key})
+    registry.call("lookup", {"key": "b"})  # refreshes b, so c is evicted next
+    registry.call("lookup", {"key": "e"})
+    assert registry.cache_size() == 3
+    assert registry.call("lookup", {"key": "b"}) and registry.stats()["cache_hits"] == 2
+    assert registry.stats()["executions"] == 5
+
+    for key in range(10):
+        registry.call("flash", {"key": key})
+    # Zero-TTL results expire at once and never push live entries out
+    assert registry.cache_size() <= 3
+    registry.call("lookup", {"key": "b"})
+    assert registry.stats()["cache_hits"] == 3
+
+
+def test_concurrent_identical_reads_share_one_execution():
+    calls = []
+
+    def slow_lookup(location=None):
+        calls.append(location)
+        time.sleep(0.05)
+        return {"location": location}
+
+    registry = ToolRegistry()
+    registry.register("slow_lookup", slow_lookup, cacheable=True, ttl=0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: registry.call("slow_lookup", {"location": "x"}), range(8)))
+
+    assert calls == ["x"]
+    assert all(r == {"location": "x"} for r in results)
+    assert registry.stats()["coalesced"] == 7
+
+
+def test_arguments_are_validated_against_the_signature():
+    calls = []
+
+    def refund(order_id: str = None, amount: float = 0.0):
+        calls.append((order_id, amount))
+        return {"order_id": order_id, "amount": amount}
+
+    registry = ToolRegistry()
+    registry.register("refund", refund)
+    assert registry.get("refund").signature() == "refund(order_id:str, amount:float=0.0)"
+    assert registry.call("refund", {"order_id": 42, "amount": "12.5"}) == {"order_id": "42", "amount": 12.5}
+    assert registry.call("refund", "o1") == {"order_id": "o1", "amount": 0.0}
+    assert registry.call("refund", {"order": "o1"})["error"] == "invalid_arguments"
+    assert registry.call("refund", {"order_id": "o1", "amount": "lots"})["detail"] == \
+        "'amount' must be float, got 'lots'"
+    assert len(calls) == 2 and registry.stats()["invalid"] == 2
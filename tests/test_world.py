@@ -0,0 +1,69 @@
+import numpy as np
+from agent.llm_agent import SynapseAgent
+from agent.mock_llm import MockLLM
+from agent.tool_registry import DEFAULT_REGISTRY
+from simulator import tools
+from simulator.world import GridIndex, World, rng, seeded_run, set_world
+
+
+def test_grid_radius_and_nearest_match_brute_force():
+    xy = np.random.default_rng(1).uniform(0, 50, size=(20000, 2))
+    index = GridIndex(xy, cell_km=0.7)
+    point = np.array([12.3, 40.1])
+    dist = np.hypot(*(xy - point).T)
+
+    idx, found = index.within(point, 3.0)
+    assert set(idx.tolist()) == set(np.flatnonzero(dist <= 3.0).tolist())
+    assert np.all(np.diff(found) >= 0)
+
+    idx, _ = index.nearest(point, 10)
+    assert idx.tolist() == np.argsort(dist)[:10].tolist()
+    # Far outside the points the search keeps expanding until it finds k
+    assert len(index.nearest([500.0, 500.0], 5)[0]) == 5
+
+
+def test_tools_query_the_world_and_honor_radius(tmp_path):
+    world = World.generate(merchants=2000, drivers=50, lockers=100, size_km=10, seed=3)
+    path = str(tmp_path / "world.npz")
+    world.save(path)
+    set_world(World.from_file(path))
+    try:
+        merchant = "m_000042"
+        near = tools.get_nearby_merchants(merchant, radius_km=0.5)["alternatives"]
+        far = tools.get_nearby_merchants(merchant, radius_km=3.0)["alternatives"]
+        assert near and all(a["distance_km"] <= 0.5 for a in near)
+        assert all(a["id"] != merchant for a in far)
+        assert min(a["prep_time_min"] for a in far) <= min(a["prep_time_min"] for a in near)
+
+        lockers = tools.find_nearby_locker("m_000042")["lockers"]
+        assert len(lockers) == 3 and all(l["free_slots"] > 0 for l in lockers)
+
+        moved = tools.re_route_driver("d_000001", merchant)
+        assert moved["distance_km"] >= 0
+        assert tools.re_route_driver("d_000001", merchant)["distance_km"] == 0.0
+    finally:
+        set_world(None)
+
+
+def test_seeded_runs_are_reproducible_and_isolated():
+    with seeded_run(7):
+        first = [tools.check_traffic("downtown") for _ in range(3)]
+    with seeded_run(7):
+        outer = rng()
+        with seeded_run(8):
+            tools.check_traffic("downtown")
+        assert rng() is outer
+        assert [tools.check_traffic("downtown") for _ in range(3)] == first
+
+    scenario = {"description": "Driver stuck in traffic"}
+    script = [{"thought": "", "action": "check_traffic", "action_input": {"location": "downtown"}},
+              {"thought": "", "action": "finish", "action_input": {"final_plan": "ok"}}]
+    llm = MockLLM({scenario["description"]: script})
+    observation = lambda seed: SynapseAgent(llm=llm, world_seed=seed).run(scenario)["cot"][0]["observation"]
+    # Runs share DEFAULT_REGISTRY: an unseeded run first fills its tool cache,
+    # which seeded runs must not be served from
+    DEFAULT_REGISTRY.clear_cache()
+    observation(None)
+    draws = {seed: [observation(seed) for _ in range(2)] for seed in range(11, 17)}
+    assert all(first == second for first, second in draws.values())
+    assert len({str(first) for first, _ in draws.values()}) > 1